@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+"""
+Compare WSGI and ASGI throughput of the Retro Platform Fighter API.
+
+Starts the project under gunicorn twice on the same database: first with a
+threaded WSGI worker running the sync views, then with a uvicorn worker
+running the async views (``API_ASYNC_VIEWS=True``). Each run is driven by the
+same number of concurrent virtual players. Every player keeps one connection
+open and loops over a mix of autosaves, state loads and high-score reads.
+
+Usage:
+    python benchmarks/asgi_vs_wsgi.py --concurrency 500 --duration 20
+
+Requires gunicorn and uvicorn (see requirements.txt) and a migrated database.
+SQLite serializes writers, so point DATABASE_URL at PostgreSQL for numbers
+that mean anything. Rate limiting is switched off for both servers.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from http.cookies import SimpleCookie
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+HOST = '127.0.0.1'
+PLAY_PATH = '/retro_platform_fighter/play/'
+SAVE_PATH = '/retro_platform_fighter/api/save-state/'
+LOAD_PATH = '/retro_platform_fighter/api/load-state/'
+HIGH_SCORES_PATH = '/retro_platform_fighter/api/high-scores/'
+
+# Share of requests per endpoint, roughly what a page of active players sends
+REQUEST_MIX = {'save': 0.6, 'load': 0.2, 'high_scores': 0.2}
+
+SERVERS = {
+    'wsgi': lambda port, threads: [
+        'gunicorn', 'application:application',
+        '--bind', f'{HOST}:{port}', '--workers', '1',
+        '--worker-class', 'gthread', '--threads', str(threads),
+    ],
+    'asgi': lambda port, threads: [
+        'gunicorn', 'retro_game_web.asgi:application',
+        '--bind', f'{HOST}:{port}', '--workers', '1',
+        '--worker-class', 'uvicorn.workers.UvicornWorker',
+    ],
+}
+
+
+class Connection:
+    """Minimal keep-alive HTTP/1.1 client with a cookie jar."""
+
+    def __init__(self, port):
+        self.port = port
+        self.cookies = {}
+        self.reader = None
+        self.writer = None
+
+    async def open(self):
+        self.reader, self.writer = await asyncio.open_connection(HOST, self.port)
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+
+    async def request(self, method, path, body=None):
+        payload = json.dumps(body).encode() if body is not None else b''
+        headers = [
+            f'{method} {path} HTTP/1.1',
+            f'Host: {HOST}:{self.port}',
+            'Connection: keep-alive',
+            f'Content-Length: {len(payload)}',
+        ]
+        if body is not None:
+            headers.append('Content-Type: application/json')
+        if self.cookies:
+            headers.append('Cookie: ' + '; '.join(f'{k}={v}' for k, v in self.cookies.items()))
+        if 'csrftoken' in self.cookies:
+            headers.append(f'X-CSRFToken: {self.cookies["csrftoken"]}')
+        self.writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode() + payload)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = (await self.reader.readline()).decode('latin-1')
+            if line in ('\r\n', ''):
+                break
+            name, _, value = line.partition(':')
+            name = name.strip().lower()
+            if name == 'content-length':
+                length = int(value)
+            elif name == 'set-cookie':
+                for morsel in SimpleCookie(value.strip()).values():
+                    self.cookies[morsel.key] = morsel.value
+        await self.reader.readexactly(length)
+        return status
+
+
+def save_payload():
+    return {
+        'level': random.randint(1, 10),
+        'diamonds': random.randint(0, 100),
+        'lives': 3,
+        'score': random.randint(0, 100000),
+        'playerX': random.uniform(0, 800),
+        'playerY': random.uniform(0, 600),
+        'robotsDefeated': random.sample(range(20), 5),
+        'diamondsCollected': random.sample(range(20), 5),
+        'bossDefeated': False,
+        'levelCompleted': False,
+    }
+
+
+async def player(port, deadline, latencies, errors):
+    """One virtual player: start a game, then loop over the request mix."""
+    connection = Connection(port)
+    try:
+        await connection.open()
+        if await connection.request('GET', PLAY_PATH) != 200:
+            errors['start'] += 1
+            return
+        kinds, weights = zip(*REQUEST_MIX.items())
+        while time.monotonic() < deadline:
+            kind = random.choices(kinds, weights)[0]
+            start = time.perf_counter()
+            if kind == 'save':
+                status = await connection.request('POST', SAVE_PATH, save_payload())
+            elif kind == 'load':
+                status = await connection.request('GET', LOAD_PATH)
+            else:
+                status = await connection.request('GET', HIGH_SCORES_PATH)
+            latencies[kind].append(time.perf_counter() - start)
+            if status != 200:
+                errors[status] += 1
+    except (OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+        errors['connection'] += 1
+    finally:
+        connection.close()
+
+
+async def drive(port, concurrency, duration):
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    deadline = time.monotonic() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        player(port, deadline, latencies, errors) for _ in range(concurrency)
+    ))
+    return latencies, errors, time.perf_counter() - start
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((HOST, port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def run_server(mode, args):
+    env = dict(os.environ, API_ASYNC_VIEWS=str(mode == 'asgi'), RATE_LIMIT_ENABLED='False')
+    command = SERVERS[mode](args.port, args.threads) + ['--log-level', 'warning']
+    server = subprocess.Popen(command, cwd=BASE_DIR, env=env)
+    try:
+        if not wait_for_port(args.port):
+            print(f"❌ {mode} server did not start on port {args.port}")
+            return None
+        return asyncio.run(drive(args.port, args.concurrency, args.duration))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def report(mode, result):
+    latencies, errors, elapsed = result
+    total = sum(len(values) for values in latencies.values())
+    print(f"\n📊 {mode.upper()}: {total} requests in {elapsed:.1f}s = {total / elapsed:.0f} req/s")
+    for kind, values in sorted(latencies.items()):
+        if len(values) < 2:
+            continue
+        cuts = statistics.quantiles(values, n=100)
+        print(f"   {kind:<12} n={len(values):<7} "
+              f"p50={cuts[49] * 1000:7.1f}ms  p95={cuts[94] * 1000:7.1f}ms  p99={cuts[98] * 1000:7.1f}ms")
+    if errors:
+        print(f"   errors: {dict(errors)}")
+    return total / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--concurrency', type=int, default=200, help='Concurrent virtual players')
+    parser.add_argument('--duration', type=int, default=15, help='Seconds per server')
+    parser.add_argument('--threads', type=int, default=32, help='Threads of the WSGI worker')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--mode', choices=['wsgi', 'asgi', 'both'], default='both')
+    args = parser.parse_args()
+
+    modes = ['wsgi', 'asgi'] if args.mode == 'both' else [args.mode]
+    throughput = {}
+    for mode in modes:
+        print(f"🚀 Benchmarking {mode} with {args.concurrency} players for {args.duration}s...")
+        result = run_server(mode, args)
+        if result is None:
+            return 1
+        throughput[mode] = report(mode, result)
+
+    if len(throughput) == 2 and throughput['wsgi']:
+        print(f"\n⚖️  ASGI / WSGI throughput: {throughput['asgi'] / throughput['wsgi']:.2f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
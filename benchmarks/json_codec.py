@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark of JSON parsing and rendering for the game API payloads.
+
+Times three paths for the save, load and high-score payloads:
+
+- ``before``: what the views did originally, ``json.loads(body.decode('utf-8'))``
+  and ``json.dumps(data, cls=DjangoJSONEncoder)`` encoded to bytes
+- ``stdlib``: the fast_json stdlib codec, parsing straight from bytes
+- ``orjson``: the fast_json orjson codec, when orjson is installed
+
+Usage:
+    python benchmarks/json_codec.py --number 20000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+from datetime import timedelta
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def payloads():
+    """Representative request and response bodies of the hot endpoints."""
+    from django.utils import timezone
+
+    from games.retro_platform_fighter.models import RetroGameSession, RetroGameState
+    from games.retro_platform_fighter.state_cache import build_payload
+
+    save = {
+        'level': 4,
+        'diamonds': 37,
+        'lives': 2,
+        'score': 48210,
+        'playerX': 412.75,
+        'playerY': 318.5,
+        'robotsDefeated': random.sample(range(63), 30),
+        'diamondsCollected': random.sample(range(63), 30),
+        'bossDefeated': False,
+        'levelCompleted': False,
+    }
+    game_state = RetroGameState(version=17)
+    game_state.apply_save_data(save)
+    load = build_payload(RetroGameSession(current_level=4, diamonds=37, lives=2, score=48210,
+                                          player_x=412.75, player_y=318.5), game_state)
+    now = timezone.now()
+    high_scores = {
+        'window': 'all',
+        'high_scores': [
+            {
+                'rank': rank,
+                'player_name': f'Player {rank}',
+                'score': 1000000 - rank * 997,
+                'level_reached': rank % 10 + 1,
+                'created_at': (now - timedelta(hours=rank)).isoformat(),
+            }
+            for rank in range(1, 51)
+        ],
+    }
+    return {'save': save, 'load': load, 'high_scores': high_scores}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--number', type=int, default=20000, help='Calls per measurement')
+    parser.add_argument('--repeat', type=int, default=5, help='Measurements; the best is reported')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'retro_game_web.settings')
+    sys.path.insert(0, str(BASE_DIR))
+    import django
+    django.setup()
+    from django.core.serializers.json import DjangoJSONEncoder
+
+    from games.retro_platform_fighter.fast_json import CODECS
+
+    paths = {
+        'before': (
+            lambda body: json.loads(body.decode('utf-8')),
+            lambda data: json.dumps(data, cls=DjangoJSONEncoder).encode('utf-8'),
+        ),
+    }
+    for name, codec in CODECS.items():
+        paths[name] = (codec.loads, codec.dumps)
+
+    print(f"⏱️  Best of {args.repeat} x {args.number} calls, microseconds per call")
+    print(f"   {'payload':<12} {'path':<8} {'decode':>8} {'encode':>8} {'speedup':>8}")
+    for payload_name, data in payloads().items():
+        body = paths['before'][1](data)
+        baseline = None
+        for path_name, (decode, encode) in paths.items():
+            decode_us = min(timeit.repeat(lambda: decode(body), number=args.number, repeat=args.repeat))
+            encode_us = min(timeit.repeat(lambda: encode(data), number=args.number, repeat=args.repeat))
+            decode_us, encode_us = decode_us / args.number * 1e6, encode_us / args.number * 1e6
+            total = decode_us + encode_us
+            baseline = baseline or total
+            print(f"   {payload_name:<12} {path_name:<8} {decode_us:8.2f} {encode_us:8.2f} "
+                  f"{baseline / total:7.2f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+"""
+In-process load test of the Retro Platform Fighter game API.
+
+Seeds a database, then runs the whole Django stack in this process with a
+pool of simulated players, each using its own test client. Every player
+opens the play page, autosaves every ``--autosave-interval`` seconds,
+loads its state, reads the high scores and submits a score, round after
+round until ``--duration`` runs out. Latency percentiles and throughput
+are reported per endpoint.
+
+By default a fresh SQLite file in a temporary directory is used; pass
+``--database-url postgresql://...`` to run against PostgreSQL. SQLite
+serializes writers, so its numbers measure lock contention more than the
+views. Rate limiting is switched off.
+
+Usage:
+    python benchmarks/load_test.py --players 50 --duration 30 --output report.json
+    python benchmarks/load_test.py --baseline report.json --tolerance 15
+
+With ``--baseline`` the run is compared to an earlier report and the
+script exits with status 1 when any endpoint's p95 latency rose, or its
+throughput fell, by more than ``--tolerance`` percent.
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+PLAY_PATH = '/retro_platform_fighter/play/'
+SAVE_PATH = '/retro_platform_fighter/api/save-state/'
+LOAD_PATH = '/retro_platform_fighter/api/load-state/'
+SUBMIT_PATH = '/retro_platform_fighter/api/submit-score/'
+HIGH_SCORES_PATH = '/retro_platform_fighter/api/high-scores/'
+ENDPOINTS = ('play', 'save', 'load', 'high_scores', 'submit')
+
+
+def setup_django(database_url):
+    """Configure the environment for a benchmark run and set Django up."""
+    os.environ['DATABASE_URL'] = database_url
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'retro_game_web.settings')
+    os.environ['RATE_LIMIT_ENABLED'] = 'False'
+    os.environ['ALLOWED_HOSTS'] = 'localhost'
+    sys.path.insert(0, str(BASE_DIR))
+    import django
+    django.setup()
+    # Failed requests are counted in the report instead of logged
+    logging.disable(logging.CRITICAL)
+
+
+def seed(high_scores):
+    """Migrate the database and fill the leaderboard."""
+    from django.core.management import call_command
+
+    from games.retro_platform_fighter.models import RetroHighScore
+
+    call_command('migrate', verbosity=0, interactive=False)
+    existing = RetroHighScore.objects.count()
+    RetroHighScore.objects.bulk_create([
+        RetroHighScore(
+            player_name=f'Seed{i}',
+            score=random.randint(0, 1000000),
+            level_reached=random.randint(1, 10)
+        )
+        for i in range(max(0, high_scores - existing))
+    ], batch_size=1000)
+    call_command('rebuild_rank_index', verbosity=0)
+    call_command('rebuild_leaderboards', verbosity=0)
+
+
+def save_payload():
+    return {
+        'level': random.randint(1, 10),
+        'diamonds': random.randint(0, 100),
+        'lives': 3,
+        'score': random.randint(0, 100000),
+        'playerX': random.uniform(0, 800),
+        'playerY': random.uniform(0, 600),
+        'robotsDefeated': random.sample(range(20), 5),
+        'diamondsCollected': random.sample(range(20), 5),
+        'bossDefeated': False,
+        'levelCompleted': False,
+    }
+
+
+def player(deadline, autosaves, autosave_interval):
+    """
+    One simulated player, playing rounds until the deadline.
+
+    Returns:
+        (latencies by endpoint, errors by endpoint and status)
+    """
+    from django.db import connections
+    from django.test import Client
+
+    client = Client(raise_request_exception=False, HTTP_HOST='localhost')
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+
+    def timed(endpoint, send):
+        start = time.perf_counter()
+        try:
+            status = send().status_code
+        except Exception as e:
+            status = type(e).__name__
+        latencies[endpoint].append(time.perf_counter() - start)
+        if status != 200:
+            errors[f'{endpoint}:{status}'] += 1
+        return status
+
+    try:
+        while time.monotonic() < deadline:
+            if timed('play', lambda: client.get(PLAY_PATH)) != 200:
+                continue
+            for _ in range(autosaves):
+                timed('save', lambda: client.post(SAVE_PATH, json.dumps(save_payload()),
+                                                  content_type='application/json'))
+                if autosave_interval:
+                    time.sleep(autosave_interval)
+            timed('load', lambda: client.get(LOAD_PATH))
+            timed('high_scores', lambda: client.get(HIGH_SCORES_PATH))
+            score = {'player_name': 'Bench', 'score': random.randint(0, 100000),
+                     'level_reached': random.randint(1, 10)}
+            timed('submit', lambda: client.post(SUBMIT_PATH, json.dumps(score),
+                                                content_type='application/json'))
+    finally:
+        connections.close_all()
+    return dict(latencies), dict(errors)
+
+
+def _process_player(database_url, deadline_in, autosaves, autosave_interval):
+    """Entry point of a player in a worker process."""
+    setup_django(database_url)
+    return player(time.monotonic() + deadline_in, autosaves, autosave_interval)
+
+
+def run(args, database_url):
+    """Run all players and merge their results."""
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    start = time.perf_counter()
+    if args.pool == 'thread':
+        deadline = time.monotonic() + args.duration
+        with ThreadPoolExecutor(max_workers=args.players) as pool:
+            futures = [pool.submit(player, deadline, args.autosaves, args.autosave_interval)
+                       for _ in range(args.players)]
+    else:
+        from django.db import connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=args.players) as pool:
+            futures = [pool.submit(_process_player, database_url, args.duration,
+                                   args.autosaves, args.autosave_interval)
+                       for _ in range(args.players)]
+    elapsed = time.perf_counter() - start
+
+    for future in futures:
+        player_latencies, player_errors = future.result()
+        for endpoint, values in player_latencies.items():
+            latencies[endpoint].extend(values)
+        for key, count in player_errors.items():
+            errors[key] += count
+    return latencies, errors, elapsed
+
+
+def summarize(latencies, errors, elapsed):
+    """Per-endpoint request counts, throughput and latency percentiles."""
+    endpoints = {}
+    for endpoint in ENDPOINTS:
+        values = latencies.get(endpoint, [])
+        if len(values) < 2:
+            continue
+        cuts = statistics.quantiles(values, n=100)
+        endpoints[endpoint] = {
+            'requests': len(values),
+            'errors': sum(c for k, c in errors.items() if k.startswith(f'{endpoint}:')),
+            'rps': round(len(values) / elapsed, 2),
+            'p50_ms': round(cuts[49] * 1000, 2),
+            'p95_ms': round(cuts[94] * 1000, 2),
+            'p99_ms': round(cuts[98] * 1000, 2),
+        }
+    total = sum(len(values) for values in latencies.values())
+    return {
+        'total_requests': total,
+        'rps': round(total / elapsed, 2),
+        'elapsed': round(elapsed, 2),
+        'endpoints': endpoints,
+        'errors': dict(errors),
+    }
+
+
+def compare(report, baseline, tolerance):
+    """Print the change against a baseline report; return the regressions."""
+    regressions = []
+    print(f"\n⚖️  Against baseline ({baseline.get('created_at', 'unknown date')}):")
+    for endpoint, current in report['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(endpoint)
+        if not before:
+            print(f"   {endpoint:<12} no baseline")
+            continue
+        p95 = (current['p95_ms'] / before['p95_ms'] - 1) * 100 if before['p95_ms'] else 0.0
+        rps = (current['rps'] / before['rps'] - 1) * 100 if before['rps'] else 0.0
+        flag = ''
+        if p95 > tolerance or rps < -tolerance:
+            regressions.append(endpoint)
+            flag = '  ❌ regression'
+        print(f"   {endpoint:<12} p95 {p95:+6.1f}%  rps {rps:+6.1f}%{flag}")
+    return regressions
+
+
+def print_report(report):
+    config = report['config']
+    print(f"\n📊 {report['total_requests']} requests in {report['elapsed']}s = {report['rps']} req/s "
+          f"({config['players']} {config['pool']} players on {config['database']})")
+    for endpoint, data in report['endpoints'].items():
+        print(f"   {endpoint:<12} n={data['requests']:<7} {data['rps']:8.1f} req/s  "
+              f"p50={data['p50_ms']:7.1f}ms  p95={data['p95_ms']:7.1f}ms  p99={data['p99_ms']:7.1f}ms")
+    if report['errors']:
+        print(f"   errors: {report['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--players', type=int, default=20, help='Concurrent simulated players')
+    parser.add_argument('--duration', type=float, default=15, help='Seconds to run')
+    parser.add_argument('--pool', choices=['thread', 'process'], default='thread',
+                        help='Run players in threads or in separate processes')
+    parser.add_argument('--autosaves', type=int, default=5, help='Autosaves per round')
+    parser.add_argument('--autosave-interval', type=float, default=1.0,
+                        help='Seconds between autosaves; 0 saves back to back')
+    parser.add_argument('--high-scores', type=int, default=10000, help='High scores to seed')
+    parser.add_argument('--database-url', help='Database to use; defaults to a new SQLite file')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    parser.add_argument('--baseline', help='JSON report to compare against')
+    parser.add_argument('--tolerance', type=float, default=10.0,
+                        help='Allowed p95/throughput change against the baseline, in percent')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f'sqlite:///{tmp}/load_test.sqlite3'
+        setup_django(database_url)
+        from django.db import connection
+
+        print(f"🌱 Seeding {connection.vendor} database with {args.high_scores} high scores...")
+        seed(args.high_scores)
+        print(f"🚀 Running {args.players} players for {args.duration}s...")
+        latencies, errors, elapsed = run(args, database_url)
+
+        report = summarize(latencies, errors, elapsed)
+        report['created_at'] = datetime.now(timezone.utc).isoformat()
+        report['config'] = {
+            'players': args.players,
+            'pool': args.pool,
+            'duration': args.duration,
+            'autosaves': args.autosaves,
+            'autosave_interval': args.autosave_interval,
+            'high_scores': args.high_scores,
+            'database': connection.vendor,
+        }
+
+    print_report(report)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"\n💾 Report written to {args.output}")
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        if compare(report, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
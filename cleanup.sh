@@ -14,4 +14,13 @@ fi
 echo "Cleaning expired sessions..."
 python manage.py clearsessions
 
+# Delete game sessions inactive for 30 days, in small batches
+# Safe to schedule while the site is live, e.g. cron: 30 4 * * * ./cleanup.sh
+echo "Cleaning inactive game sessions..."
+python manage.py cleanup_game_sessions --days 30 --batch-size 500 --sleep 0.1
+
+# Move high scores no leaderboard shows to the archive table
+echo "Archiving old high scores..."
+python manage.py archive_high_scores --batch-size 500 --sleep 0.1
+
 echo "✅ Cleanup complete!"
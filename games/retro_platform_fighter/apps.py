@@ -5,3 +5,7 @@ class RetroPlatformFighterConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'games.retro_platform_fighter'
     label = 'retro_platform_fighter'
+
+    def ready(self):
+        # Connect the signal handlers that keep the boards and rank index in step with deletes
+        from . import leaderboard, ranking  # noqa: F401
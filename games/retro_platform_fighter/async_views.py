@@ -0,0 +1,199 @@
+"""
+Native async versions of the Retro Platform Fighter API views.
+
+These serve the same URLs, payloads and status codes as their counterparts
+in ``views.py`` and are routed instead of them when
+``settings.API_ASYNC_VIEWS`` is enabled, which is how the ASGI deployment runs.
+Cache reads and writes, load-state queries and the rate limiter use async
+APIs, so an autosave or leaderboard request waiting on I/O does not hold a
+thread. Writes that need a transaction (full, delta and batch saves, score
+submission, write-behind flushes and leaderboard rebuilds) reuse the sync
+implementation through ``sync_to_async``, because Django transactions are not
+available in async code.
+"""
+
+import logging
+
+from asgiref.sync import sync_to_async
+from django.shortcuts import aget_object_or_404
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_protect
+from django.views.decorators.http import require_http_methods
+
+from . import fast_json, views
+from .fast_json import JsonResponse
+from .leaderboard import LEADERBOARDS
+from .models import RetroGameSession, RetroGameState
+from .state_buffer import merge_snapshot, state_buffer
+from .state_cache import build_payload, state_cache
+from .throttling import rate_limit
+
+logger = logging.getLogger(__name__)
+
+
+class SaveGameStateView(views.SaveGameStateView):
+    """Async save-state endpoint; see ``views.SaveGameStateView`` for the payload."""
+
+    @method_decorator(csrf_protect)
+    @method_decorator(rate_limit('save_state'))
+    @method_decorator(require_http_methods(["POST"]))
+    async def post(self, request):
+        try:
+            session_key = request.session.session_key
+            if not session_key:
+                return JsonResponse({'error': 'Invalid session'}, status=401)
+
+            try:
+                data = fast_json.loads(request.body)
+            except fast_json.DECODE_ERRORS as e:
+                logger.warning(f"Invalid JSON in save_game_state: {str(e)}")
+                return JsonResponse({'error': 'Invalid JSON data'}, status=400)
+            invalid = self._invalid_progress(data)
+            if invalid:
+                return invalid
+
+            # Buffer autosaves in write-behind mode
+            buffered = None
+            if state_buffer.enabled:
+                if not self._requires_sync_write(data):
+                    await state_buffer.aput(session_key, data)
+                    await state_cache.aupdate(session_key, data)
+                    await sync_to_async(state_buffer.flush_due)()
+                    return JsonResponse({'success': True, 'buffered': True})
+
+                buffered = await state_buffer.atake(session_key)
+                data = merge_snapshot(buffered, data)
+
+            return await sync_to_async(self._write_save)(session_key, data, buffered)
+
+        except RetroGameSession.DoesNotExist:
+            return JsonResponse({'error': 'Game session not found'}, status=404)
+        except Exception as e:
+            logger.error(f"Error in save_game_state: {str(e)}", exc_info=True)
+            return JsonResponse({'error': 'Internal server error'}, status=500)
+
+
+class SaveGameStateBatchView(views.SaveGameStateBatchView):
+    """Async batch save; see ``views.SaveGameStateBatchView`` for the payload."""
+
+    @method_decorator(csrf_protect)
+    @method_decorator(rate_limit('save_batch'))
+    @method_decorator(require_http_methods(["POST"]))
+    async def post(self, request):
+        try:
+            session_key = request.session.session_key
+            if not session_key:
+                return JsonResponse({'error': 'Invalid session'}, status=401)
+
+            snapshots, base_version, error = self._parse_snapshots(request)
+            if error:
+                return error
+
+            buffered = None
+            if state_buffer.enabled:
+                buffered = await state_buffer.atake(session_key)
+                if buffered:
+                    snapshots = [buffered] + snapshots
+
+            try:
+                version, milestones = await sync_to_async(self._write_full)(
+                    session_key, self._fold(snapshots), snapshots, base_version
+                )
+            except views.VersionConflict as e:
+                if buffered:
+                    await sync_to_async(state_buffer.restore)(session_key, buffered)
+                return JsonResponse({'error': 'Version conflict', 'version': e.version}, status=409)
+            return self._batch_response(version, len(snapshots), milestones)
+
+        except RetroGameSession.DoesNotExist:
+            return JsonResponse({'error': 'Game session not found'}, status=404)
+        except Exception as e:
+            logger.error(f"Error in save_game_state_batch: {str(e)}", exc_info=True)
+            return JsonResponse({'error': 'Internal server error'}, status=500)
+
+
+@require_http_methods(["GET"])
+async def load_game_state(request):
+    """Async load-state endpoint, served from the payload cache when warm"""
+    try:
+        session_key = request.session.session_key
+
+        if not session_key:
+            return JsonResponse({'error': 'No session found'}, status=400)
+
+        entry = await state_cache.aget(session_key)
+        if entry is None:
+            game_session = await aget_object_or_404(RetroGameSession, session_key=session_key)
+            game_state, _ = await RetroGameState.objects.aget_or_create(session=game_session)
+
+            # Overlay an autosave that has not been flushed yet
+            buffered = await state_buffer.aget(session_key) if state_buffer.enabled else None
+            if buffered:
+                game_session.apply_save_data(buffered)
+                game_state.apply_save_data(buffered)
+
+            entry = await state_cache.aset(session_key, build_payload(game_session, game_state))
+
+        return views._conditional_json(request, entry['etag'], lambda: entry['payload'], private=True)
+
+    except Exception as e:
+        logger.error(f"Error loading game state: {str(e)}")
+        return JsonResponse({'error': 'Failed to load game state'}, status=500)
+
+
+class SubmitHighScoreView(views.SubmitHighScoreView):
+    """Async score submission; see ``views.SubmitHighScoreView`` for the payload."""
+
+    @method_decorator(csrf_protect)
+    @method_decorator(rate_limit('submit_score'))
+    @method_decorator(require_http_methods(["POST"]))
+    async def post(self, request):
+        try:
+            try:
+                data = fast_json.loads(request.body)
+            except fast_json.DECODE_ERRORS as e:
+                logger.warning(f"Invalid JSON in submit_high_score: {str(e)}")
+                return JsonResponse({'error': 'Invalid JSON data'}, status=400)
+
+            validation_errors = self._validate_high_score_data(data)
+            if validation_errors:
+                return JsonResponse(
+                    {'error': 'Validation failed', 'details': validation_errors},
+                    status=400
+                )
+
+            user = await request.auser()
+            user = user if user.is_authenticated else None
+            return await sync_to_async(self._record_score)(user, data)
+
+        except Exception as e:
+            logger.error(f"Error in submit_high_score: {str(e)}", exc_info=True)
+            return JsonResponse({'error': 'Internal server error'}, status=500)
+
+
+@require_http_methods(["GET"])
+async def high_scores(request):
+    """Async high-scores endpoint (?window=all|weekly|daily)"""
+    try:
+        try:
+            limit = int(request.GET.get('limit', 10))
+        except ValueError:
+            return JsonResponse({'error': 'Invalid limit'}, status=400)
+        board = LEADERBOARDS.get(request.GET.get('window', 'all'))
+        if board is None:
+            return JsonResponse({'error': 'Unknown leaderboard window'}, status=400)
+        limit = max(1, min(limit, board.size))
+
+        data = await board.aboard()
+        return views._conditional_json(
+            request,
+            views._board_etag(board, data['version'], limit),
+            lambda: {
+                'window': board.name,
+                'high_scores': [views._serialize_entry(entry) for entry in data['entries'][:limit]]
+            }
+        )
+
+    except Exception as e:
+        logger.error(f"Error fetching high scores: {str(e)}")
+        return JsonResponse({'error': 'Failed to fetch high scores'}, status=500)
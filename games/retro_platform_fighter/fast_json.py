@@ -0,0 +1,100 @@
+"""
+JSON parsing and rendering for the Retro Platform Fighter API.
+
+Request bodies are parsed straight from bytes and responses are rendered to
+bytes, without the intermediate ``str`` copies of ``json.loads(body.decode())``
+and ``JsonResponse``. ``settings.API_JSON_BACKEND`` picks the codec:
+
+- ``'auto'`` (default): orjson when it is installed, otherwise the stdlib
+- ``'orjson'``: the C-accelerated orjson package
+- ``'stdlib'``: the ``json`` module, rendering exactly like ``django.http.JsonResponse``
+
+Values JSON has no type for (datetimes, Decimals, UUIDs, lazy strings) are
+rendered by ``DjangoJSONEncoder`` with either codec, so responses carry the
+same values whichever is active; only the whitespace differs.
+"""
+
+import json
+from typing import Any
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Raised by loads for malformed JSON or bodies that are not valid UTF-8
+DECODE_ERRORS = (json.JSONDecodeError, UnicodeDecodeError)
+
+
+class StdlibCodec:
+    """The stdlib ``json`` module."""
+
+    name = 'stdlib'
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj, cls=DjangoJSONEncoder).encode('utf-8')
+
+
+class OrjsonCodec:
+    """orjson, with Django's encoder for the types it does not handle natively."""
+
+    name = 'orjson'
+    # Non-string keys (per-level maps) and datetimes handed to DjangoJSONEncoder
+    OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME if orjson else 0
+
+    def __init__(self):
+        self._default = DjangoJSONEncoder().default
+
+    def loads(self, data: bytes) -> Any:
+        return orjson.loads(data)
+
+    def dumps(self, obj: Any) -> bytes:
+        return orjson.dumps(obj, default=self._default, option=self.OPTIONS)
+
+
+CODECS = {'stdlib': StdlibCodec()}
+if orjson is not None:
+    CODECS['orjson'] = OrjsonCodec()
+
+
+def get_codec():
+    """Return the codec selected by ``settings.API_JSON_BACKEND``."""
+    name = getattr(settings, 'API_JSON_BACKEND', 'auto')
+    if name == 'auto':
+        return CODECS.get('orjson', CODECS['stdlib'])
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ImproperlyConfigured(
+            f"API_JSON_BACKEND '{name}' is not available; choose from auto, {', '.join(CODECS)}"
+        )
+
+
+def loads(data: bytes) -> Any:
+    """Parse a JSON document from bytes; raises one of ``DECODE_ERRORS``."""
+    return get_codec().loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    """Render obj as UTF-8 encoded JSON."""
+    return get_codec().dumps(obj)
+
+
+class JsonResponse(HttpResponse):
+    """Drop-in replacement for ``django.http.JsonResponse`` rendered with ``dumps``."""
+
+    def __init__(self, data: Any, safe: bool = True, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError(
+                'In order to allow non-dict objects to be serialized set the safe parameter to False.'
+            )
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
@@ -0,0 +1,638 @@
+"""
+Materialized leaderboard read model for Retro Platform Fighter.
+
+The top ``settings.MAX_HIGH_SCORES`` entries are kept as a ready-to-render
+list in the cache. A qualifying submission is inserted into the list in
+place, so both the high-scores API and the leaderboard page are served
+without a query and show a new high score as soon as it is committed. The
+list is rebuilt from ``RetroHighScore`` whenever it is missing. Every
+submission bumps a change counter kept next to the list. A rebuild is only
+kept if that counter did not move while it read the table, so a rebuild that
+raced a submission cannot cache a list without that score. Deleting a score
+bumps the same counter and drops the boards it was on once the delete
+commits.
+
+Daily and weekly boards work the same way, keyed by the window they cover and
+expiring shortly after it ends. Windows are calendar days and ISO weeks in
+UTC. Each level also has its own board of the best scores of players who
+reached it (ended the run on that level or a later one), plus a score
+histogram per level, so the community page can show every level without
+scanning the table.
+
+Deeper pages of the full table are served by keyset pagination on
+``(-score, -created_at, id)`` with opaque cursors, so the cost of a page does
+not depend on how far down the table it is.
+
+Scores moved to ``RetroHighScoreArchive`` are still part of the leaderboard:
+the rank index and the histogram count them, and keyset pages merge the two
+tables, so every rank shown has an entry a page can reach. Only the cached
+boards, which the retention policy never archives from, read the live table
+alone.
+"""
+
+import logging
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import RetroHighScore, RetroHighScoreArchive, is_moving_to_archive
+from .ranking import MAX_SCORE, rank_index
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'leaderboard'
+LOCK_TIMEOUT = 5
+CURSOR_SALT = 'retro_platform_fighter.leaderboard.cursor'
+FAR_FUTURE = datetime(9999, 12, 31, tzinfo=dt_timezone.utc)
+LEVELS = range(1, 11)
+# Every table holding leaderboard entries, live and archived
+SCORE_MODELS = (RetroHighScore, RetroHighScoreArchive)
+
+
+def entry_from_score(high_score: RetroHighScore) -> Dict[str, Any]:
+    """Build a leaderboard entry from a high score row."""
+    return {
+        'id': high_score.id,
+        'player_name': high_score.player_name,
+        'score': high_score.score,
+        'level_reached': high_score.level_reached,
+        'created_at': high_score.created_at,
+    }
+
+
+def _sort_key(entry: Dict[str, Any]):
+    return (-entry['score'], -entry['created_at'].timestamp(), entry['id'])
+
+
+def _assign_ranks(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Give every entry its rank; equal scores share the higher rank."""
+    previous_score = None
+    rank = 0
+    for position, entry in enumerate(entries, start=1):
+        if entry['score'] != previous_score:
+            rank = position
+            previous_score = entry['score']
+        entry['rank'] = rank
+    return entries
+
+
+def _record_change(key: str) -> None:
+    """Bump the change counter of a cached read model."""
+    changes_key = f'{key}:changes'
+    try:
+        cache.incr(changes_key)
+    except ValueError:
+        if not cache.add(changes_key, 1, timeout=None):
+            cache.incr(changes_key)
+
+
+def _store_rebuilt(key: str, value: Any, timeout: Optional[int], changes: Optional[int]) -> None:
+    """
+    Cache a rebuilt read model unless a submission raced the rebuild.
+
+    changes is the model's change counter, read before the rebuild queried
+    the database. The value is stored under the model's lock and the counter
+    checked afterwards: if it moved, a submission may be missing from value
+    and the entry is dropped again. Later submissions find the entry and
+    update it themselves.
+    """
+    lock_key = f'{key}:lock'
+    if not cache.add(lock_key, True, timeout=LOCK_TIMEOUT):
+        # A submission is updating the model; serve this copy uncached
+        return
+    try:
+        cache.set(key, value, timeout=timeout)
+        if cache.get(f'{key}:changes') != changes:
+            logger.info(f"{key} changed during rebuild, invalidating")
+            cache.delete(key)
+    finally:
+        cache.delete(lock_key)
+
+
+class Leaderboard:
+    """A maintained top-N list of high scores stored in the cache."""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    @property
+    def key(self) -> str:
+        return f'{KEY_PREFIX}:{self.name}'
+
+    @property
+    def size(self) -> int:
+        return getattr(settings, 'MAX_HIGH_SCORES', 100)
+
+    @property
+    def timeout(self) -> Optional[int]:
+        """Cache lifetime of the list; None keeps it until it is replaced."""
+        return None
+
+    def queryset(self):
+        """High scores eligible for this board, best first."""
+        return RetroHighScore.objects.order_by('-score', '-created_at', 'id')
+
+    def accepts(self, entry: Dict[str, Any]) -> bool:
+        """Whether an entry belongs on this board at all."""
+        return True
+
+    @property
+    def changes_key(self) -> str:
+        return f'{self.key}:changes'
+
+    def _board(self, entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            'version': time.time_ns() // 1000,
+            'entries': _assign_ranks(entries),
+        }
+
+    def _store(self, entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        board = self._board(entries)
+        cache.set(self.key, board, timeout=self.timeout)
+        return board
+
+    def _store_rebuilt(self, entries: List[Dict[str, Any]], changes: Optional[int]) -> Dict[str, Any]:
+        board = self._board(entries)
+        _store_rebuilt(self.key, board, self.timeout, changes)
+        return board
+
+    def rebuild(self) -> Dict[str, Any]:
+        """Reload the board from the database."""
+        changes = cache.get(self.changes_key)
+        entries = [entry_from_score(score) for score in self.queryset()[:self.size]]
+        return self._store_rebuilt(entries, changes)
+
+    def board(self) -> Dict[str, Any]:
+        """Return the board as ``{'version': ..., 'entries': [...]}``."""
+        board = cache.get(self.key)
+        if board is None:
+            board = self.rebuild()
+        return board
+
+    async def aboard(self) -> Dict[str, Any]:
+        """Async version of ``board``; a rebuild runs in a worker thread."""
+        board = await cache.aget(self.key)
+        if board is None:
+            board = await sync_to_async(self.rebuild)()
+        return board
+
+    def entries(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Return the ranked entries, best first."""
+        entries = self.board()['entries']
+        return entries if limit is None else entries[:limit]
+
+    async def aentries(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        entries = (await self.aboard())['entries']
+        return entries if limit is None else entries[:limit]
+
+    def version(self) -> int:
+        """Return a number that changes whenever the board changes."""
+        return self.board()['version']
+
+    def submit(self, entry: Dict[str, Any]) -> bool:
+        """
+        Insert a newly committed score if it qualifies for the board.
+
+        If another process is updating the board at the same time, the board
+        is dropped instead so the next read rebuilds it from the database.
+
+        Returns:
+            True if the board changed
+        """
+        if not self.accepts(entry):
+            return False
+        _record_change(self.key)
+        board = cache.get(self.key)
+        if board is None:
+            return False
+        entries = board['entries']
+        if len(entries) >= self.size and _sort_key(entry) > _sort_key(entries[-1]):
+            return False
+
+        lock_key = f'{self.key}:lock'
+        if not cache.add(lock_key, True, timeout=LOCK_TIMEOUT):
+            logger.info(f"Leaderboard {self.name} busy, invalidating")
+            self.invalidate()
+            return True
+        try:
+            board = cache.get(self.key)
+            if board is None:
+                return False
+            entries = [e for e in board['entries'] if e['id'] != entry['id']]
+            entries.append(dict(entry))
+            entries.sort(key=_sort_key)
+            self._store(entries[:self.size])
+            return True
+        finally:
+            cache.delete(lock_key)
+
+    def remove(self, entry: Dict[str, Any]) -> None:
+        """Drop the board if a deleted score was on it."""
+        if not self.accepts(entry):
+            return
+        # Also stops a rebuild that read the score before the delete committed
+        _record_change(self.key)
+        board = cache.get(self.key)
+        if board is not None and any(e['id'] == entry['id'] for e in board['entries']):
+            self.invalidate()
+
+    def invalidate(self) -> None:
+        """Drop the board so the next read rebuilds it."""
+        cache.delete(self.key)
+
+
+class WindowedLeaderboard(Leaderboard):
+    """A top-N list restricted to the current day or week."""
+
+    # Keep a finished window around briefly for clients still showing it
+    GRACE_PERIOD = 60 * 60
+
+    def __init__(self, name: str, days: int):
+        super().__init__(name)
+        self.days = days
+
+    def window(self, moment: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+        """Return the UTC start and end of the window containing moment."""
+        moment = (moment or timezone.now()).astimezone(dt_timezone.utc)
+        start = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+        if self.days == 7:
+            start -= timedelta(days=start.weekday())
+        return start, start + timedelta(days=self.days)
+
+    @property
+    def key(self) -> str:
+        start, _ = self.window()
+        return f'{KEY_PREFIX}:{self.name}:{start.date().isoformat()}'
+
+    @property
+    def timeout(self) -> Optional[int]:
+        _, end = self.window()
+        return int((end - timezone.now()).total_seconds()) + self.GRACE_PERIOD
+
+    def queryset(self):
+        start, end = self.window()
+        return super().queryset().filter(created_at__gte=start, created_at__lt=end)
+
+    def accepts(self, entry: Dict[str, Any]) -> bool:
+        start, end = self.window()
+        return start <= entry['created_at'] < end
+
+
+class LevelLeaderboard(Leaderboard):
+    """A top-N list of the scores whose run reached one level."""
+
+    def __init__(self, level: int):
+        super().__init__(f'level:{level}')
+        self.level = level
+
+    @property
+    def size(self) -> int:
+        return getattr(settings, 'LEVEL_LEADERBOARD_SIZE', 10)
+
+    def queryset(self):
+        return super().queryset().filter(level_reached__gte=self.level)
+
+    def rebuild(self) -> Dict[str, Any]:
+        """Reload the board from the database."""
+        changes = cache.get(self.changes_key)
+        level_tops = level_top_entries(range(self.level, LEVELS[-1] + 1), self.size)
+        return self._store_rebuilt(self.merge(level_tops), changes)
+
+    def merge(self, level_tops: Dict[int, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Pick this board's entries from the per-level tops of ``level_top_entries``."""
+        entries = [entry for level, top in level_tops.items() if level >= self.level for entry in top]
+        entries.sort(key=_sort_key)
+        return entries[:self.size]
+
+    def accepts(self, entry: Dict[str, Any]) -> bool:
+        return entry['level_reached'] >= self.level
+
+
+def level_top_entries(levels: Iterable[int], size: int) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    The best size entries that ended on each of levels.
+
+    One highscore_level_rank_idx range scan per level; a board of players who
+    reached level L is the merge of these lists for L and every later level.
+    """
+    queryset = RetroHighScore.objects.order_by('-score', '-created_at', 'id')
+    return {
+        level: [entry_from_score(score) for score in queryset.filter(level_reached=level)[:size]]
+        for level in levels
+    }
+
+
+class ScoreHistogram:
+    """
+    Per-level counts of scores in fixed-width buckets, stored in the cache.
+
+    The histogram is built with one grouped query per score table, live and
+    archived, and then kept current by submissions, using the same
+    lock-or-invalidate rule and change counter as the boards.
+    """
+
+    key = f'{KEY_PREFIX}:histogram'
+
+    @property
+    def bucket_size(self) -> int:
+        return getattr(settings, 'SCORE_HISTOGRAM_BUCKET_SIZE', 10000)
+
+    def bucket(self, score: int) -> int:
+        """Return the bucket index of a score."""
+        return min(max(score, 0), MAX_SCORE) // self.bucket_size
+
+    def rebuild(self) -> Dict[int, List[int]]:
+        """Recount every level from the database."""
+        changes = cache.get(f'{self.key}:changes')
+        buckets = MAX_SCORE // self.bucket_size + 1
+        counts = {level: [0] * buckets for level in LEVELS}
+        for model in SCORE_MODELS:
+            rows = (model.objects
+                .order_by()
+                .annotate(bucket=F('score') / self.bucket_size)
+                .values('level_reached', 'bucket')
+                .annotate(count=Count('id')))
+            for row in rows:
+                if row['level_reached'] in counts:
+                    bucket = min(max(row['bucket'], 0), buckets - 1)
+                    counts[row['level_reached']][bucket] += row['count']
+        _store_rebuilt(self.key, counts, None, changes)
+        return counts
+
+    def counts(self) -> Dict[int, List[int]]:
+        """Return ``{level: [count per bucket]}`` of the scores that ended on each level."""
+        counts = cache.get(self.key)
+        if counts is None:
+            counts = self.rebuild()
+        return counts
+
+    def reached_counts(self) -> Dict[int, List[int]]:
+        """Return ``{level: [count per bucket]}`` of the scores that reached each level."""
+        counts = self.counts()
+        reached = {}
+        running = [0] * len(counts[LEVELS[-1]])
+        for level in reversed(LEVELS):
+            running = [total + count for total, count in zip(running, counts[level])]
+            reached[level] = running
+        return reached
+
+    def submit(self, entry: Dict[str, Any]) -> None:
+        """Count a newly committed score."""
+        if entry['level_reached'] not in LEVELS:
+            return
+        _record_change(self.key)
+        if cache.get(self.key) is None:
+            return
+        lock_key = f'{self.key}:lock'
+        if not cache.add(lock_key, True, timeout=LOCK_TIMEOUT):
+            self.invalidate()
+            return
+        try:
+            counts = cache.get(self.key)
+            if counts is not None:
+                counts[entry['level_reached']][self.bucket(entry['score'])] += 1
+                cache.set(self.key, counts, timeout=None)
+        finally:
+            cache.delete(lock_key)
+
+    def remove(self, entry: Dict[str, Any]) -> None:
+        """Drop the histogram after a counted score was deleted."""
+        _record_change(self.key)
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        """Drop the histogram so the next read recounts it."""
+        cache.delete(self.key)
+
+
+top_scores = Leaderboard('all')
+
+# Every maintained board, by the name used in ?window= parameters
+LEADERBOARDS = {
+    'all': top_scores,
+    'weekly': WindowedLeaderboard('weekly', days=7),
+    'daily': WindowedLeaderboard('daily', days=1),
+}
+
+LEVEL_LEADERBOARDS = {level: LevelLeaderboard(level) for level in LEVELS}
+score_histogram = ScoreHistogram()
+
+
+def level_boards(levels: Iterable[int] = LEVELS) -> Dict[int, Dict[str, Any]]:
+    """
+    Return the boards of several levels with one cache round-trip.
+
+    Boards missing from the cache are rebuilt together, with one index range
+    scan per level they cover.
+    """
+    boards = [LEVEL_LEADERBOARDS[level] for level in levels]
+    cached = cache.get_many([board.key for board in boards])
+    missing = [board for board in boards if board.key not in cached]
+    if missing:
+        changes = cache.get_many([board.changes_key for board in missing])
+        lowest = min(board.level for board in missing)
+        level_tops = level_top_entries(range(lowest, LEVELS[-1] + 1), missing[0].size)
+        for board in missing:
+            cached[board.key] = board._store_rebuilt(board.merge(level_tops), changes.get(board.changes_key))
+    return {board.level: cached[board.key] for board in boards}
+
+
+def submit_to_leaderboards(entry: Dict[str, Any]) -> None:
+    """Insert a committed score into every board it qualifies for."""
+    for board in LEADERBOARDS.values():
+        board.submit(entry)
+    for level_board in LEVEL_LEADERBOARDS.values():
+        level_board.submit(entry)
+    score_histogram.submit(entry)
+
+
+def remove_from_leaderboards(entry: Dict[str, Any]) -> None:
+    """Drop every board and the histogram a deleted score was counted in."""
+    for board in LEADERBOARDS.values():
+        board.remove(entry)
+    for level_board in LEVEL_LEADERBOARDS.values():
+        level_board.remove(entry)
+    score_histogram.remove(entry)
+
+
+@receiver(post_delete, sender=RetroHighScore, dispatch_uid='retro_platform_fighter.leaderboard.score_deleted')
+def remove_deleted_score(sender, instance, **kwargs):
+    if is_moving_to_archive():
+        return
+    entry = entry_from_score(instance)
+    transaction.on_commit(lambda: remove_from_leaderboards(entry))
+
+
+@receiver(post_delete, sender=RetroHighScoreArchive,
+          dispatch_uid='retro_platform_fighter.leaderboard.archived_score_deleted')
+def remove_deleted_archived_score(sender, instance, **kwargs):
+    # Archived scores are only on the histogram
+    entry = entry_from_score(instance)
+    transaction.on_commit(lambda: score_histogram.remove(entry))
+
+
+class InvalidCursor(Exception):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+# A position in leaderboard order: (score, created_at, id)
+Position = Tuple[int, datetime, int]
+
+
+def encode_cursor(position: Position, direction: str) -> str:
+    """Encode a page boundary as an opaque, tamper-proof cursor."""
+    score, created_at, entry_id = position
+    return signing.dumps(
+        [score, created_at.isoformat(), entry_id, direction],
+        salt=CURSOR_SALT,
+        compress=True
+    )
+
+
+def decode_cursor(cursor: str) -> Tuple[Position, str]:
+    """Decode a cursor into its position and direction ('next' or 'prev')."""
+    try:
+        score, created_at, entry_id, direction = signing.loads(cursor, salt=CURSOR_SALT)
+        position = (int(score), datetime.fromisoformat(created_at), int(entry_id))
+    except (signing.BadSignature, ValueError, TypeError) as e:
+        raise InvalidCursor(str(e))
+    if direction not in ('next', 'prev'):
+        raise InvalidCursor('Unknown cursor direction')
+    return position, direction
+
+
+def _position(high_score: RetroHighScore) -> Position:
+    return (high_score.score, high_score.created_at, high_score.id)
+
+
+def _after(position: Position) -> Q:
+    """Rows that come after position in leaderboard order."""
+    score, created_at, entry_id = position
+    return (
+        Q(score__lt=score)
+        | Q(score=score, created_at__lt=created_at)
+        | Q(score=score, created_at=created_at, id__gt=entry_id)
+    )
+
+
+def _before(position: Position) -> Q:
+    """Rows that come before position in leaderboard order."""
+    score, created_at, entry_id = position
+    return (
+        Q(score__gt=score)
+        | Q(score=score, created_at__gt=created_at)
+        | Q(score=score, created_at=created_at, id__lt=entry_id)
+    )
+
+
+def _rows_after(position: Optional[Position], limit: int, inclusive: bool = False) -> List[RetroHighScore]:
+    if position is not None and inclusive:
+        score, created_at, entry_id = position
+        position = (score, created_at, entry_id - 1)
+    rows = []
+    for model in SCORE_MODELS:
+        queryset = model.objects.order_by('-score', '-created_at', 'id')
+        if position is not None:
+            queryset = queryset.filter(_after(position))
+        rows.extend(queryset[:limit])
+    rows.sort(key=lambda row: (row.score, row.created_at, -row.id), reverse=True)
+    return rows[:limit]
+
+
+def _rows_before(position: Position, limit: int) -> List[RetroHighScore]:
+    rows = []
+    for model in SCORE_MODELS:
+        queryset = (model.objects
+            .filter(_before(position))
+            .order_by('score', 'created_at', '-id'))
+        rows.extend(queryset[:limit])
+    rows.sort(key=lambda row: (row.score, row.created_at, -row.id))
+    return rows[:limit][::-1]
+
+
+def _page(rows: List[RetroHighScore], has_prev: bool, has_next: bool) -> Dict[str, Any]:
+    """Serialize a page with ranks from the rank index and its cursors."""
+    ranks = rank_index.ranks(row.score for row in rows)
+    return {
+        'entries': [
+            {
+                'id': row.id,
+                'rank': ranks[row.score],
+                'player_name': row.player_name,
+                'score': row.score,
+                'level_reached': row.level_reached,
+                'created_at': row.created_at.isoformat(),
+            }
+            for row in rows
+        ],
+        'prev': encode_cursor(_position(rows[0]), 'prev') if rows and has_prev else None,
+        'next': encode_cursor(_position(rows[-1]), 'next') if rows and has_next else None,
+    }
+
+
+def keyset_page(cursor: Optional[str], limit: int) -> Dict[str, Any]:
+    """
+    Return one page of the full leaderboard.
+
+    Args:
+        cursor: A ``next``/``prev`` cursor from an earlier page, or None for
+            the first page
+        limit: Number of entries per page
+
+    Raises:
+        InvalidCursor: If the cursor is malformed or was tampered with
+    """
+    if cursor is None:
+        rows = _rows_after(None, limit + 1)
+        return _page(rows[:limit], has_prev=False, has_next=len(rows) > limit)
+
+    position, direction = decode_cursor(cursor)
+    if direction == 'next':
+        rows = _rows_after(position, limit + 1)
+        return _page(rows[:limit], has_prev=True, has_next=len(rows) > limit)
+
+    rows = _rows_before(position, limit + 1)
+    return _page(rows[-limit:], has_prev=len(rows) > limit, has_next=True)
+
+
+def page_around(limit: int, entry_id: Optional[int] = None,
+                score: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """
+    Return a page centred on an entry, or on where a score would be placed.
+
+    Returns:
+        The page, or None if entry_id does not exist
+    """
+    if entry_id is not None:
+        anchor = (RetroHighScore.objects.filter(id=entry_id).first()
+                  or RetroHighScoreArchive.objects.filter(id=entry_id).first())
+        if anchor is None:
+            return None
+        position = _position(anchor)
+        inclusive = True
+    else:
+        # A new score is placed above every existing entry with the same score
+        position = (score, FAR_FUTURE, 0)
+        inclusive = False
+
+    above = limit // 2
+    before = _rows_before(position, above + 1)
+    has_prev = len(before) > above
+    before = before[len(before) - above:] if has_prev else before
+    shown_after = limit - len(before)
+    after = _rows_after(position, shown_after + 1, inclusive=inclusive)
+    return _page(
+        before + after[:shown_after],
+        has_prev=has_prev,
+        has_next=len(after) > shown_after
+    )
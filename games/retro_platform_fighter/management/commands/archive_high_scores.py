@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from games.retro_platform_fighter.retention import archivable_high_scores, archive_high_scores
+
+
+class Command(BaseCommand):
+    """Move high scores that no leaderboard shows to the archive table in chunks."""
+    
+    help = 'Archive high scores outside the top scores, level boards and current week, in small batches'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Scores moved per transaction (default: 500)')
+        parser.add_argument('--sleep', type=float, default=0.1, help='Seconds to pause between batches (default: 0.1)')
+        parser.add_argument('--max-batches', type=int, help='Stop after this many batches')
+        parser.add_argument(
+            '--keep-user-bests',
+            action='store_true',
+            default=None,
+            help='Keep every user\'s best score live (default: settings.HIGH_SCORE_KEEP_USER_BESTS)'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only count the scores that would be archived')
+    
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            count = archivable_high_scores(options['keep_user_bests']).count()
+            self.stdout.write(f"{count} high scores would be archived")
+            return
+        
+        def progress(batch, archived):
+            if options['verbosity'] >= 2:
+                self.stdout.write(f"  batch {batch}: {archived} scores archived")
+        
+        result = archive_high_scores(
+            batch_size=options['batch_size'],
+            sleep=options['sleep'],
+            keep_user_bests=options['keep_user_bests'],
+            max_batches=options['max_batches'],
+            progress=progress
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {result.scores} high scores in {result.batches} batches, "
+            f"{result.elapsed:.2f}s ({result.rate:.0f} scores/s)"
+        ))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from games.retro_platform_fighter.retention import purge_stale_sessions, stale_sessions
+
+
+class Command(BaseCommand):
+    """Delete inactive game sessions in throttled, primary-key-ordered chunks."""
+    
+    help = 'Delete game sessions not saved for --days days, in small batches that are safe under live traffic'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='Inactivity in days before a session is deleted (default: 30)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Sessions deleted per transaction (default: 500)')
+        parser.add_argument('--sleep', type=float, default=0.1, help='Seconds to pause between batches (default: 0.1)')
+        parser.add_argument('--max-batches', type=int, help='Stop after this many batches')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the sessions that would be deleted')
+    
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            count = stale_sessions(options['days']).count()
+            self.stdout.write(f"{count} game sessions not saved for {options['days']} days would be deleted")
+            return
+        
+        def progress(batch, deleted):
+            if options['verbosity'] >= 2:
+                self.stdout.write(f"  batch {batch}: {deleted} sessions deleted")
+        
+        result = purge_stale_sessions(
+            days_old=options['days'],
+            batch_size=options['batch_size'],
+            sleep=options['sleep'],
+            max_batches=options['max_batches'],
+            progress=progress
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {result.sessions} game sessions in {result.batches} batches, "
+            f"{result.elapsed:.2f}s ({result.rate:.0f} sessions/s)"
+        ))
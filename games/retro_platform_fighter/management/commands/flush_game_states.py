@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from games.retro_platform_fighter.state_buffer import state_buffer
+
+
+class Command(BaseCommand):
+    """Write the autosaves buffered by write-behind mode to the database."""
+    
+    help = 'Flush buffered save-state autosaves to the database; run it every few seconds from a scheduler'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--due',
+            action='store_true',
+            help='Only flush once the oldest snapshot exceeds settings.GAME_STATE_MAX_STALENESS'
+        )
+    
+    def handle(self, *args, **options):
+        if not state_buffer.enabled:
+            self.stdout.write('Write-behind is disabled; nothing to flush')
+            return
+        written = state_buffer.flush_due() if options['due'] else state_buffer.flush()
+        self.stdout.write(self.style.SUCCESS(f'Flushed {written} buffered game states'))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from games.retro_platform_fighter.leaderboard import LEADERBOARDS
+
+
+class Command(BaseCommand):
+    """Rebuild materialized leaderboards from the RetroHighScore table."""
+    
+    help = 'Rebuild the all-time, weekly and daily leaderboards from stored high scores'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--window',
+            action='append',
+            choices=sorted(LEADERBOARDS),
+            help='Leaderboard to rebuild; may be repeated (default: all of them)'
+        )
+    
+    def handle(self, *args, **options):
+        for name in options['window'] or LEADERBOARDS:
+            started = time.monotonic()
+            board = LEADERBOARDS[name].rebuild()
+            elapsed = time.monotonic() - started
+            self.stdout.write(self.style.SUCCESS(
+                f"Rebuilt {name} leaderboard: {len(board['entries'])} entries in {elapsed:.2f}s"
+            ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from games.retro_platform_fighter.ranking import rank_index
+
+
+class Command(BaseCommand):
+    """Rebuild the high-score rank index from the live and archived high scores."""
+    
+    help = 'Rebuild the high-score rank index from stored and archived high scores'
+    
+    def handle(self, *args, **options):
+        indexed = rank_index.rebuild()
+        if indexed < 0:
+            raise CommandError('Another process is already rebuilding the rank index')
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} high scores'))
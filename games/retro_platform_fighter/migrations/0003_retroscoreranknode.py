@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-18 02:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('retro_platform_fighter', '0002_alter_retrogamesession_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RetroScoreRankNode',
+            fields=[
+                ('position', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Score Rank Node',
+                'verbose_name_plural': 'Score Rank Nodes',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 02:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('retro_platform_fighter', '0003_retroscoreranknode'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='retrogamestate',
+            name='version',
+            field=models.PositiveIntegerField(default=0, help_text='Write counter used as the base of delta saves'),
+        ),
+    ]
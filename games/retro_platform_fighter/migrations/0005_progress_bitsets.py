@@ -0,0 +1,104 @@
+import json
+import logging
+
+from django.db import migrations, models
+
+logger = logging.getLogger(__name__)
+
+# Highest progress ID that fits in a signed 64-bit bitset column
+MAX_PROGRESS_ID = 62
+BATCH_SIZE = 1000
+
+
+def _load_ids(value):
+    """Read a stored JSON progress list, tolerating legacy string payloads."""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value or '[]')
+        except json.JSONDecodeError:
+            return []
+    return value if isinstance(value, list) else []
+
+
+def _to_mask(value):
+    """Return the bitset of a stored progress list and the entries that do not fit in it."""
+    mask = 0
+    dropped = []
+    for item in _load_ids(value):
+        if isinstance(item, str) and item.isdigit():
+            item = int(item)
+        if isinstance(item, int) and not isinstance(item, bool) and 0 <= item <= MAX_PROGRESS_ID:
+            mask |= 1 << item
+        else:
+            dropped.append(item)
+    return mask, dropped
+
+
+def _to_ids(mask):
+    return [bit for bit in range(MAX_PROGRESS_ID + 1) if mask & (1 << bit)]
+
+
+def lists_to_bitsets(apps, schema_editor):
+    RetroGameState = apps.get_model('retro_platform_fighter', 'RetroGameState')
+    batch = []
+    dropped_states = 0
+    for state in RetroGameState.objects.only('id', 'robots_defeated', 'diamonds_collected').iterator():
+        state.robots_defeated_mask, dropped_robots = _to_mask(state.robots_defeated)
+        state.diamonds_collected_mask, dropped_diamonds = _to_mask(state.diamonds_collected)
+        if dropped_robots or dropped_diamonds:
+            dropped_states += 1
+            logger.warning(
+                f"Game state {state.id}: dropped progress IDs outside 0-{MAX_PROGRESS_ID}: "
+                f"robots {dropped_robots!r}, diamonds {dropped_diamonds!r}"
+            )
+        batch.append(state)
+        if len(batch) >= BATCH_SIZE:
+            RetroGameState.objects.bulk_update(batch, ['robots_defeated_mask', 'diamonds_collected_mask'])
+            batch = []
+    if batch:
+        RetroGameState.objects.bulk_update(batch, ['robots_defeated_mask', 'diamonds_collected_mask'])
+    if dropped_states:
+        logger.warning(f"Dropped invalid progress IDs from {dropped_states} game states")
+
+
+def bitsets_to_lists(apps, schema_editor):
+    RetroGameState = apps.get_model('retro_platform_fighter', 'RetroGameState')
+    batch = []
+    for state in RetroGameState.objects.only('id', 'robots_defeated_mask', 'diamonds_collected_mask').iterator():
+        state.robots_defeated = _to_ids(state.robots_defeated_mask)
+        state.diamonds_collected = _to_ids(state.diamonds_collected_mask)
+        batch.append(state)
+        if len(batch) >= BATCH_SIZE:
+            RetroGameState.objects.bulk_update(batch, ['robots_defeated', 'diamonds_collected'])
+            batch = []
+    if batch:
+        RetroGameState.objects.bulk_update(batch, ['robots_defeated', 'diamonds_collected'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('retro_platform_fighter', '0004_retrogamestate_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='retrogamestate',
+            name='diamonds_collected_mask',
+            field=models.BigIntegerField(default=0, help_text='Bitset of diamond IDs collected in the current level'),
+        ),
+        migrations.AddField(
+            model_name='retrogamestate',
+            name='robots_defeated_mask',
+            field=models.BigIntegerField(default=0, help_text='Bitset of robot IDs defeated in the current level'),
+        ),
+        migrations.RunPython(lists_to_bitsets, bitsets_to_lists),
+        migrations.RemoveField(
+            model_name='retrogamestate',
+            name='diamonds_collected',
+        ),
+        migrations.RemoveField(
+            model_name='retrogamestate',
+            name='robots_defeated',
+        ),
+    ]
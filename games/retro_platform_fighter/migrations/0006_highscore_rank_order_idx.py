@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 02:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('retro_platform_fighter', '0005_progress_bitsets'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='retrohighscore',
+            options={'ordering': ['-score', '-created_at'], 'verbose_name': 'High Score', 'verbose_name_plural': 'High Scores'},
+        ),
+        migrations.AddIndex(
+            model_name='retrohighscore',
+            index=models.Index(fields=['-score', '-created_at', 'id'], name='highscore_rank_order_idx'),
+        ),
+    ]
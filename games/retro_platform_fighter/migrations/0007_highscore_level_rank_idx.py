@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 02:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('retro_platform_fighter', '0006_highscore_rank_order_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='retrohighscore',
+            index=models.Index(fields=['level_reached', '-score', '-created_at', 'id'], name='highscore_level_rank_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-18 02:16
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('retro_platform_fighter', '0007_highscore_level_rank_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RetroGameMilestone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('boss_defeated', 'Boss defeated'), ('level_completed', 'Level completed')], max_length=20)),
+                ('level', models.IntegerField(validators=[django.core.validators.MinValueValidator(1, message='Level must be at least 1'), django.core.validators.MaxValueValidator(10, message='Level cannot exceed 10')])),
+                ('score', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='milestones', to='retro_platform_fighter.retrogamesession')),
+            ],
+            options={
+                'verbose_name': 'Game Milestone',
+                'verbose_name_plural': 'Game Milestones',
+                'ordering': ['created_at'],
+                'constraints': [models.UniqueConstraint(fields=('session', 'kind', 'level'), name='unique_session_milestone')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 02:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('retro_platform_fighter', '0009_retrohighscorearchive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='retrohighscorearchive',
+            index=models.Index(fields=['-score', '-created_at', 'id'], name='archive_rank_order_idx'),
+        ),
+    ]
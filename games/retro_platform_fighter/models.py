@@ -1,9 +1,12 @@
 from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
-import json
-from datetime import timedelta
-from django.utils import timezone
+from contextlib import contextmanager
+from contextvars import ContextVar
+import logging
+
+logger = logging.getLogger(__name__)
 
 class RetroGameSession(models.Model):
     """
@@ -69,11 +72,51 @@ class RetroGameSession(models.Model):
         ]
         ordering = ['-created_at']
     
+    @staticmethod
+    def save_data_updates(data: dict) -> dict:
+        """Return the validated field updates carried by a save-state payload."""
+        updates = {}
+        if 'level' in data and 1 <= data['level'] <= 10:
+            updates['current_level'] = data['level']
+        if 'diamonds' in data and 0 <= data['diamonds'] <= 1000:
+            updates['diamonds'] = data['diamonds']
+        if 'lives' in data and 0 <= data['lives'] <= 10:
+            updates['lives'] = data['lives']
+        if 'score' in data and 0 <= data['score'] <= 1000000:
+            updates['score'] = data['score']
+        if 'playerX' in data:
+            updates['player_x'] = float(data['playerX'])
+        if 'playerY' in data:
+            updates['player_y'] = float(data['playerY'])
+        return updates
+    
+    def apply_save_data(self, data: dict) -> None:
+        """Update session fields from a save-state payload, ignoring invalid values."""
+        for field, value in self.save_data_updates(data).items():
+            setattr(self, field, value)
+    
+    @classmethod
+    def adopt(cls, old_key: str, new_key: str) -> bool:
+        """
+        Re-key the game session of a rotated Django session in place.
+        
+        Returns:
+            True if a game session was stored under old_key
+        """
+        return cls.objects.filter(session_key=old_key).update(session_key=new_key) > 0
+    
     @classmethod
     def cleanup_old_sessions(cls, days_old=30):
-        """Remove game sessions older than the specified number of days."""
-        cutoff_date = timezone.now() - timedelta(days=days_old)
-        return cls.objects.filter(created_at__lt=cutoff_date).delete()
+        """
+        Remove game sessions not saved for the specified number of days.
+        
+        Deletes in chunks; see ``retention.purge_stale_sessions``.
+        
+        Returns:
+            Number of sessions removed
+        """
+        from .retention import purge_stale_sessions
+        return purge_stale_sessions(days_old).sessions
     
     def __str__(self):
         return f"Retro Fighter Session {self.session_key} - Level {self.current_level}"
@@ -117,41 +160,151 @@ class RetroHighScore(models.Model):
     
     class Meta:
         indexes = [
-            models.Index(fields=['-score', '-created_at']),
+            # Matches the leaderboard order and its keyset pagination
+            models.Index(fields=['-score', '-created_at', 'id'], name='highscore_rank_order_idx'),
+            # Per-level boards: one range scan per level in the same order
+            models.Index(
+                fields=['level_reached', '-score', '-created_at', 'id'],
+                name='highscore_level_rank_idx'
+            ),
         ]
         ordering = ['-score', '-created_at']
         verbose_name = "High Score"
         verbose_name_plural = "High Scores"
     
+    def __str__(self):
+        return f"{self.player_name}: {self.score} points"
+
+
+
+class RetroHighScoreArchive(models.Model):
+    """
+    High score moved out of the live table by the retention policy.
+    
+    Rows keep their original ID and values. They still count towards ranks,
+    percentiles and the level histograms, and the paged leaderboard reaches
+    them through the same ordering index as the live table.
+    
+    Attributes:
+        id: ID the score had in the live table
+        user: Optional user who achieved the score
+        player_name: Display name for the score
+        score: Achieved score
+        level_reached: Highest level reached
+        created_at: When the score was achieved
+        archived_at: When the score was archived
+    """
+    id = models.BigIntegerField(primary_key=True)
+    # Indexed so deleting a user does not scan the whole archive for the cascade
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True
+    )
+    player_name = models.CharField(max_length=50)
+    score = models.IntegerField()
+    level_reached = models.IntegerField()
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
     class Meta:
-        ordering = ['-score', '-created_at']
+        indexes = [
+            # Keyset pagination merges the archive into the live leaderboard order
+            models.Index(fields=['-score', '-created_at', 'id'], name='archive_rank_order_idx'),
+        ]
+        verbose_name = "Archived High Score"
+        verbose_name_plural = "Archived High Scores"
     
     def __str__(self):
-        return f"{self.player_name}: {self.score} points"
+        return f"{self.player_name}: {self.score} points (archived)"
+
+
+_moving_to_archive = ContextVar('retro_high_score_moving_to_archive', default=False)
+
+
+@contextmanager
+def moving_to_archive():
+    """
+    Mark the ``RetroHighScore`` deletes in this block as moves to the archive.
+    
+    Moved scores still count towards ranks, histograms and pages, so the
+    ``post_delete`` receivers leave the derived data alone for them.
+    """
+    token = _moving_to_archive.set(True)
+    try:
+        yield
+    finally:
+        _moving_to_archive.reset(token)
+
+
+def is_moving_to_archive() -> bool:
+    """Whether high-score deletes are currently moves to the archive."""
+    return _moving_to_archive.get()
+
+# Highest progress ID that fits in a signed 64-bit bitset column
+MAX_PROGRESS_ID = 62
+
+
+def is_progress_id(item) -> bool:
+    """Whether item can be stored in a progress bitset."""
+    return isinstance(item, int) and not isinstance(item, bool) and 0 <= item <= MAX_PROGRESS_ID
+
+
+def ids_to_mask(ids: list) -> int:
+    """Encode a list of progress IDs as a bitset."""
+    mask = 0
+    for item in ids:
+        if not is_progress_id(item):
+            raise ValueError(f"Progress IDs must be integers between 0 and {MAX_PROGRESS_ID}")
+        mask |= 1 << item
+    return mask
+
+
+def mask_to_ids(mask: int) -> list:
+    """Decode a progress bitset into a sorted list of IDs."""
+    ids = []
+    while mask:
+        lowest = mask & -mask
+        ids.append(lowest.bit_length() - 1)
+        mask ^= lowest
+    return ids
+
 
 class RetroGameState(models.Model):
     """
     Model to store detailed game state for save/load functionality.
     
+    Robots and diamonds are numbered per level, so the IDs defeated or
+    collected in the current level are stored as bitsets. Use the
+    ``get_*``/``set_*`` helpers to work with them as plain lists.
+    
     Attributes:
         session: Associated game session
-        robots_defeated: JSON array of defeated robot IDs
-        diamonds_collected: JSON array of collected diamond IDs
+        robots_defeated_mask: Bitset of defeated robot IDs
+        diamonds_collected_mask: Bitset of collected diamond IDs
         boss_defeated: Whether the boss has been defeated
         level_completed: Whether the current level is completed
+        version: Incremented on every write; delta saves are based on it
     """
+    # Save-state payload keys for the progress lists and their model fields
+    PROGRESS_FIELDS = {
+        'robotsDefeated': 'robots_defeated_mask',
+        'diamondsCollected': 'diamonds_collected_mask',
+    }
+    
     session = models.OneToOneField(
         RetroGameSession, 
         on_delete=models.CASCADE,
         related_name='game_state'
     )
-    robots_defeated = models.JSONField(
-        default=list,
-        help_text="List of defeated robot IDs"
+    robots_defeated_mask = models.BigIntegerField(
+        default=0,
+        help_text="Bitset of robot IDs defeated in the current level"
     )
-    diamonds_collected = models.JSONField(
-        default=list,
-        help_text="List of collected diamond IDs"
+    diamonds_collected_mask = models.BigIntegerField(
+        default=0,
+        help_text="Bitset of diamond IDs collected in the current level"
     )
     boss_defeated = models.BooleanField(
         default=False,
@@ -161,6 +314,10 @@ class RetroGameState(models.Model):
         default=False,
         help_text="Whether the current level is completed"
     )
+    version = models.PositiveIntegerField(
+        default=0,
+        help_text="Write counter used as the base of delta saves"
+    )
     
     class Meta:
         verbose_name = "Game State"
@@ -169,32 +326,244 @@ class RetroGameState(models.Model):
     def __str__(self):
         return f"Game State for Session {self.session_id}"
     
+    @classmethod
+    def is_delta(cls, data: dict) -> bool:
+        """Whether a save-state payload only carries additions to the progress lists."""
+        return (
+            any(f'{key}Added' in data for key in cls.PROGRESS_FIELDS)
+            and not any(key in data for key in cls.PROGRESS_FIELDS)
+        )
+    
+    @classmethod
+    def progress_errors(cls, data: dict) -> list:
+        """Describe the progress lists of a save-state payload that hold invalid IDs."""
+        if not isinstance(data, dict):
+            return ['Save data must be a JSON object']
+        errors = []
+        for key in cls.PROGRESS_FIELDS:
+            for name in (key, f'{key}Added'):
+                items = data.get(name)
+                if items is not None and (
+                        not isinstance(items, list) or not all(is_progress_id(item) for item in items)):
+                    errors.append(f'{name} must be a list of integers between 0 and {MAX_PROGRESS_ID}')
+        return errors
+    
+    @staticmethod
+    def _valid_ids(items) -> list:
+        """
+        Keep the entries of a payload list that are valid progress IDs.
+        
+        The save views reject invalid IDs, so anything dropped here came from
+        an older buffered snapshot and is logged.
+        """
+        valid = [item for item in items if is_progress_id(item)]
+        if len(valid) < len(items):
+            logger.warning(f"Dropped invalid progress IDs {[i for i in items if not is_progress_id(i)]!r}")
+        return valid
+    
+    def apply_save_data(self, data: dict) -> None:
+        """
+        Update game state fields from a save-state payload, ignoring invalid values.
+        
+        Full ``robotsDefeated``/``diamondsCollected`` lists replace the stored
+        lists; ``robotsDefeatedAdded``/``diamondsCollectedAdded`` are merged in.
+        """
+        for key, field in self.PROGRESS_FIELDS.items():
+            if isinstance(data.get(key), list):
+                setattr(self, field, ids_to_mask(self._valid_ids(data[key])))
+            added = data.get(f'{key}Added')
+            if isinstance(added, list):
+                setattr(self, field, getattr(self, field) | ids_to_mask(self._valid_ids(added)))
+        if 'bossDefeated' in data and isinstance(data['bossDefeated'], bool):
+            self.boss_defeated = data['bossDefeated']
+        if 'levelCompleted' in data and isinstance(data['levelCompleted'], bool):
+            self.level_completed = data['levelCompleted']
+    
+    @classmethod
+    def apply_delta(cls, session_key: str, data: dict, base_version=None) -> bool:
+        """
+        Merge a delta save into the stored state of a session.
+        
+        Additions are OR-ed into the bitsets by a single conditional UPDATE,
+        so the row is never read.
+        
+        Args:
+            session_key: Session whose game state is updated
+            data: Save payload with ``*Added`` lists and optional flags
+            base_version: Version the delta was computed against, if known
+            
+        Returns:
+            False if the state does not exist or has moved past base_version
+        """
+        queryset = cls.objects.filter(session__session_key=session_key)
+        if base_version is not None:
+            queryset = queryset.filter(version=base_version)
+        
+        updates = {'version': F('version') + 1}
+        for key, field in cls.PROGRESS_FIELDS.items():
+            added = data.get(f'{key}Added')
+            if isinstance(added, list):
+                mask = ids_to_mask(cls._valid_ids(added))
+                if mask:
+                    updates[field] = F(field).bitor(mask)
+        if isinstance(data.get('bossDefeated'), bool):
+            updates['boss_defeated'] = data['bossDefeated']
+        if isinstance(data.get('levelCompleted'), bool):
+            updates['level_completed'] = data['levelCompleted']
+        return queryset.update(**updates) > 0
+    
     def get_robots_defeated(self) -> list:
         """Get the list of defeated robot IDs."""
-        if isinstance(self.robots_defeated, list):
-            return self.robots_defeated
-        try:
-            return json.loads(self.robots_defeated or '[]')
-        except (TypeError, json.JSONDecodeError):
-            return []
+        return mask_to_ids(self.robots_defeated_mask)
     
     def set_robots_defeated(self, robot_list: list) -> None:
         """Set the list of defeated robot IDs."""
         if not isinstance(robot_list, list):
             raise ValueError("robot_list must be a list")
-        self.robots_defeated = robot_list
+        self.robots_defeated_mask = ids_to_mask(robot_list)
     
     def get_diamonds_collected(self) -> list:
         """Get the list of collected diamond IDs."""
-        if isinstance(self.diamonds_collected, list):
-            return self.diamonds_collected
-        try:
-            return json.loads(self.diamonds_collected or '[]')
-        except (TypeError, json.JSONDecodeError):
-            return []
+        return mask_to_ids(self.diamonds_collected_mask)
     
     def set_diamonds_collected(self, diamond_list: list) -> None:
         """Set the list of collected diamond IDs."""
         if not isinstance(diamond_list, list):
             raise ValueError("diamond_list must be a list")
-        self.diamonds_collected = diamond_list
+        self.diamonds_collected_mask = ids_to_mask(diamond_list)
+
+
+class RetroGameMilestone(models.Model):
+    """
+    Progress milestone reached during a game session.
+    
+    Each milestone is recorded once per session and level, however many
+    saves report it.
+    
+    Attributes:
+        session: Game session that reached the milestone
+        kind: What was achieved (boss defeated or level completed)
+        level: Level the milestone was reached on
+        score: Session score when it was reached
+        created_at: When the milestone was recorded
+    """
+    BOSS_DEFEATED = 'boss_defeated'
+    LEVEL_COMPLETED = 'level_completed'
+    KIND_CHOICES = [
+        (BOSS_DEFEATED, 'Boss defeated'),
+        (LEVEL_COMPLETED, 'Level completed'),
+    ]
+    # Save-state payload flag that signals each kind
+    KIND_FLAGS = {
+        BOSS_DEFEATED: 'bossDefeated',
+        LEVEL_COMPLETED: 'levelCompleted',
+    }
+    
+    session = models.ForeignKey(
+        RetroGameSession,
+        on_delete=models.CASCADE,
+        related_name='milestones'
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    level = models.IntegerField(
+        validators=[
+            MinValueValidator(1, message="Level must be at least 1"),
+            MaxValueValidator(10, message="Level cannot exceed 10")
+        ]
+    )
+    score = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['session', 'kind', 'level'], name='unique_session_milestone'),
+        ]
+        ordering = ['created_at']
+        verbose_name = "Game Milestone"
+        verbose_name_plural = "Game Milestones"
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} on level {self.level} (session {self.session_id})"
+    
+    @classmethod
+    def signalled(cls, data: dict) -> bool:
+        """Whether a save payload turns on any milestone flag."""
+        return any(data.get(key) is True for key in cls.KIND_FLAGS.values())
+    
+    @classmethod
+    def detect(cls, game_session: RetroGameSession, game_state: RetroGameState,
+               snapshots: list) -> list:
+        """
+        Return the unsaved milestones reached over an ordered list of save payloads.
+        
+        A milestone is reached when its flag turns on, starting from the
+        stored session and state; changing level clears the flags.
+        """
+        level = game_session.current_level
+        score = game_session.score
+        flags = {
+            cls.BOSS_DEFEATED: game_state.boss_defeated,
+            cls.LEVEL_COMPLETED: game_state.level_completed,
+        }
+        milestones = []
+        for data in snapshots:
+            updates = RetroGameSession.save_data_updates(data)
+            if updates.get('current_level', level) != level:
+                level = updates['current_level']
+                flags = dict.fromkeys(flags, False)
+            score = updates.get('score', score)
+            for kind, key in cls.KIND_FLAGS.items():
+                value = data.get(key)
+                if not isinstance(value, bool):
+                    continue
+                if value and not flags[kind]:
+                    milestones.append(cls(session=game_session, kind=kind, level=level, score=score))
+                flags[kind] = value
+        return milestones
+    
+    @classmethod
+    def record(cls, milestones: list) -> list:
+        """
+        Insert milestones, skipping any the session has already reached.
+        
+        Call it with the session row locked, so the returned list is exactly
+        what this call inserted.
+        
+        Returns:
+            The milestones that were new
+        """
+        if not milestones:
+            return []
+        seen = set(cls.objects
+            .filter(session=milestones[0].session)
+            .values_list('kind', 'level'))
+        new = []
+        for milestone in milestones:
+            if (milestone.kind, milestone.level) not in seen:
+                seen.add((milestone.kind, milestone.level))
+                new.append(milestone)
+        cls.objects.bulk_create(new, ignore_conflicts=True)
+        return new
+
+
+class RetroScoreRankNode(models.Model):
+    """
+    Node of the Fenwick tree that backs the high-score rank index.
+    
+    Each row holds the number of high scores that fall into the score range
+    covered by its position. Missing rows are treated as zero, so the table
+    only ever holds nodes that have been touched by a recorded score.
+    
+    Attributes:
+        position: 1-based Fenwick tree position (score + 1 for leaf ranges)
+        count: Number of high scores covered by this node
+    """
+    position = models.PositiveIntegerField(primary_key=True)
+    count = models.BigIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = "Score Rank Node"
+        verbose_name_plural = "Score Rank Nodes"
+    
+    def __str__(self):
+        return f"Rank node {self.position}: {self.count}"
@@ -0,0 +1,239 @@
+"""
+High-score rank index for Retro Platform Fighter.
+
+Ranks are answered from a Fenwick (binary indexed) tree over the score
+domain that is stored in the ``RetroScoreRankNode`` table. Recording a score
+and asking for the rank or percentile of a score each touch at most
+``log2(MAX_SCORE)`` node rows, so the cost no longer grows with the number of
+high scores on the board.
+
+Scores moved to ``RetroHighScoreArchive`` by the retention policy stay in the
+tree, so ranks and percentiles are over every score ever submitted while the
+live table only holds the hot set.
+
+Deleting a live or archived score removes it from the tree once the delete
+commits; moving a score to the archive leaves the tree alone.
+
+A rebuild locks every node row before it counts the tables, so a submission
+that is updating the tree either commits first and is counted, or waits and
+is added to the rebuilt tree.
+"""
+
+import logging
+from typing import Dict, Iterable, List, Tuple
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import RetroHighScore, RetroHighScoreArchive, RetroScoreRankNode, is_moving_to_archive
+
+logger = logging.getLogger(__name__)
+
+MAX_SCORE = 1000000
+REBUILD_LOCK_KEY = 'rank_index:rebuild_lock'
+REBUILD_LOCK_TIMEOUT = 60
+REBUILD_BATCH_SIZE = 1000
+
+
+def _prefix_path(position: int) -> List[int]:
+    """Return the tree positions that sum to the prefix ending at position."""
+    path = []
+    while position > 0:
+        path.append(position)
+        position -= position & -position
+    return path
+
+
+class ScoreRankIndex:
+    """
+    Order-statistic index over high scores.
+
+    Position ``score + 1`` in the tree counts the entries with exactly that
+    score, so a prefix sum up to ``score + 1`` is the number of entries that
+    scored ``score`` or less.
+    """
+
+    def __init__(self, max_score: int = MAX_SCORE):
+        self.max_score = max_score
+        self.size = max_score + 1
+        self._verified = False
+
+    def _position(self, score: int) -> int:
+        """Map a score onto its 1-based tree position."""
+        return min(max(int(score), 0), self.max_score) + 1
+
+    def _update_path(self, position: int) -> List[int]:
+        """Return the tree positions that cover the given position."""
+        path = []
+        while position <= self.size:
+            path.append(position)
+            position += position & -position
+        return path
+
+    def _fetch(self, positions: Iterable[int]) -> Dict[int, int]:
+        """Load the counts of the given tree positions in one query."""
+        return dict(
+            RetroScoreRankNode.objects
+            .filter(position__in=set(positions))
+            .values_list('position', 'count')
+        )
+
+    def _prefix(self, nodes: Dict[int, int], position: int) -> int:
+        """Sum the prefix ending at position from already fetched nodes."""
+        return sum(nodes.get(p, 0) for p in _prefix_path(position))
+
+    def _apply(self, score: int, delta: int) -> None:
+        """Add delta to every tree node that covers score."""
+        path = self._update_path(self._position(score))
+        with transaction.atomic():
+            updated = (RetroScoreRankNode.objects
+                .filter(position__in=path)
+                .update(count=F('count') + delta))
+            if updated < len(path):
+                existing = set(RetroScoreRankNode.objects
+                    .filter(position__in=path)
+                    .values_list('position', flat=True))
+                missing = [p for p in path if p not in existing]
+                RetroScoreRankNode.objects.bulk_create(
+                    [RetroScoreRankNode(position=p, count=0) for p in missing],
+                    ignore_conflicts=True
+                )
+                (RetroScoreRankNode.objects
+                    .filter(position__in=missing)
+                    .update(count=F('count') + delta))
+
+    def add(self, score: int) -> None:
+        """
+        Record a new high score.
+
+        Call ``ensure_built()`` before the transaction that inserts the
+        ``RetroHighScore`` row, so the consistency check neither mistakes the
+        new row for drift nor rebuilds the tree inside that transaction.
+        """
+        self._apply(score, 1)
+
+    def remove(self, score: int) -> None:
+        """Forget a previously recorded high score; called once its delete commits."""
+        self._apply(score, -1)
+
+    def lookup(self, score: int) -> Tuple[int, float]:
+        """
+        Return the rank and percentile of a score.
+
+        The rank is one more than the number of entries with a strictly
+        higher score. The percentile is the share of entries below the score,
+        counting ties as half, in the range 0-100.
+        """
+        self.ensure_built()
+        position = self._position(score)
+        nodes = self._fetch(
+            _prefix_path(position - 1) + _prefix_path(position) + _prefix_path(self.size)
+        )
+        total = self._prefix(nodes, self.size)
+        below = self._prefix(nodes, position - 1)
+        at_or_below = self._prefix(nodes, position)
+        rank = total - at_or_below + 1
+        if total == 0:
+            return rank, 100.0
+        percentile = (below + (at_or_below - below) / 2) * 100 / total
+        return rank, round(percentile, 1)
+
+    def rank(self, score: int) -> int:
+        """Return the leaderboard rank a score would have."""
+        return self.lookup(score)[0]
+
+    def percentile(self, score: int) -> float:
+        """Return the percentile of a score among all high scores."""
+        return self.lookup(score)[1]
+
+    def ranks(self, scores: Iterable[int]) -> Dict[int, int]:
+        """Return a mapping of score to rank for several scores in one query."""
+        self.ensure_built()
+        scores = set(scores)
+        if not scores:
+            return {}
+        paths = {score: _prefix_path(self._position(score)) for score in scores}
+        total_path = _prefix_path(self.size)
+        nodes = self._fetch(
+            [p for path in paths.values() for p in path] + total_path
+        )
+        total = self._prefix(nodes, self.size)
+        return {
+            score: total - sum(nodes.get(p, 0) for p in path) + 1
+            for score, path in paths.items()
+        }
+
+    def total(self) -> int:
+        """Return the number of scores recorded in the index."""
+        nodes = self._fetch(_prefix_path(self.size))
+        return self._prefix(nodes, self.size)
+
+    def _source_counts(self) -> Dict[int, int]:
+        """Count the live and archived high scores per score value."""
+        counts: Dict[int, int] = {}
+        for model in (RetroHighScore, RetroHighScoreArchive):
+            rows = (model.objects
+                .order_by()
+                .values('score')
+                .annotate(entries=Count('id'))
+                .values_list('score', 'entries'))
+            for score, entries in rows:
+                counts[score] = counts.get(score, 0) + entries
+        return counts
+
+    def rebuild(self) -> int:
+        """
+        Rebuild the whole tree from the live and archived high scores.
+
+        Returns:
+            Number of scores indexed, or -1 if another process holds the
+            rebuild lock
+        """
+        if not cache.add(REBUILD_LOCK_KEY, True, timeout=REBUILD_LOCK_TIMEOUT):
+            logger.info("Rank index rebuild already in progress, skipping")
+            return -1
+        try:
+            with transaction.atomic():
+                # Block add() until the new tree is in place; count only after
+                # the lock, so scores committed before it are included
+                list(RetroScoreRankNode.objects.select_for_update().values_list('position', flat=True))
+                tree: Dict[int, int] = {}
+                for score, entries in self._source_counts().items():
+                    for position in self._update_path(self._position(score)):
+                        tree[position] = tree.get(position, 0) + entries
+
+                RetroScoreRankNode.objects.all().delete()
+                RetroScoreRankNode.objects.bulk_create(
+                    [RetroScoreRankNode(position=p, count=c) for p, c in tree.items()],
+                    batch_size=REBUILD_BATCH_SIZE
+                )
+            self._verified = True
+            return self._prefix(tree, self.size)
+        finally:
+            cache.delete(REBUILD_LOCK_KEY)
+
+    def ensure_built(self) -> None:
+        """Rebuild the tree once per process if it disagrees with the tables."""
+        if self._verified:
+            return
+        expected = RetroHighScore.objects.count() + RetroHighScoreArchive.objects.count()
+        if self.total() != expected:
+            logger.info("Rank index out of date, rebuilding from high scores")
+            if self.rebuild() < 0:
+                return
+        self._verified = True
+
+
+rank_index = ScoreRankIndex()
+
+
+@receiver(post_delete, sender=RetroHighScore, dispatch_uid='retro_platform_fighter.ranking.score_deleted')
+@receiver(post_delete, sender=RetroHighScoreArchive, dispatch_uid='retro_platform_fighter.ranking.archived_score_deleted')
+def remove_deleted_score(sender, instance, **kwargs):
+    if sender is RetroHighScore and is_moving_to_archive():
+        return
+    score = instance.score
+    transaction.on_commit(lambda: rank_index.remove(score))
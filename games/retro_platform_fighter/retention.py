@@ -0,0 +1,207 @@
+"""
+Chunked retention jobs for Retro Platform Fighter.
+
+Both jobs walk their table in primary-key order, ``batch_size`` rows at a
+time, each batch in its own short transaction with an optional pause in
+between. Memory use and lock time per batch stay bounded however many rows
+qualify, so the jobs can run next to live traffic.
+
+- Game sessions not saved for ``days_old`` days are deleted. Staleness is
+  re-checked inside every delete, so a player who comes back while the job
+  runs keeps their game.
+- High scores outside the hot set are moved to ``RetroHighScoreArchive``.
+  The hot set is everything a leaderboard can show: the top
+  ``settings.MAX_HIGH_SCORES`` scores, the top ``LEVEL_LEADERBOARD_SIZE`` of
+  every level, every score of the current weekly window and, with
+  ``settings.HIGH_SCORE_KEEP_USER_BESTS``, each user's best score. Archived
+  scores stay in the rank index, the level histograms and the paged
+  leaderboard.
+"""
+
+import logging
+import time
+from datetime import timedelta
+from typing import Callable, NamedTuple, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from .leaderboard import LEADERBOARDS, LEVEL_LEADERBOARDS, top_scores
+from .models import RetroGameSession, RetroHighScore, RetroHighScoreArchive, moving_to_archive
+from .state_buffer import state_buffer
+from .state_cache import payload_key
+
+logger = logging.getLogger(__name__)
+
+
+class PurgeResult(NamedTuple):
+    """Outcome of a retention run."""
+    sessions: int
+    batches: int
+    elapsed: float
+
+    @property
+    def rate(self) -> float:
+        """Sessions deleted per second."""
+        return self.sessions / self.elapsed if self.elapsed else 0.0
+
+
+class ArchiveResult(NamedTuple):
+    """Outcome of a high-score archiving run."""
+    scores: int
+    batches: int
+    elapsed: float
+
+    @property
+    def rate(self) -> float:
+        """Scores archived per second."""
+        return self.scores / self.elapsed if self.elapsed else 0.0
+
+
+def stale_sessions(days_old: int = 30):
+    """Game sessions that have not been saved for days_old days."""
+    cutoff = timezone.now() - timedelta(days=days_old)
+    return RetroGameSession.objects.filter(updated_at__lt=cutoff)
+
+
+def purge_stale_sessions(days_old: int = 30, batch_size: int = 500, sleep: float = 0.0,
+                         max_batches: Optional[int] = None,
+                         progress: Optional[Callable[[int, int], None]] = None) -> PurgeResult:
+    """
+    Delete stale game sessions and their game states in chunks.
+
+    Args:
+        days_old: Inactivity in days after which a session is deleted
+        batch_size: Sessions deleted per transaction
+        sleep: Seconds to pause between batches
+        max_batches: Stop after this many batches; no limit if omitted
+        progress: Called with (batch number, sessions deleted so far) after each batch
+
+    Returns:
+        The number of sessions deleted, batches run and seconds taken
+    """
+    started = time.monotonic()
+    deleted = batches = 0
+    last_pk = 0
+    while max_batches is None or batches < max_batches:
+        queryset = stale_sessions(days_old)
+        pks = list(queryset
+            .filter(pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            break
+        last_pk = pks[-1]
+
+        with transaction.atomic():
+            # Lock and re-check, so sessions saved since the read survive
+            doomed = dict(queryset.select_for_update().filter(pk__in=pks).values_list('pk', 'session_key'))
+            if doomed:
+                RetroGameSession.objects.filter(pk__in=doomed).delete()
+        for key in doomed.values():
+            state_buffer.discard(key)
+        cache.delete_many([payload_key(key) for key in doomed.values()])
+
+        deleted += len(doomed)
+        batches += 1
+        if progress:
+            progress(batches, deleted)
+        if sleep and len(pks) == batch_size:
+            time.sleep(sleep)
+
+    result = PurgeResult(deleted, batches, time.monotonic() - started)
+    logger.info(f"Purged {result.sessions} stale game sessions in {result.batches} batches")
+    return result
+
+
+def archivable_high_scores(keep_user_bests: Optional[bool] = None):
+    """
+    High scores outside the hot set that every leaderboard is built from.
+
+    Args:
+        keep_user_bests: Keep each user's best score; defaults to
+            ``settings.HIGH_SCORE_KEEP_USER_BESTS``
+    """
+    if keep_user_bests is None:
+        keep_user_bests = getattr(settings, 'HIGH_SCORE_KEEP_USER_BESTS', False)
+
+    keep_ids = set(top_scores.queryset().values_list('id', flat=True)[:top_scores.size])
+    for board in LEVEL_LEADERBOARDS.values():
+        keep_ids.update(board.queryset().values_list('id', flat=True)[:board.size])
+    window_start, _ = LEADERBOARDS['weekly'].window()
+
+    queryset = (RetroHighScore.objects
+        .filter(created_at__lt=window_start)
+        .exclude(id__in=keep_ids))
+    if keep_user_bests:
+        best = (RetroHighScore.objects
+            .filter(user=OuterRef('user'))
+            .order_by('-score', '-created_at', 'id')
+            .values('id')[:1])
+        user_bests = RetroHighScore.objects.filter(user__isnull=False, id=Subquery(best))
+        queryset = queryset.exclude(id__in=user_bests.values('id'))
+    return queryset
+
+
+def archive_high_scores(batch_size: int = 500, sleep: float = 0.0,
+                        keep_user_bests: Optional[bool] = None,
+                        max_batches: Optional[int] = None,
+                        progress: Optional[Callable[[int, int], None]] = None) -> ArchiveResult:
+    """
+    Move high scores outside the hot set to the archive table in chunks.
+
+    The hot set is computed once at the start; scores submitted during the
+    run fall in the current weekly window and are never archived by it.
+
+    Args:
+        batch_size: Scores moved per transaction
+        sleep: Seconds to pause between batches
+        keep_user_bests: See ``archivable_high_scores``
+        max_batches: Stop after this many batches; no limit if omitted
+        progress: Called with (batch number, scores archived so far) after each batch
+
+    Returns:
+        The number of scores archived, batches run and seconds taken
+    """
+    started = time.monotonic()
+    queryset = archivable_high_scores(keep_user_bests)
+    archived = batches = 0
+    last_pk = 0
+    while max_batches is None or batches < max_batches:
+        pks = list(queryset
+            .filter(pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            break
+        last_pk = pks[-1]
+
+        with transaction.atomic():
+            rows = list(RetroHighScore.objects.select_for_update().filter(pk__in=pks))
+            RetroHighScoreArchive.objects.bulk_create([
+                RetroHighScoreArchive(
+                    id=row.id,
+                    user_id=row.user_id,
+                    player_name=row.player_name,
+                    score=row.score,
+                    level_reached=row.level_reached,
+                    created_at=row.created_at
+                )
+                for row in rows
+            ], ignore_conflicts=True)
+            with moving_to_archive():
+                RetroHighScore.objects.filter(pk__in=[row.pk for row in rows]).delete()
+
+        archived += len(rows)
+        batches += 1
+        if progress:
+            progress(batches, archived)
+        if sleep and len(pks) == batch_size:
+            time.sleep(sleep)
+
+    result = ArchiveResult(archived, batches, time.monotonic() - started)
+    logger.info(f"Archived {result.scores} high scores in {result.batches} batches")
+    return result
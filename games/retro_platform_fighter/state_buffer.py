@@ -0,0 +1,361 @@
+"""
+Write-behind buffer for Retro Platform Fighter save-state autosaves.
+
+When ``settings.GAME_STATE_WRITE_BEHIND`` is enabled, autosaves are merged
+into a per-session snapshot in the cache instead of being written straight to
+the database. The merge runs under a per-session cache lock, so concurrent
+autosaves of one session cannot overwrite each other's fields.
+
+The first autosave after a flush marks the session dirty and appends it to a
+queue kept in the cache, numbered by a shared counter. Any process can flush
+the queue: the save views do so once its oldest entry is older than
+``settings.GAME_STATE_MAX_STALENESS`` seconds, and the ``flush_game_states``
+management command does so on a schedule, so snapshots are written even when
+no more autosaves arrive and survive the worker that buffered them. Flushing
+writes the snapshots in batches with ``bulk_update`` and drops the flushed
+sessions' load-state payloads, whose version is then out of date; a flush
+lock keeps two processes from writing the same batch.
+
+Buffering needs a cache that every worker shares (memcached, Redis, the
+database or the file cache). With a per-process cache, enabling write-behind
+raises ``ImproperlyConfigured``. The ``a``-prefixed methods use the cache's
+async API for the async views; flushing itself is a database write and always
+runs synchronously.
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils import timezone
+
+from .models import RetroGameMilestone, RetroGameSession, RetroGameState
+from .state_cache import payload_key
+
+logger = logging.getLogger(__name__)
+
+BUFFER_KEY_PREFIX = 'game_state_buffer:'
+BUFFER_TIMEOUT = 60 * 60 * 24  # Keep unflushed snapshots for 24 hours
+QUEUED_KEY = f'{BUFFER_KEY_PREFIX}queued'  # Number of queue entries ever appended
+FLUSHED_KEY = f'{BUFFER_KEY_PREFIX}flushed'  # Number of queue entries already flushed
+FLUSH_LOCK_KEY = f'{BUFFER_KEY_PREFIX}flush_lock'
+FLUSH_LOCK_TIMEOUT = 60
+LOCK_TIMEOUT = 5
+LOCK_RETRY_DELAY = 0.01
+
+SESSION_FIELDS = ['current_level', 'diamonds', 'lives', 'score', 'player_x', 'player_y', 'updated_at']
+STATE_FIELDS = [
+    'robots_defeated_mask', 'diamonds_collected_mask', 'boss_defeated', 'level_completed', 'version'
+]
+
+# Backends whose entries are only visible to the process that wrote them
+LOCAL_CACHE_BACKENDS = (LocMemCache, DummyCache)
+
+
+def buffer_key(session_key: str) -> str:
+    """Return the cache key holding the buffered snapshot for a session."""
+    return f'{BUFFER_KEY_PREFIX}{session_key}'
+
+
+def dirty_key(session_key: str) -> str:
+    """Return the cache key marking a session's snapshot as not yet flushed."""
+    return f'{BUFFER_KEY_PREFIX}dirty:{session_key}'
+
+
+def queue_key(position: int) -> str:
+    """Return the cache key of one entry of the flush queue."""
+    return f'{BUFFER_KEY_PREFIX}queue:{position}'
+
+
+def is_shared_cache(backend) -> bool:
+    """Whether every worker process sees the same entries in a cache backend."""
+    # Look through wrappers such as retro_game_web.cache.InstrumentedCache
+    backend = getattr(backend, '_backend', backend)
+    return not isinstance(backend, LOCAL_CACHE_BACKENDS)
+
+
+def merge_snapshot(snapshot: Dict[str, Any], data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Merge a newer save payload into a buffered snapshot.
+
+    Plain fields are replaced. Delta additions accumulate, and a full
+    progress list discards the additions buffered before it.
+    """
+    merged = dict(snapshot)
+    for key, value in data.items():
+        if key.endswith('Added') and isinstance(value, list):
+            existing = merged.get(key) or []
+            value = existing + [item for item in value if item not in existing]
+        elif key in RetroGameState.PROGRESS_FIELDS:
+            merged.pop(f'{key}Added', None)
+        merged[key] = value
+    return merged
+
+
+class GameStateBuffer:
+    """Per-session snapshot buffer with a shared, staleness-bounded flush queue."""
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Whether autosaves should be buffered instead of written directly.
+
+        Raises:
+            ImproperlyConfigured: If write-behind is enabled on a cache that
+                is not shared between workers
+        """
+        if not getattr(settings, 'GAME_STATE_WRITE_BEHIND', False):
+            return False
+        if not is_shared_cache(caches['default']):
+            raise ImproperlyConfigured(
+                "GAME_STATE_WRITE_BEHIND needs a default cache shared by all workers, "
+                "not a per-process one such as LocMemCache"
+            )
+        return True
+
+    @property
+    def max_staleness(self) -> float:
+        """Maximum age in seconds of a snapshot that has not been flushed."""
+        return getattr(settings, 'GAME_STATE_MAX_STALENESS', 30)
+
+    @property
+    def batch_size(self) -> int:
+        """Number of sessions written per bulk_update batch."""
+        return getattr(settings, 'GAME_STATE_FLUSH_BATCH_SIZE', 100)
+
+    @contextmanager
+    def _locked(self, session_key: str):
+        """Hold the session's buffer lock, waiting out a crashed holder's lock at most."""
+        lock_key = f'{buffer_key(session_key)}:lock'
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while not cache.add(lock_key, True, timeout=LOCK_TIMEOUT):
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Game state buffer of {session_key} is locked")
+            time.sleep(LOCK_RETRY_DELAY)
+        try:
+            yield
+        finally:
+            cache.delete(lock_key)
+
+    @asynccontextmanager
+    async def _alocked(self, session_key: str):
+        lock_key = f'{buffer_key(session_key)}:lock'
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while not await cache.aadd(lock_key, True, timeout=LOCK_TIMEOUT):
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Game state buffer of {session_key} is locked")
+            await asyncio.sleep(LOCK_RETRY_DELAY)
+        try:
+            yield
+        finally:
+            await cache.adelete(lock_key)
+
+    def put(self, session_key: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Merge a save payload into the buffered snapshot for a session.
+
+        Fields from the newest payload win; fields it omits keep their
+        previously buffered value. See ``merge_snapshot``.
+
+        Returns:
+            The merged snapshot
+        """
+        key = buffer_key(session_key)
+        with self._locked(session_key):
+            snapshot = merge_snapshot(cache.get(key) or {}, data)
+            cache.set(key, snapshot, timeout=BUFFER_TIMEOUT)
+        self._mark_dirty(session_key)
+        return snapshot
+
+    async def aput(self, session_key: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        key = buffer_key(session_key)
+        async with self._alocked(session_key):
+            snapshot = merge_snapshot(await cache.aget(key) or {}, data)
+            await cache.aset(key, snapshot, timeout=BUFFER_TIMEOUT)
+        await self._amark_dirty(session_key)
+        return snapshot
+
+    def _mark_dirty(self, session_key: str) -> None:
+        # Only the first change since the last flush queues the session
+        if cache.add(dirty_key(session_key), True, timeout=BUFFER_TIMEOUT):
+            self._enqueue(session_key)
+
+    def _enqueue(self, session_key: str) -> None:
+        try:
+            position = cache.incr(QUEUED_KEY)
+        except ValueError:
+            cache.add(QUEUED_KEY, 0, timeout=None)
+            position = cache.incr(QUEUED_KEY)
+        cache.set(queue_key(position), (session_key, time.time()), timeout=BUFFER_TIMEOUT)
+
+    async def _amark_dirty(self, session_key: str) -> None:
+        if not await cache.aadd(dirty_key(session_key), True, timeout=BUFFER_TIMEOUT):
+            return
+        try:
+            position = await cache.aincr(QUEUED_KEY)
+        except ValueError:
+            await cache.aadd(QUEUED_KEY, 0, timeout=None)
+            position = await cache.aincr(QUEUED_KEY)
+        await cache.aset(queue_key(position), (session_key, time.time()), timeout=BUFFER_TIMEOUT)
+
+    def get(self, session_key: str) -> Optional[Dict[str, Any]]:
+        """Return the buffered snapshot for a session, if any."""
+        return cache.get(buffer_key(session_key))
+
+    async def aget(self, session_key: str) -> Optional[Dict[str, Any]]:
+        return await cache.aget(buffer_key(session_key))
+
+    def take(self, session_key: str) -> Dict[str, Any]:
+        """Remove and return the buffered snapshot so the caller can write it."""
+        key = buffer_key(session_key)
+        with self._locked(session_key):
+            snapshot = cache.get(key) or {}
+            cache.delete_many([key, dirty_key(session_key)])
+        return snapshot
+
+    async def atake(self, session_key: str) -> Dict[str, Any]:
+        key = buffer_key(session_key)
+        async with self._alocked(session_key):
+            snapshot = await cache.aget(key) or {}
+            await cache.adelete_many([key, dirty_key(session_key)])
+        return snapshot
+
+    def restore(self, session_key: str, snapshot: Dict[str, Any]) -> None:
+        """Put back a taken snapshot whose write was refused, under anything buffered since."""
+        if not snapshot:
+            return
+        key = buffer_key(session_key)
+        with self._locked(session_key):
+            cache.set(key, merge_snapshot(snapshot, cache.get(key) or {}), timeout=BUFFER_TIMEOUT)
+        self._mark_dirty(session_key)
+
+    def rekey(self, old_key: str, new_key: str) -> None:
+        """Move a buffered snapshot to the new key of a rotated session."""
+        snapshot = self.take(old_key)
+        if snapshot:
+            self.put(new_key, snapshot)
+
+    def discard(self, session_key: str) -> None:
+        """Drop any buffered snapshot for a session without writing it."""
+        cache.delete_many([buffer_key(session_key), dirty_key(session_key)])
+
+    def _queue_bounds(self) -> List[int]:
+        """Return the positions already flushed and queued so far."""
+        counters = cache.get_many([FLUSHED_KEY, QUEUED_KEY])
+        flushed, queued = counters.get(FLUSHED_KEY, 0), counters.get(QUEUED_KEY, 0)
+        # An evicted queue counter restarts at 0; so does the flush position
+        return [0 if flushed > queued else flushed, queued]
+
+    def pending(self) -> int:
+        """Return the number of sessions with an unflushed snapshot."""
+        flushed, queued = self._queue_bounds()
+        entries = cache.get_many([queue_key(p) for p in range(flushed + 1, queued + 1)])
+        sessions = {session_key for session_key, _ in entries.values()}
+        return len(cache.get_many([dirty_key(k) for k in sessions]))
+
+    def is_flush_due(self) -> bool:
+        """Whether the oldest queued snapshot exceeds max staleness."""
+        flushed, queued = self._queue_bounds()
+        if flushed >= queued:
+            return False
+        oldest = cache.get(queue_key(flushed + 1))
+        # A missing entry expired long ago
+        return oldest is None or time.time() - oldest[1] >= self.max_staleness
+
+    def flush_due(self) -> int:
+        """Flush all queued snapshots if the oldest one exceeds max staleness."""
+        return self.flush() if self.is_flush_due() else 0
+
+    def flush(self) -> int:
+        """
+        Write every queued snapshot to the database.
+
+        Returns:
+            Number of sessions written, 0 if another process is flushing
+        """
+        if not cache.add(FLUSH_LOCK_KEY, True, timeout=FLUSH_LOCK_TIMEOUT):
+            return 0
+        try:
+            flushed, queued = self._queue_bounds()
+            written = 0
+            while flushed < queued:
+                end = min(flushed + self.batch_size, queued)
+                entry_keys = [queue_key(p) for p in range(flushed + 1, end + 1)]
+                entries = cache.get_many(entry_keys)
+                sessions = list(dict.fromkeys(session_key for session_key, _ in entries.values()))
+                markers = cache.get_many([dirty_key(k) for k in sessions])
+                dirty = [k for k in sessions if dirty_key(k) in markers]
+                # Autosaves from here on queue their session again
+                cache.delete_many([dirty_key(k) for k in dirty])
+                snapshots = cache.get_many([buffer_key(k) for k in dirty])
+                by_session = {
+                    k: snapshots[buffer_key(k)] for k in dirty if buffer_key(k) in snapshots
+                }
+                try:
+                    flushed_keys = self._write(by_session)
+                    written += len(flushed_keys)
+                    # The writes bumped the state versions; load-state must
+                    # not keep serving the old version to delta saves
+                    cache.delete_many([payload_key(k) for k in flushed_keys])
+                except Exception as e:
+                    logger.error(f"Error flushing buffered game states: {str(e)}", exc_info=True)
+                    for key in by_session:
+                        self._mark_dirty(key)
+                cache.set(FLUSHED_KEY, end, timeout=None)
+                cache.delete_many(entry_keys)
+                flushed = end
+            return written
+        finally:
+            cache.delete(FLUSH_LOCK_KEY)
+
+    def _write(self, snapshots: Dict[str, Dict[str, Any]]) -> List[str]:
+        """
+        Apply a batch of snapshots with one bulk_update per table.
+
+        Returns:
+            The session keys written
+        """
+        if not snapshots:
+            return []
+        now = timezone.now()
+        with transaction.atomic():
+            # Locked like a synchronous save, so milestones are recorded once
+            sessions = list(RetroGameSession.objects.select_for_update().filter(session_key__in=snapshots))
+            states = {
+                state.session_id: state
+                for state in RetroGameState.objects.filter(session__in=sessions)
+            }
+            new_states: List[RetroGameState] = []
+            milestones: List[List[RetroGameMilestone]] = []
+            for game_session in sessions:
+                data = snapshots[game_session.session_key]
+                game_state = states.get(game_session.id)
+                if game_state is None:
+                    game_state = RetroGameState(session=game_session)
+                    new_states.append(game_state)
+                if RetroGameMilestone.signalled(data):
+                    milestones.append(RetroGameMilestone.detect(game_session, game_state, [data]))
+                game_session.apply_save_data(data)
+                game_session.updated_at = now
+                game_state.apply_save_data(data)
+                game_state.version += 1
+
+            RetroGameSession.objects.bulk_update(sessions, SESSION_FIELDS)
+            if states:
+                RetroGameState.objects.bulk_update(states.values(), STATE_FIELDS)
+            if new_states:
+                RetroGameState.objects.bulk_create(new_states)
+            for reached in milestones:
+                RetroGameMilestone.record(reached)
+        return [game_session.session_key for game_session in sessions]
+
+
+state_buffer = GameStateBuffer()
@@ -0,0 +1,138 @@
+"""
+Read-through cache for Retro Platform Fighter load-state payloads.
+
+The full payload returned by ``load_game_state`` is cached per session key,
+together with its ETag. Saves refresh the entry and resets invalidate it, so
+a warm load is answered without touching the database or serializing the
+payload just to compare ETags. The ``a``-prefixed methods are the same
+operations through the cache's async API, for the async views.
+"""
+
+import hashlib
+import threading
+from typing import Any, Dict, Optional
+
+from django.core.cache import cache
+from django.utils.http import quote_etag
+
+from . import fast_json
+from .models import RetroGameSession, RetroGameState
+
+# v2 entries are {'payload': ..., 'etag': ...} rather than the bare payload
+PAYLOAD_KEY_PREFIX = 'game_state_payload:v2:'
+PAYLOAD_TIMEOUT = 60 * 60 * 24  # Cache for 24 hours
+
+
+def payload_key(session_key: str) -> str:
+    """Return the cache key holding the load payload for a session."""
+    return f'{PAYLOAD_KEY_PREFIX}{session_key}'
+
+
+def build_payload(game_session: RetroGameSession, game_state: RetroGameState) -> Dict[str, Any]:
+    """Build the load-state payload from a session and its game state."""
+    return {
+        'level': game_session.current_level,
+        'diamonds': game_session.diamonds,
+        'lives': game_session.lives,
+        'score': game_session.score,
+        'playerX': game_session.player_x,
+        'playerY': game_session.player_y,
+        'robotsDefeated': game_state.get_robots_defeated(),
+        'diamondsCollected': game_state.get_diamonds_collected(),
+        'bossDefeated': game_state.boss_defeated,
+        'levelCompleted': game_state.level_completed,
+        'version': game_state.version
+    }
+
+
+def payload_etag(payload: Dict[str, Any]) -> str:
+    """
+    ETag of a load-state payload.
+
+    Derived from the content rather than the version alone, because buffered
+    write-behind saves change the cached payload without bumping the version.
+    """
+    return quote_etag(hashlib.blake2b(fast_json.dumps(payload), digest_size=12).hexdigest())
+
+
+def merge_payload(payload: Dict[str, Any], data: Dict[str, Any],
+                  version: Optional[int] = None) -> Dict[str, Any]:
+    """Apply a save payload to a cached load payload using the model validation."""
+    game_session = RetroGameSession(
+        current_level=payload['level'],
+        diamonds=payload['diamonds'],
+        lives=payload['lives'],
+        score=payload['score'],
+        player_x=payload['playerX'],
+        player_y=payload['playerY']
+    )
+    game_state = RetroGameState(
+        boss_defeated=payload['bossDefeated'],
+        level_completed=payload['levelCompleted'],
+        version=payload['version'] if version is None else version
+    )
+    game_state.set_robots_defeated(payload['robotsDefeated'])
+    game_state.set_diamonds_collected(payload['diamondsCollected'])
+    game_session.apply_save_data(data)
+    game_state.apply_save_data(data)
+    return build_payload(game_session, game_state)
+
+
+class GameStateCache:
+    """Session-keyed payload cache with per-process hit/miss counters."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, session_key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached ``{'payload': ..., 'etag': ...}`` entry for a session and count the lookup."""
+        return self._count(cache.get(payload_key(session_key)))
+
+    async def aget(self, session_key: str) -> Optional[Dict[str, Any]]:
+        return self._count(await cache.aget(payload_key(session_key)))
+
+    def _count(self, entry: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def set(self, session_key: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Store the payload for a session with its ETag and return the entry."""
+        entry = {'payload': payload, 'etag': payload_etag(payload)}
+        cache.set(payload_key(session_key), entry, timeout=PAYLOAD_TIMEOUT)
+        return entry
+
+    async def aset(self, session_key: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        entry = {'payload': payload, 'etag': payload_etag(payload)}
+        await cache.aset(payload_key(session_key), entry, timeout=PAYLOAD_TIMEOUT)
+        return entry
+
+    def update(self, session_key: str, data: Dict[str, Any],
+               version: Optional[int] = None) -> None:
+        """Refresh a cached payload with a save that was not read back from the database."""
+        entry = cache.get(payload_key(session_key))
+        if entry is not None:
+            self.set(session_key, merge_payload(entry['payload'], data, version))
+
+    async def aupdate(self, session_key: str, data: Dict[str, Any],
+                      version: Optional[int] = None) -> None:
+        entry = await cache.aget(payload_key(session_key))
+        if entry is not None:
+            await self.aset(session_key, merge_payload(entry['payload'], data, version))
+
+    def invalidate(self, session_key: str) -> None:
+        """Drop the cached payload for a session."""
+        cache.delete(payload_key(session_key))
+
+    def stats(self) -> Dict[str, int]:
+        """Return the hit and miss counts seen by this process."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+
+state_cache = GameStateCache()
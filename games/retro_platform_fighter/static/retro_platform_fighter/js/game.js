@@ -2426,7 +2426,8 @@ window.saveGame = function() {
         robotsDefeated: gameState.robotsDefeated || [],
         diamondsCollected: gameState.diamondsCollected || [],
         bossDefeated: gameState.bossDefeated || false,
-        levelCompleted: gameState.levelCompleted || false
+        levelCompleted: gameState.levelCompleted || false,
+        manual: true
     };
     
     console.log('💾 Saving game data:', gameData);
@@ -0,0 +1,1303 @@
+import gzip
+import json
+import os
+import tempfile
+import time
+from datetime import timedelta
+from importlib import import_module
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.http import JsonResponse
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path
+from django.utils import timezone
+
+from retro_game_web.testing import QueryBudgetMixin, capture_cache_operations
+
+from . import async_views, fast_json
+from .leaderboard import LEADERBOARDS, entry_from_score, top_scores
+from .models import (
+    RetroGameMilestone, RetroGameSession, RetroGameState, RetroHighScore, RetroHighScoreArchive,
+    ids_to_mask, mask_to_ids
+)
+from .ranking import ScoreRankIndex, rank_index
+from .retention import archive_high_scores, purge_stale_sessions
+from .state_buffer import GameStateBuffer, buffer_key, merge_snapshot, state_buffer
+from .state_cache import payload_key, state_cache
+from .throttling import CacheRateLimiter, LocalRateLimiter, _limiters
+
+SAVE_URL = '/retro_platform_fighter/api/save-state/'
+BATCH_SAVE_URL = '/retro_platform_fighter/api/save-state/batch/'
+LOAD_URL = '/retro_platform_fighter/api/load-state/'
+SUBMIT_URL = '/retro_platform_fighter/api/submit-score/'
+HIGH_SCORES_URL = '/retro_platform_fighter/api/high-scores/'
+LEVELS_URL = '/retro_platform_fighter/api/levels/'
+LEADERBOARD_API_URL = '/retro_platform_fighter/api/leaderboard/'
+RESET_URL = '/retro_platform_fighter/api/reset-game/'
+
+# Write-behind refuses a per-process cache; the file cache stands in for a shared one
+SHARED_CACHES = {
+    'default': {
+        'BACKEND': 'retro_game_web.cache.InstrumentedCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(), 'retro_platform_fighter_tests'),
+        'OPTIONS': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache'},
+    }
+}
+
+# The API served from the async views, as urls.py routes it with API_ASYNC_VIEWS
+urlpatterns = [
+    path(SAVE_URL.lstrip('/'), async_views.SaveGameStateView.as_view()),
+    path(LOAD_URL.lstrip('/'), async_views.load_game_state),
+    path(SUBMIT_URL.lstrip('/'), async_views.SubmitHighScoreView.as_view()),
+    path(HIGH_SCORES_URL.lstrip('/'), async_views.high_scores),
+]
+
+
+class RetroTestCase(TestCase):
+    """Base test case that starts every test from a cold cache and index."""
+
+    def setUp(self):
+        cache.clear()
+        rank_index._verified = False
+        state_cache.hits = state_cache.misses = 0
+        for limiter in _limiters.values():
+            limiter.reset()
+
+    def start_game(self) -> str:
+        """Open the play page and return the resulting session key."""
+        self.client.get('/retro_platform_fighter/play/')
+        return self.client.session.session_key
+
+    def post_json(self, url: str, data):
+        """POST a JSON body to url."""
+        return self.client.post(url, data=json.dumps(data), content_type='application/json')
+
+
+class GameSessionAdoptionTests(RetroTestCase):
+    """Tests that reloading the game page keeps one game session per player."""
+
+    def test_reload_rekeys_the_game_session(self):
+        first_key = self.start_game()
+        self.post_json(SAVE_URL, {'level': 3, 'score': 700})
+
+        second_key = self.start_game()
+
+        self.assertNotEqual(first_key, second_key)
+        self.assertEqual(RetroGameSession.objects.count(), 1)
+        self.assertEqual(RetroGameState.objects.count(), 1)
+        self.assertEqual(self.client.get(LOAD_URL).json()['score'], 700)
+
+    @override_settings(CACHES=SHARED_CACHES, GAME_STATE_WRITE_BEHIND=True, GAME_STATE_MAX_STALENESS=3600)
+    def test_buffered_autosave_follows_the_new_key(self):
+        self.start_game()
+        self.post_json(SAVE_URL, {'score': 900})
+
+        new_key = self.start_game()
+
+        self.assertEqual(state_buffer.get(new_key), {'score': 900})
+        self.assertEqual(state_buffer.flush(), 1)
+        self.assertEqual(RetroGameSession.objects.get().score, 900)
+
+
+class SessionRetentionTests(RetroTestCase):
+    """Tests for the chunked cleanup of inactive game sessions."""
+
+    def make_sessions(self, count: int, days_idle: int):
+        for i in range(count):
+            game_session = RetroGameSession.objects.create(session_key=f'idle-{days_idle}-{i}')
+            RetroGameState.objects.create(session=game_session)
+        RetroGameSession.objects.filter(session_key__startswith=f'idle-{days_idle}-').update(
+            updated_at=timezone.now() - timedelta(days=days_idle)
+        )
+
+    def test_deletes_stale_sessions_in_batches(self):
+        self.make_sessions(5, days_idle=40)
+        self.make_sessions(2, days_idle=1)
+        out = StringIO()
+
+        call_command('cleanup_game_sessions', '--batch-size', '2', '--sleep', '0', stdout=out)
+
+        self.assertIn('Deleted 5 game sessions in 3 batches', out.getvalue())
+        self.assertEqual(RetroGameSession.objects.count(), 2)
+        self.assertEqual(RetroGameState.objects.count(), 2)
+
+    def test_dry_run_only_counts(self):
+        self.make_sessions(3, days_idle=40)
+        out = StringIO()
+
+        call_command('cleanup_game_sessions', '--dry-run', stdout=out)
+
+        self.assertIn('3 game sessions', out.getvalue())
+        self.assertEqual(RetroGameSession.objects.count(), 3)
+
+    def test_max_batches(self):
+        self.make_sessions(5, days_idle=40)
+
+        self.assertEqual(RetroGameSession.cleanup_old_sessions(), 5)
+        self.make_sessions(4, days_idle=50)
+        result = purge_stale_sessions(batch_size=1, max_batches=2)
+        self.assertEqual((result.sessions, result.batches), (2, 2))
+
+
+@override_settings(MAX_HIGH_SCORES=2, LEVEL_LEADERBOARD_SIZE=1)
+class HighScoreArchiveTests(RetroTestCase):
+    """Tests for the high-score retention policy."""
+
+    def add_score(self, score: int, level: int = 1, days_ago: int = 30, user=None) -> RetroHighScore:
+        rank_index.ensure_built()
+        high_score = RetroHighScore.objects.create(
+            player_name=f'P{score}', score=score, level_reached=level, user=user
+        )
+        RetroHighScore.objects.filter(id=high_score.id).update(
+            created_at=timezone.now() - timedelta(days=days_ago)
+        )
+        rank_index.add(score)
+        return high_score
+
+    def test_keeps_the_hot_set_and_archives_the_rest(self):
+        for score in (900, 800, 700, 600):
+            self.add_score(score)
+        self.add_score(100, level=2)
+        self.add_score(50, days_ago=0)
+
+        result = archive_high_scores(batch_size=1)
+
+        self.assertEqual((result.scores, result.batches), (2, 2))
+        self.assertEqual(
+            sorted(RetroHighScore.objects.values_list('score', flat=True)), [50, 100, 800, 900]
+        )
+        self.assertEqual(sorted(RetroHighScoreArchive.objects.values_list('score', flat=True)), [600, 700])
+
+    def test_archived_scores_keep_counting_towards_ranks(self):
+        for score in (900, 800, 700, 600):
+            self.add_score(score)
+        archive_high_scores()
+
+        rank_index._verified = False
+        self.assertEqual(rank_index.rank(650), 4)
+        self.assertEqual(rank_index.rebuild(), 4)
+
+    def test_archived_scores_stay_on_the_paged_leaderboard(self):
+        scores = [self.add_score(score) for score in (900, 800, 700, 600)]
+        archive_high_scores()
+        self.assertTrue(RetroHighScoreArchive.objects.filter(id=scores[2].id).exists())
+
+        first = self.client.get(LEADERBOARD_API_URL, {'limit': 3}).json()
+        second = self.client.get(LEADERBOARD_API_URL, {'limit': 3, 'cursor': first['next']}).json()
+        back = self.client.get(LEADERBOARD_API_URL, {'limit': 3, 'cursor': second['prev']}).json()
+        around = self.client.get(LEADERBOARD_API_URL, {'limit': 1, 'around_id': scores[2].id})
+
+        self.assertEqual(
+            [(e['score'], e['rank']) for e in first['entries'] + second['entries']],
+            [(900, 1), (800, 2), (700, 3), (600, 4)]
+        )
+        self.assertEqual(back['entries'], first['entries'])
+        self.assertEqual(around.json()['entries'][0]['id'], scores[2].id)
+        counts = self.client.get(LEVELS_URL).json()
+        self.assertEqual(sum(counts['levels'][0]['histogram']), 4)
+
+    def test_keep_user_bests(self):
+        player = User.objects.create_user('player')
+        for score in (900, 800, 700):
+            self.add_score(score)
+        best = self.add_score(500, user=player)
+        self.add_score(400, user=player)
+
+        out = StringIO()
+        call_command('archive_high_scores', '--keep-user-bests', '--sleep', '0', stdout=out)
+
+        self.assertIn('Archived 2 high scores', out.getvalue())
+        self.assertTrue(RetroHighScore.objects.filter(id=best.id).exists())
+
+
+class ScoreRankIndexTests(RetroTestCase):
+    """Tests for the Fenwick tree backed high-score rank index."""
+
+    def test_rank_and_percentile(self):
+        index = ScoreRankIndex()
+        index._verified = True
+        for score in (100, 200, 200, 300):
+            index.add(score)
+
+        self.assertEqual(index.total(), 4)
+        self.assertEqual(index.rank(300), 1)
+        self.assertEqual(index.rank(200), 2)
+        self.assertEqual(index.rank(100), 4)
+        self.assertEqual(index.rank(50), 5)
+        self.assertEqual(index.percentile(200), 50.0)
+        self.assertEqual(index.ranks([300, 100]), {300: 1, 100: 4})
+
+    def test_remove(self):
+        index = ScoreRankIndex()
+        index._verified = True
+        index.add(500)
+        index.add(700)
+        index.remove(700)
+
+        self.assertEqual(index.total(), 1)
+        self.assertEqual(index.rank(500), 1)
+
+    def test_rebuilds_from_high_scores(self):
+        for score in (10, 20, 30):
+            RetroHighScore.objects.create(player_name='P', score=score, level_reached=1)
+
+        index = ScoreRankIndex()
+        index.ensure_built()
+
+        self.assertEqual(index.total(), 3)
+        self.assertEqual(index.rank(20), 2)
+
+    def test_deleted_scores_leave_the_index(self):
+        RetroHighScore.objects.create(player_name='Old', score=900, level_reached=1)
+        self.post_json(SUBMIT_URL, {'player_name': 'New', 'score': 400, 'level_reached': 1})
+        RetroHighScoreArchive.objects.create(
+            id=999, player_name='Gone', score=100, level_reached=1, created_at=timezone.now()
+        )
+        rank_index.add(100)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RetroHighScore.objects.filter(player_name='Old').delete()
+            RetroHighScoreArchive.objects.all().delete()
+
+        self.assertEqual(rank_index.total(), 1)
+        self.assertEqual(rank_index.rank(400), 1)
+
+    def test_submit_verifies_index_before_its_transaction(self):
+        depths = []
+        outer = len(connection.atomic_blocks)
+
+        with mock.patch.object(rank_index, 'ensure_built', lambda: depths.append(len(connection.atomic_blocks))):
+            self.post_json(SUBMIT_URL, {'player_name': 'P', 'score': 400, 'level_reached': 2})
+
+        self.assertEqual(depths[0], outer)
+
+    def test_submit_reads_rank_from_index(self):
+        RetroHighScore.objects.create(player_name='Old', score=900, level_reached=5)
+
+        response = self.post_json(
+            SUBMIT_URL, {'player_name': 'New', 'score': 400, 'level_reached': 2}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['rank'], 2)
+        self.assertEqual(response.json()['percentile'], 25.0)
+        self.assertEqual(rank_index.total(), 2)
+
+
+class LeaderboardReadModelTests(RetroTestCase):
+    """Tests for the materialized top-N leaderboard."""
+
+    def submit(self, name, score):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.post_json(SUBMIT_URL, {'player_name': name, 'score': score, 'level_reached': 1})
+
+    def test_new_high_score_is_visible_immediately(self):
+        self.submit('First', 100)
+        self.assertEqual(self.client.get(HIGH_SCORES_URL).json()['high_scores'][0]['score'], 100)
+
+        self.submit('Second', 300)
+        self.submit('Tied', 100)
+        scores = self.client.get(HIGH_SCORES_URL).json()['high_scores']
+
+        self.assertEqual(
+            [(s['player_name'], s['rank']) for s in scores],
+            [('Second', 1), ('Tied', 2), ('First', 2)]
+        )
+
+    def test_served_without_queries_once_warm(self):
+        RetroHighScore.objects.create(player_name='P', score=50, level_reached=1)
+        self.client.get(HIGH_SCORES_URL)
+
+        with self.assertNumQueries(0):
+            self.client.get(HIGH_SCORES_URL)
+            response = self.client.get('/retro_platform_fighter/leaderboard/')
+        self.assertContains(response, 'P')
+
+    @override_settings(MAX_HIGH_SCORES=2)
+    def test_board_keeps_top_n(self):
+        for name, score in (('A', 10), ('B', 20), ('C', 30), ('D', 5)):
+            self.submit(name, score)
+        self.client.get(HIGH_SCORES_URL)
+        self.submit('E', 25)
+
+        self.assertEqual([e['player_name'] for e in top_scores.entries()], ['C', 'E'])
+
+    def test_deleted_scores_leave_the_boards(self):
+        bob = User.objects.create_user('bob')
+        with self.captureOnCommitCallbacks(execute=True):
+            RetroHighScore.objects.create(user=bob, player_name='Bob', score=90, level_reached=3)
+            RetroHighScore.objects.create(player_name='Ann', score=50, level_reached=1)
+        self.client.get(HIGH_SCORES_URL)
+        self.client.get(LEVELS_URL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bob.delete()
+
+        names = [s['player_name'] for s in self.client.get(HIGH_SCORES_URL).json()['high_scores']]
+        levels = self.client.get(LEVELS_URL).json()['levels']
+        self.assertEqual(names, ['Ann'])
+        self.assertEqual(levels[2]['high_scores'], [])
+        self.assertEqual(sum(levels[0]['histogram']), 1)
+
+    @override_settings(MAX_HIGH_SCORES=1, LEVEL_LEADERBOARD_SIZE=1)
+    def test_archiving_keeps_the_boards(self):
+        for score in (50, 40, 30):
+            RetroHighScore.objects.create(player_name='P', score=score, level_reached=1)
+        RetroHighScore.objects.update(created_at=timezone.now() - timedelta(days=30))
+        board = top_scores.board()
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.assertEqual(archive_high_scores().scores, 2)
+
+        self.assertEqual(callbacks, [])
+        self.assertEqual(cache.get(top_scores.key), board)
+
+    def test_rebuild_racing_a_submission_is_not_kept(self):
+        RetroHighScore.objects.create(player_name='Old', score=50, level_reached=1)
+        stale = list(top_scores.queryset())
+        late = RetroHighScore.objects.create(player_name='Late', score=90, level_reached=1)
+
+        def queryset():
+            # The score commits and is submitted while the rebuild reads the table
+            top_scores.submit(entry_from_score(late))
+            return stale
+
+        with mock.patch.object(top_scores, 'queryset', queryset):
+            self.assertEqual([e['player_name'] for e in top_scores.board()['entries']], ['Old'])
+
+        self.assertIsNone(cache.get(top_scores.key))
+        self.assertEqual([e['player_name'] for e in top_scores.entries()], ['Late', 'Old'])
+
+
+class WindowedLeaderboardTests(RetroTestCase):
+    """Tests for the daily and weekly leaderboards."""
+
+    def test_windows_only_hold_recent_scores(self):
+        old = RetroHighScore.objects.create(player_name='Old', score=900, level_reached=1)
+        RetroHighScore.objects.filter(id=old.id).update(created_at=timezone.now() - timedelta(days=8))
+        RetroHighScore.objects.create(player_name='New', score=100, level_reached=1)
+
+        daily = self.client.get(HIGH_SCORES_URL, {'window': 'daily'}).json()
+        everything = self.client.get(HIGH_SCORES_URL).json()
+
+        self.assertEqual([s['player_name'] for s in daily['high_scores']], ['New'])
+        self.assertEqual([s['player_name'] for s in everything['high_scores']], ['Old', 'New'])
+
+    def test_submission_updates_warm_window_boards(self):
+        for name in ('daily', 'weekly'):
+            LEADERBOARDS[name].rebuild()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post_json(SUBMIT_URL, {'player_name': 'Today', 'score': 42, 'level_reached': 1})
+
+        with self.assertNumQueries(0):
+            weekly = self.client.get(HIGH_SCORES_URL, {'window': 'weekly'}).json()
+        self.assertEqual(weekly['high_scores'][0]['player_name'], 'Today')
+        self.assertGreater(LEADERBOARDS['daily'].timeout, 0)
+
+    def test_rebuild_command(self):
+        RetroHighScore.objects.create(player_name='P', score=5, level_reached=1)
+        out = StringIO()
+
+        call_command('rebuild_leaderboards', '--window', 'daily', stdout=out)
+
+        self.assertIn('Rebuilt daily leaderboard: 1 entries', out.getvalue())
+
+    def test_unknown_window(self):
+        self.assertEqual(self.client.get(HIGH_SCORES_URL, {'window': 'yearly'}).status_code, 400)
+
+
+class LevelLeaderboardTests(RetroTestCase):
+    """Tests for the per-level boards and histograms."""
+
+    def setUp(self):
+        super().setUp()
+        for level, score in [(1, 500), (1, 25000), (3, 900), (10, 1000000)]:
+            RetroHighScore.objects.create(player_name=f'L{level}', score=score, level_reached=level)
+
+    def test_all_levels_in_one_request(self):
+        data = self.client.get(LEVELS_URL).json()
+
+        self.assertEqual([level['level'] for level in data['levels']], list(range(1, 11)))
+        level_one = data['levels'][0]
+        self.assertEqual([s['score'] for s in level_one['high_scores']], [1000000, 25000, 900, 500])
+        self.assertEqual(level_one['histogram'][0], 2)
+        self.assertEqual(level_one['histogram'][2], 1)
+        self.assertEqual(level_one['histogram'][-1], 1)
+        # Runs that reached level 2 include those that ended on level 3 and 10
+        self.assertEqual([s['score'] for s in data['levels'][1]['high_scores']], [1000000, 900])
+        self.assertEqual([s['score'] for s in data['levels'][9]['high_scores']], [1000000])
+        self.assertEqual(data['levels'][9]['histogram'][0], 0)
+
+    def test_warm_boards_are_served_without_queries(self):
+        self.client.get(LEVELS_URL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post_json(SUBMIT_URL, {'player_name': 'New', 'score': 950, 'level_reached': 3})
+
+        with self.assertNumQueries(0):
+            data = self.client.get(LEVELS_URL, {'levels': '1,3,4'}).json()
+        level_one, level_three, level_four = data['levels']
+        self.assertEqual([s['score'] for s in level_three['high_scores']], [1000000, 950, 900])
+        self.assertEqual(level_three['histogram'][0], 2)
+        self.assertIn(950, [s['score'] for s in level_one['high_scores']])
+        self.assertNotIn(950, [s['score'] for s in level_four['high_scores']])
+
+    def test_unknown_level(self):
+        self.assertEqual(self.client.get(LEVELS_URL, {'levels': '11'}).status_code, 400)
+        self.assertEqual(self.client.get(LEVELS_URL, {'levels': 'x'}).status_code, 400)
+
+
+class KeysetLeaderboardTests(RetroTestCase):
+    """Tests for the cursor-paginated leaderboard API."""
+
+    URL = '/retro_platform_fighter/api/leaderboard/'
+
+    def setUp(self):
+        super().setUp()
+        for index, score in enumerate((50, 90, 70, 70, 10, 90, 30)):
+            RetroHighScore.objects.create(player_name=f'P{index}', score=score, level_reached=1)
+        self.ordered = list(RetroHighScore.objects.order_by('-score', '-created_at', 'id').values_list('id', flat=True))
+
+    def test_walks_every_entry_forwards_and_back(self):
+        pages = [self.client.get(self.URL, {'limit': 3}).json()]
+        while pages[-1]['next']:
+            pages.append(self.client.get(self.URL, {'limit': 3, 'cursor': pages[-1]['next']}).json())
+
+        seen = [entry['id'] for page in pages for entry in page['entries']]
+        self.assertEqual(seen, self.ordered)
+        self.assertIsNone(pages[0]['prev'])
+
+        back = self.client.get(self.URL, {'limit': 3, 'cursor': pages[1]['prev']}).json()
+        self.assertEqual(back['entries'], pages[0]['entries'])
+        self.assertIsNone(back['prev'])
+
+    def test_entries_carry_ranks_from_index(self):
+        entries = self.client.get(self.URL, {'limit': 4}).json()['entries']
+        self.assertEqual([e['rank'] for e in entries], [1, 1, 3, 3])
+
+    def test_page_around_entry(self):
+        middle = self.ordered[3]
+        page = self.client.get(self.URL, {'limit': 3, 'around_id': middle}).json()
+
+        self.assertEqual([e['id'] for e in page['entries']], self.ordered[2:5])
+        self.assertIsNotNone(page['prev'])
+        self.assertIsNotNone(page['next'])
+
+    def test_page_around_score(self):
+        page = self.client.get(self.URL, {'limit': 2, 'around_score': 60}).json()
+        self.assertEqual([e['score'] for e in page['entries']], [70, 50])
+
+    def test_rejects_tampered_cursor(self):
+        self.assertEqual(self.client.get(self.URL, {'cursor': 'bogus'}).status_code, 400)
+
+
+class LoadStateCacheTests(RetroTestCase):
+    """Tests for the read-through load-state payload cache."""
+
+    def test_second_load_is_served_from_cache(self):
+        session_key = self.start_game()
+
+        first = self.client.get(LOAD_URL).json()
+        RetroGameSession.objects.filter(session_key=session_key).update(score=999)
+        second = self.client.get(LOAD_URL).json()
+
+        self.assertEqual(first, second)
+        self.assertEqual(second['robotsDefeated'], [])
+        self.assertEqual(state_cache.stats(), {'hits': 1, 'misses': 1})
+
+    def test_save_refreshes_cached_payload(self):
+        self.start_game()
+        self.client.get(LOAD_URL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post_json(SAVE_URL, {'score': 250, 'bossDefeated': True})
+        data = self.client.get(LOAD_URL).json()
+
+        self.assertEqual((data['score'], data['bossDefeated']), (250, True))
+        self.assertEqual(state_cache.stats()['hits'], 1)
+
+    def test_reset_invalidates_cached_payload(self):
+        self.start_game()
+        self.client.get(LOAD_URL)
+
+        self.client.post('/retro_platform_fighter/api/reset-game/')
+
+        self.assertIsNone(cache.get(payload_key(self.client.session.session_key)))
+
+
+class ConditionalGetTests(RetroTestCase):
+    """Tests for ETags, 304 responses and compression of the polled endpoints."""
+
+    def test_unchanged_state_is_not_modified_without_queries(self):
+        self.start_game()
+        first = self.client.get(LOAD_URL)
+        self.assertIn('no-cache', first.headers['Cache-Control'])
+        self.assertIn('private', first.headers['Cache-Control'])
+
+        with self.assertNumQueries(0), mock.patch('games.retro_platform_fighter.state_cache.payload_etag') as etag:
+            again = self.client.get(LOAD_URL, headers={'If-None-Match': first.headers['ETag']})
+
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.headers['ETag'], first.headers['ETag'])
+        etag.assert_not_called()
+
+    def test_saved_state_has_new_etag(self):
+        self.start_game()
+        etag = self.client.get(LOAD_URL).headers['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post_json(SAVE_URL, {'score': 300})
+        response = self.client.get(LOAD_URL, headers={'If-None-Match': etag})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+        self.assertEqual(response.json()['score'], 300)
+
+    def test_high_scores_change_with_board_version(self):
+        RetroHighScore.objects.create(player_name='A', score=100, level_reached=1)
+        etag = self.client.get(HIGH_SCORES_URL).headers['ETag']
+
+        self.assertEqual(self.client.get(HIGH_SCORES_URL, headers={'If-None-Match': etag}).status_code, 304)
+        self.assertEqual(
+            self.client.get(HIGH_SCORES_URL + '?limit=5', headers={'If-None-Match': etag}).status_code, 200
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post_json(SUBMIT_URL, {'player_name': 'B', 'score': 200, 'level_reached': 2})
+        response = self.client.get(HIGH_SCORES_URL, headers={'If-None-Match': etag})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['high_scores'][0]['player_name'], 'B')
+
+    @override_settings(COMPRESSION_MIN_SIZE=1)
+    def test_large_responses_are_gzipped_with_coded_etag(self):
+        RetroHighScore.objects.create(player_name='A' * 40, score=100, level_reached=1)
+        response = self.client.get(HIGH_SCORES_URL, headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertTrue(response.headers['ETag'].endswith('-gzip"'))
+        self.assertEqual(json.loads(gzip.decompress(response.content))['high_scores'][0]['score'], 100)
+
+        again = self.client.get(HIGH_SCORES_URL, headers={
+            'Accept-Encoding': 'gzip', 'If-None-Match': response.headers['ETag']
+        })
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.headers['ETag'], response.headers['ETag'])
+
+    def test_small_responses_are_not_compressed(self):
+        self.start_game()
+        response = self.client.get(LOAD_URL, headers={'Accept-Encoding': 'gzip'})
+
+        self.assertNotIn('Content-Encoding', response.headers)
+
+
+class ProgressBitsetTests(TestCase):
+    """Tests for the bitset encoding of defeated robots and collected diamonds."""
+
+    def test_round_trip(self):
+        self.assertEqual(ids_to_mask([0, 3, 62]), (1 << 0) | (1 << 3) | (1 << 62))
+        self.assertEqual(mask_to_ids(ids_to_mask([5, 1, 1])), [1, 5])
+
+    def test_helpers_return_plain_lists(self):
+        game_state = RetroGameState()
+        game_state.set_robots_defeated([4, 2])
+        game_state.set_diamonds_collected([])
+
+        self.assertEqual(game_state.get_robots_defeated(), [2, 4])
+        self.assertEqual(game_state.get_diamonds_collected(), [])
+        with self.assertRaises(ValueError):
+            game_state.set_robots_defeated([63])
+
+    def test_save_payload_skips_and_logs_unencodable_ids(self):
+        game_state = RetroGameState()
+        with self.assertLogs('games.retro_platform_fighter.models', 'WARNING') as logs:
+            game_state.apply_save_data({'robotsDefeated': [1, 'x', -1, 100, True]})
+
+        self.assertEqual(game_state.get_robots_defeated(), [1])
+        self.assertIn("['x', -1, 100, True]", logs.output[0])
+
+    def test_migration_reports_dropped_ids(self):
+        migration = import_module('games.retro_platform_fighter.migrations.0005_progress_bitsets')
+
+        self.assertEqual(migration._to_mask('[1, "2", 63, -1, "x"]'), (0b110, [63, -1, 'x']))
+
+
+class FastJsonTests(RetroTestCase):
+    """Tests for the API JSON codecs."""
+
+    def test_codecs_agree(self):
+        data = {
+            'score': 12,
+            'playerX': 10.5,
+            'name': 'Ünïcode',
+            'created_at': timezone.now(),
+            'levels': {1: [0, 2]},
+        }
+        rendered = {name: json.loads(codec.dumps(data)) for name, codec in fast_json.CODECS.items()}
+
+        self.assertEqual(rendered['stdlib']['levels'], {'1': [0, 2]})
+        for value in rendered.values():
+            self.assertEqual(value, rendered['stdlib'])
+
+    @override_settings(API_JSON_BACKEND='stdlib')
+    def test_stdlib_matches_django_json_response(self):
+        data = {'when': timezone.now(), 'values': [1, 2.5, None]}
+        self.assertEqual(fast_json.JsonResponse(data).content, JsonResponse(data).content)
+
+    def test_invalid_body_is_rejected(self):
+        self.start_game()
+
+        for body in (b'{"score": ', b'\xff\xfe'):
+            response = self.client.post(SAVE_URL, data=body, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+
+    @override_settings(API_JSON_BACKEND='simdjson')
+    def test_unknown_backend_is_an_error(self):
+        with self.assertRaises(ImproperlyConfigured):
+            fast_json.dumps({})
+
+
+class DeltaSaveTests(RetroTestCase):
+    """Tests for the append-only delta save format."""
+
+    def test_delta_merges_into_stored_lists(self):
+        session_key = self.start_game()
+        version = self.post_json(SAVE_URL, {'robotsDefeated': [1, 2]}).json()['version']
+
+        response = self.post_json(SAVE_URL, {
+            'baseVersion': version,
+            'robotsDefeatedAdded': [2, 3],
+            'diamondsCollectedAdded': [7],
+            'score': 450,
+        })
+
+        self.assertEqual(response.json()['version'], version + 1)
+        game_state = RetroGameState.objects.get(session__session_key=session_key)
+        self.assertEqual(game_state.get_robots_defeated(), [1, 2, 3])
+        self.assertEqual(game_state.get_diamonds_collected(), [7])
+        self.assertEqual(game_state.session.score, 450)
+
+    def test_invalid_progress_ids_are_rejected(self):
+        session_key = self.start_game()
+        self.post_json(SAVE_URL, {'robotsDefeated': [1]})
+
+        for body in ({'robotsDefeated': [1, 63]}, {'diamondsCollectedAdded': [-1]},
+                     {'robotsDefeatedAdded': ['2']}, {'diamondsCollected': 5}):
+            response = self.post_json(SAVE_URL, body)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()['error'], 'Validation failed')
+        batch = self.post_json(BATCH_SAVE_URL, {'snapshots': [{'score': 1}, {'robotsDefeated': [99]}]})
+        self.assertEqual(batch.status_code, 400)
+
+        game_state = RetroGameState.objects.get(session__session_key=session_key)
+        self.assertEqual((game_state.get_robots_defeated(), game_state.version), ([1], 1))
+
+    def test_non_object_payloads_are_rejected(self):
+        self.start_game()
+
+        for body in ([], 1, 'x'):
+            response = self.post_json(SAVE_URL, body)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()['details'], ['Save data must be a JSON object'])
+
+    def test_stale_base_version_conflicts(self):
+        self.start_game()
+        version = self.post_json(SAVE_URL, {'robotsDefeated': [1]}).json()['version']
+
+        response = self.post_json(SAVE_URL, {
+            'baseVersion': version - 1,
+            'robotsDefeatedAdded': [5],
+        })
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['version'], version)
+
+    def test_delta_without_stored_state_is_not_found(self):
+        session_key = self.start_game()
+        RetroGameState.objects.filter(session__session_key=session_key).delete()
+
+        response = self.post_json(SAVE_URL, {'baseVersion': 0, 'robotsDefeatedAdded': [5]})
+
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(RetroGameState.objects.filter(session__session_key=session_key).exists())
+
+    def test_delta_refreshes_cached_payload(self):
+        self.start_game()
+        version = self.client.get(LOAD_URL).json()['version']
+
+        self.post_json(SAVE_URL, {'baseVersion': version, 'robotsDefeatedAdded': [4]})
+        data = self.client.get(LOAD_URL).json()
+
+        self.assertEqual((data['robotsDefeated'], data['version']), ([4], version + 1))
+
+    def test_delta_records_milestones(self):
+        self.start_game()
+        version = self.post_json(SAVE_URL, {'level': 2, 'score': 80}).json()['version']
+
+        self.post_json(SAVE_URL, {
+            'baseVersion': version, 'score': 120, 'levelCompleted': True, 'robotsDefeatedAdded': [1]
+        })
+        self.post_json(SAVE_URL, {'baseVersion': version + 1, 'levelCompleted': True, 'robotsDefeatedAdded': [2]})
+
+        milestone = RetroGameMilestone.objects.get()
+        self.assertEqual((milestone.kind, milestone.level, milestone.score), ('level_completed', 2, 120))
+
+    def test_buffered_deltas_accumulate(self):
+        snapshot = merge_snapshot({'robotsDefeatedAdded': [1]}, {'robotsDefeatedAdded': [2]})
+        self.assertEqual(snapshot['robotsDefeatedAdded'], [1, 2])
+
+        snapshot = merge_snapshot(snapshot, {'robotsDefeated': []})
+        self.assertNotIn('robotsDefeatedAdded', snapshot)
+
+
+class BatchSaveTests(RetroTestCase):
+    """Tests for the batched save-state endpoint."""
+
+    def test_applies_newest_snapshot_and_records_milestones(self):
+        session_key = self.start_game()
+        snapshots = [
+            {'level': 1, 'score': 100, 'robotsDefeatedAdded': [1]},
+            {'level': 1, 'score': 200, 'bossDefeated': True, 'robotsDefeatedAdded': [2]},
+            {'level': 1, 'score': 300, 'levelCompleted': True},
+            {'level': 2, 'score': 350, 'robotsDefeated': [], 'bossDefeated': False, 'levelCompleted': False},
+            {'level': 2, 'score': 400, 'robotsDefeatedAdded': [5]},
+        ]
+
+        response = self.post_json(BATCH_SAVE_URL, {'snapshots': snapshots})
+
+        data = response.json()
+        self.assertEqual(data['applied'], 5)
+        self.assertEqual(data['version'], 1)
+        self.assertEqual(data['milestones'], [
+            {'kind': 'boss_defeated', 'level': 1, 'score': 200},
+            {'kind': 'level_completed', 'level': 1, 'score': 300},
+        ])
+        game_session = RetroGameSession.objects.get(session_key=session_key)
+        self.assertEqual((game_session.current_level, game_session.score), (2, 400))
+        self.assertEqual(game_session.game_state.get_robots_defeated(), [5])
+
+    def test_milestones_are_recorded_once(self):
+        self.start_game()
+        batch = {'snapshots': [{'level': 3, 'bossDefeated': True}]}
+
+        first = self.post_json(BATCH_SAVE_URL, batch).json()
+        RetroGameState.objects.update(boss_defeated=False)
+        second = self.post_json(BATCH_SAVE_URL, batch).json()
+
+        self.assertEqual(len(first['milestones']), 1)
+        self.assertEqual(second['milestones'], [])
+        self.assertEqual(RetroGameMilestone.objects.count(), 1)
+
+    def test_base_version_is_checked(self):
+        session_key = self.start_game()
+        version = self.post_json(BATCH_SAVE_URL, {'snapshots': [{'score': 100}]}).json()['version']
+
+        stale = self.post_json(BATCH_SAVE_URL, {'baseVersion': version - 1, 'snapshots': [{'score': 200}]})
+        current = self.post_json(BATCH_SAVE_URL, {'baseVersion': version, 'snapshots': [{'score': 300}]})
+
+        self.assertEqual(stale.status_code, 409)
+        self.assertEqual(stale.json()['version'], version)
+        self.assertEqual(current.json()['version'], version + 1)
+        self.assertEqual(RetroGameSession.objects.get(session_key=session_key).score, 300)
+
+    def test_single_saves_record_milestones(self):
+        self.start_game()
+
+        self.post_json(SAVE_URL, {'level': 4, 'levelCompleted': True})
+        self.post_json(SAVE_URL, {'level': 4, 'levelCompleted': True})
+
+        milestone = RetroGameMilestone.objects.get()
+        self.assertEqual((milestone.kind, milestone.level), ('level_completed', 4))
+
+    @override_settings(SAVE_BATCH_MAX_SNAPSHOTS=2)
+    def test_rejects_invalid_batches(self):
+        self.start_game()
+
+        for body in ({}, {'snapshots': []}, {'snapshots': [1]}, {'snapshots': [{}, {}, {}]},
+                     {'snapshots': [{'baseVersion': 0}]}, {'snapshots': [{}], 'baseVersion': '1'}):
+            self.assertEqual(self.post_json(BATCH_SAVE_URL, body).status_code, 400)
+
+@override_settings(CACHES=SHARED_CACHES, GAME_STATE_WRITE_BEHIND=True, GAME_STATE_MAX_STALENESS=3600)
+class WriteBehindTests(RetroTestCase):
+    """Tests for buffered save-state autosaves."""
+
+    def test_autosave_is_buffered_until_flush(self):
+        session_key = self.start_game()
+
+        response = self.post_json(SAVE_URL, {'score': 1200, 'level': 2})
+
+        self.assertTrue(response.json()['buffered'])
+        self.assertEqual(RetroGameSession.objects.get(session_key=session_key).score, 0)
+        self.assertEqual(self.client.get(LOAD_URL).json()['score'], 1200)
+
+        self.assertEqual(state_buffer.flush(), 1)
+        game_session = RetroGameSession.objects.get(session_key=session_key)
+        self.assertEqual((game_session.score, game_session.current_level), (1200, 2))
+        self.assertEqual(state_buffer.pending(), 0)
+
+    def test_latest_snapshot_wins(self):
+        session_key = self.start_game()
+
+        self.post_json(SAVE_URL, {'score': 100, 'lives': 2})
+        self.post_json(SAVE_URL, {'score': 300})
+        state_buffer.flush()
+
+        game_session = RetroGameSession.objects.get(session_key=session_key)
+        self.assertEqual((game_session.score, game_session.lives), (300, 2))
+
+    def test_manual_save_and_level_completion_write_through(self):
+        session_key = self.start_game()
+
+        self.post_json(SAVE_URL, {'score': 100, 'lives': 2})
+        response = self.post_json(SAVE_URL, {'score': 500, 'manual': True})
+
+        self.assertNotIn('buffered', response.json())
+        game_session = RetroGameSession.objects.get(session_key=session_key)
+        self.assertEqual((game_session.score, game_session.lives), (500, 2))
+        self.assertEqual(state_buffer.pending(), 0)
+
+        self.post_json(SAVE_URL, {'level': 3, 'levelCompleted': True})
+        game_session.refresh_from_db()
+        self.assertEqual(game_session.current_level, 3)
+        self.assertTrue(game_session.game_state.level_completed)
+
+    @override_settings(GAME_STATE_MAX_STALENESS=0)
+    def test_stale_snapshots_flush_on_next_save(self):
+        session_key = self.start_game()
+
+        self.post_json(SAVE_URL, {'score': 700})
+
+        self.assertEqual(RetroGameSession.objects.get(session_key=session_key).score, 700)
+
+    def test_any_process_flushes_the_shared_queue(self):
+        session_key = self.start_game()
+        self.post_json(SAVE_URL, {'score': 100})
+        self.post_json(SAVE_URL, {'score': 200})
+
+        # A fresh buffer stands in for a worker that never saw these autosaves
+        self.assertEqual(GameStateBuffer().pending(), 1)
+        out = StringIO()
+        call_command('flush_game_states', stdout=out)
+
+        self.assertIn('Flushed 1 buffered game states', out.getvalue())
+        self.assertEqual(RetroGameSession.objects.get(session_key=session_key).score, 200)
+        self.assertEqual(state_buffer.flush(), 0)
+
+    def test_autosave_after_flush_is_queued_again(self):
+        session_key = self.start_game()
+        self.post_json(SAVE_URL, {'score': 100})
+        state_buffer.flush()
+
+        self.post_json(SAVE_URL, {'score': 300})
+
+        self.assertEqual(state_buffer.pending(), 1)
+        self.assertEqual(state_buffer.flush(), 1)
+        self.assertEqual(RetroGameSession.objects.get(session_key=session_key).score, 300)
+
+    def test_put_waits_for_the_session_lock(self):
+        session_key = self.start_game()
+        cache.add(f'{buffer_key(session_key)}:lock', True)
+
+        with mock.patch('games.retro_platform_fighter.state_buffer.LOCK_TIMEOUT', 0.05):
+            with self.assertRaises(TimeoutError):
+                state_buffer.put(session_key, {'score': 100})
+        self.assertIsNone(state_buffer.get(session_key))
+
+    def test_flush_refreshes_the_loaded_version(self):
+        session_key = self.start_game()
+        version = self.client.get(LOAD_URL).json()['version']
+        self.post_json(SAVE_URL, {'baseVersion': version, 'robotsDefeatedAdded': [1]})
+        state_buffer.flush()
+
+        loaded = self.client.get(LOAD_URL).json()
+        response = self.post_json(SAVE_URL, {
+            'manual': True, 'baseVersion': loaded['version'], 'robotsDefeatedAdded': [2]
+        })
+
+        self.assertEqual(loaded['version'], version + 1)
+        self.assertEqual(response.json()['version'], version + 2)
+        game_state = RetroGameState.objects.get(session__session_key=session_key)
+        self.assertEqual(game_state.get_robots_defeated(), [1, 2])
+
+    def test_flush_records_milestones(self):
+        self.start_game()
+        self.post_json(SAVE_URL, {'level': 3, 'score': 500, 'bossDefeated': True})
+        self.assertFalse(RetroGameMilestone.objects.exists())
+
+        state_buffer.flush()
+
+        milestone = RetroGameMilestone.objects.get()
+        self.assertEqual((milestone.kind, milestone.level, milestone.score), ('boss_defeated', 3, 500))
+
+    def test_refused_manual_save_keeps_the_buffered_autosave(self):
+        session_key = self.start_game()
+        self.post_json(SAVE_URL, {'score': 999})
+
+        response = self.post_json(SAVE_URL, {'manual': True, 'baseVersion': 5, 'robotsDefeatedAdded': [1]})
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(state_buffer.get(session_key), {'score': 999})
+        self.assertEqual(state_buffer.flush(), 1)
+        self.assertEqual(RetroGameSession.objects.get(session_key=session_key).score, 999)
+
+    def test_refused_batch_keeps_the_buffered_autosave(self):
+        session_key = self.start_game()
+        self.post_json(SAVE_URL, {'score': 100})
+
+        response = self.post_json(BATCH_SAVE_URL, {'baseVersion': 5, 'snapshots': [{'score': 200}]})
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(state_buffer.get(session_key), {'score': 100})
+        self.assertEqual(state_buffer.flush(), 1)
+        self.assertEqual(RetroGameSession.objects.get(session_key=session_key).score, 100)
+
+    @override_settings(CACHES=settings.CACHES)
+    def test_refuses_a_per_process_cache(self):
+        with self.assertRaises(ImproperlyConfigured):
+            state_buffer.enabled
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncApiViewTests(RetroTestCase):
+    """Tests for the native async API views."""
+
+    def setUp(self):
+        super().setUp()
+        session = SessionStore()
+        session.create()
+        RetroGameSession.objects.create(session_key=session.session_key)
+        self.async_client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+
+    async def apost_json(self, url: str, data):
+        return await self.async_client.post(url, data=json.dumps(data), content_type='application/json')
+
+    async def test_save_then_load(self):
+        response = await self.apost_json(SAVE_URL, {'level': 2, 'score': 150, 'robotsDefeated': [1, 4]})
+        self.assertEqual(response.json(), {'success': True, 'version': 1})
+
+        loaded = (await self.async_client.get(LOAD_URL)).json()
+        self.assertEqual(loaded['level'], 2)
+        self.assertEqual(loaded['robotsDefeated'], [1, 4])
+
+        delta = await self.apost_json(SAVE_URL, {'baseVersion': 1, 'robotsDefeatedAdded': [7]})
+        self.assertEqual(delta.json()['version'], 2)
+        loaded = (await self.async_client.get(LOAD_URL)).json()
+        self.assertEqual(loaded['robotsDefeated'], [1, 4, 7])
+
+    async def test_submit_and_read_high_scores(self):
+        response = await self.apost_json(SUBMIT_URL, {'player_name': 'Async', 'score': 300, 'level_reached': 2})
+        self.assertEqual(response.json()['rank'], 1)
+
+        data = (await self.async_client.get(HIGH_SCORES_URL)).json()
+        self.assertEqual([s['player_name'] for s in data['high_scores']], ['Async'])
+        bad = await self.async_client.get(HIGH_SCORES_URL, {'window': 'yearly'})
+        self.assertEqual(bad.status_code, 400)
+
+    async def test_conditional_get(self):
+        for url in (LOAD_URL, HIGH_SCORES_URL):
+            etag = (await self.async_client.get(url)).headers['ETag']
+            response = await self.async_client.get(url, headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 304)
+
+    @override_settings(RATE_LIMIT_BACKEND='local', RATE_LIMITS={'default': (100, 60), 'submit_score': (1, 60)})
+    async def test_rate_limit_applies(self):
+        score = {'player_name': 'P', 'score': 10, 'level_reached': 1}
+        self.assertEqual((await self.apost_json(SUBMIT_URL, score)).status_code, 200)
+        self.assertEqual((await self.apost_json(SUBMIT_URL, score)).status_code, 429)
+
+
+class SessionWriteTests(RetroTestCase):
+    """Tests that API requests leave the session store alone."""
+
+    def session_queries(self, request):
+        with CaptureQueriesContext(connection) as queries:
+            response = request()
+        return response, [q['sql'] for q in queries if 'django_session' in q['sql']]
+
+    def test_autosave_and_load_do_not_touch_sessions(self):
+        self.start_game()
+
+        response, queries = self.session_queries(lambda: self.post_json(SAVE_URL, {'score': 10}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries, [])
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+
+        response, queries = self.session_queries(lambda: self.client.get(LOAD_URL))
+        self.assertEqual(queries, [])
+
+    @override_settings(SESSION_REFRESH_INTERVAL=60)
+    def test_expiry_is_refreshed_once_per_interval(self):
+        self.start_game()
+        later = time.time() + 120
+
+        with mock.patch('retro_game_web.middleware.time.time', return_value=later):
+            refreshed = self.post_json(SAVE_URL, {'score': 10})
+            again = self.post_json(SAVE_URL, {'score': 20})
+            read = self.client.get(LOAD_URL)
+
+        self.assertIn(settings.SESSION_COOKIE_NAME, refreshed.cookies)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, again.cookies)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, read.cookies)
+
+
+class QueryBudgetTests(QueryBudgetMixin, RetroTestCase):
+    """Exact SQL and cache plans per endpoint; change a budget only on purpose."""
+
+    def add_scores(self):
+        RetroHighScore.objects.bulk_create([
+            RetroHighScore(player_name=f'P{i}', score=i * 100, level_reached=i % 10 + 1)
+            for i in range(1, 6)
+        ])
+        rank_index.rebuild()
+
+    def committed(self, request):
+        """Wrap request so its on-commit work counts against the budget."""
+        def run():
+            with self.captureOnCommitCallbacks(execute=True):
+                return request()
+        return run
+
+    def test_index(self):
+        self.assertBudget(lambda: self.client.get('/retro_platform_fighter/'), queries=[], cache=[])
+
+    def test_play_first_visit(self):
+        self.assertBudget(
+            lambda: self.client.get('/retro_platform_fighter/play/'),
+            queries=[
+                'SELECT django_session',
+                'INSERT django_session',
+                'SELECT retro_platform_fighter_retrogamesession',
+                'INSERT retro_platform_fighter_retrogamesession',
+                'SELECT retro_platform_fighter_retrogamestate',
+                'INSERT retro_platform_fighter_retrogamestate',
+                'UPDATE django_session',
+            ],
+            cache=['has_key', 'set', 'set']
+        )
+
+    def test_play_revisit(self):
+        self.start_game()
+        self.assertBudget(
+            lambda: self.client.get('/retro_platform_fighter/play/'),
+            queries=[
+                'SELECT django_session',
+                'INSERT django_session',
+                'SELECT django_session',
+                'DELETE django_session',
+                'UPDATE retro_platform_fighter_retrogamesession',
+                'SELECT retro_platform_fighter_retrogamesession',
+                'SELECT retro_platform_fighter_retrogamestate',
+                'UPDATE django_session',
+            ],
+            cache=['get', 'has_key', 'set', 'delete', 'add', 'get', 'delete_many', 'delete', 'delete', 'set']
+        )
+
+    def test_save(self):
+        self.start_game()
+        self.assertBudget(
+            self.committed(lambda: self.post_json(SAVE_URL, {'score': 10})),
+            queries=[
+                'SELECT retro_platform_fighter_retrogamesession',
+                'SELECT retro_platform_fighter_retrogamestate',
+                'UPDATE retro_platform_fighter_retrogamesession',
+                'UPDATE retro_platform_fighter_retrogamestate',
+            ],
+            cache=['incr', 'add', 'get', 'get', 'set']
+        )
+
+    def test_save_delta(self):
+        self.start_game()
+        version = self.post_json(SAVE_URL, {'score': 10}).json()['version']
+        self.assertBudget(
+            self.committed(lambda: self.post_json(SAVE_URL, {'baseVersion': version, 'robotsDefeatedAdded': [1]})),
+            queries=[
+                'UPDATE retro_platform_fighter_retrogamestate',
+                'UPDATE retro_platform_fighter_retrogamesession',
+            ],
+            cache=['incr', 'get', 'get']
+        )
+
+    def test_batch_save(self):
+        self.start_game()
+        self.assertBudget(
+            self.committed(lambda: self.post_json(BATCH_SAVE_URL, {'snapshots': [{'score': 10}, {'score': 20}]})),
+            queries=[
+                'SELECT retro_platform_fighter_retrogamesession',
+                'SELECT retro_platform_fighter_retrogamestate',
+                'UPDATE retro_platform_fighter_retrogamesession',
+                'UPDATE retro_platform_fighter_retrogamestate',
+            ],
+            cache=['incr', 'add', 'get', 'get', 'set']
+        )
+
+    def test_load_cold(self):
+        self.start_game()
+        self.assertBudget(
+            lambda: self.client.get(LOAD_URL),
+            queries=[
+                'SELECT retro_platform_fighter_retrogamesession',
+                'SELECT retro_platform_fighter_retrogamestate',
+            ],
+            cache=['get', 'set']
+        )
+
+    def test_load_warm(self):
+        self.start_game()
+        self.client.get(LOAD_URL)
+        self.assertBudget(lambda: self.client.get(LOAD_URL), queries=[], cache=['get'])
+
+    def test_submit(self):
+        self.add_scores()
+        self.client.get(HIGH_SCORES_URL)
+        self.client.get(LEVELS_URL)
+        score = {'player_name': 'P', 'score': 10, 'level_reached': 1}
+        self.assertBudget(
+            self.committed(lambda: self.post_json(SUBMIT_URL, score)),
+            queries=[
+                'INSERT retro_platform_fighter_retrohighscore',
+                'UPDATE retro_platform_fighter_retroscoreranknode',
+                'SELECT retro_platform_fighter_retroscoreranknode',
+                'INSERT retro_platform_fighter_retroscoreranknode',
+                'UPDATE retro_platform_fighter_retroscoreranknode',
+                'SELECT retro_platform_fighter_retroscoreranknode',
+            ],
+            cache=[
+                'incr', 'add', 'get',  # rate limit, first request
+                # each model: change counter (first change), then the update
+                'incr', 'add', 'get', 'add', 'get', 'set', 'delete',  # all-time board, warm
+                'incr', 'add', 'get', 'incr', 'add', 'get',  # weekly and daily boards, cold
+                'incr', 'add', 'get', 'add', 'get', 'set', 'delete',  # level board, warm
+                'incr', 'add', 'get', 'add', 'get', 'set', 'delete',  # histogram, warm
+            ]
+        )
+
+    def test_high_scores_cold(self):
+        self.add_scores()
+        self.assertBudget(
+            lambda: self.client.get(HIGH_SCORES_URL),
+            queries=['SELECT retro_platform_fighter_retrohighscore'],
+            cache=['get', 'get', 'add', 'set', 'get', 'delete']
+        )
+
+    def test_high_scores_warm(self):
+        self.add_scores()
+        self.client.get(HIGH_SCORES_URL)
+        self.assertBudget(lambda: self.client.get(HIGH_SCORES_URL), queries=[], cache=['get'])
+
+    def test_leaderboard_page(self):
+        self.add_scores()
+        self.client.get('/retro_platform_fighter/leaderboard/')
+        self.assertBudget(lambda: self.client.get('/retro_platform_fighter/leaderboard/'), queries=[], cache=['get'])
+
+    def test_leaderboard_entries(self):
+        self.add_scores()
+        self.assertBudget(
+            lambda: self.client.get(LEADERBOARD_API_URL),
+            queries=[
+                'SELECT retro_platform_fighter_retrohighscore',
+                'SELECT retro_platform_fighter_retrohighscorearchive',
+                'SELECT retro_platform_fighter_retroscoreranknode',
+            ],
+            cache=[]
+        )
+
+    def test_level_leaderboards_warm(self):
+        self.add_scores()
+        self.client.get(LEVELS_URL)
+        self.assertBudget(lambda: self.client.get(LEVELS_URL), queries=[], cache=['get_many', 'get'])
+
+    def test_reset(self):
+        self.start_game()
+        self.assertBudget(
+            lambda: self.client.post(RESET_URL),
+            queries=[
+                'SELECT retro_platform_fighter_retrogamesession',
+                'DELETE retro_platform_fighter_retrogamestate',
+                'DELETE retro_platform_fighter_retrogamemilestone',
+                'DELETE retro_platform_fighter_retrogamesession',
+            ],
+            cache=['delete_many', 'delete', 'get']
+        )
+
+
+class RateLimitTests(RetroTestCase):
+    """Tests for the per-endpoint sliding-window and token-bucket rate limiters."""
+
+    def hit_at(self, limiter, now, limit=3, period=60):
+        with mock.patch('games.retro_platform_fighter.throttling.time.time', return_value=now):
+            return limiter.hit('client', limit, period)
+
+    def test_cache_limiter_counts_atomically_per_period(self):
+        limiter = CacheRateLimiter()
+        results = [limiter.hit('client', 3, 60) for _ in range(4)]
+
+        self.assertEqual([r.allowed for r in results], [True, True, True, False])
+        self.assertEqual(results[2].remaining, 0)
+        self.assertGreaterEqual(results[3].retry_after, 1)
+
+    def test_cache_limiter_slides_across_period_boundary(self):
+        limiter = CacheRateLimiter()
+        for _ in range(3):
+            self.assertTrue(self.hit_at(limiter, 6059).allowed)
+
+        # A fixed window would hand out a fresh budget here
+        denied = self.hit_at(limiter, 6061)
+        self.assertFalse(denied.allowed)
+        self.assertEqual(denied.retry_after, 19)
+        self.assertTrue(self.hit_at(limiter, 6061 + denied.retry_after).allowed)
+
+    def test_cache_limiter_makes_one_round_trip_in_steady_state(self):
+        limiter = CacheRateLimiter()
+        self.hit_at(limiter, 6000)
+        with capture_cache_operations() as calls:
+            self.hit_at(limiter, 6001)
+
+        self.assertEqual([name for name, _ in calls], ['incr'])
+
+    def test_local_limiter_refills_continuously(self):
+        limiter = LocalRateLimiter()
+        with mock.patch('games.retro_platform_fighter.throttling.time.monotonic', return_value=100.0):
+            self.assertTrue(limiter.hit('client', 2, 10).allowed)
+            self.assertTrue(limiter.hit('client', 2, 10).allowed)
+            denied = limiter.hit('client', 2, 10)
+        self.assertFalse(denied.allowed)
+        self.assertEqual(denied.retry_after, 5)
+
+        with mock.patch('games.retro_platform_fighter.throttling.time.monotonic', return_value=105.0):
+            self.assertTrue(limiter.hit('client', 2, 10).allowed)
+
+    @override_settings(
+        RATE_LIMIT_ENABLED=False,
+        RATE_LIMIT_BACKEND='local',
+        RATE_LIMITS={'default': (100, 60), 'submit_score': (1, 60)}
+    )
+    def test_can_be_disabled(self):
+        score = {'player_name': 'P', 'score': 10, 'level_reached': 1}
+        for _ in range(3):
+            self.assertEqual(self.post_json(SUBMIT_URL, score).status_code, 200)
+
+    @override_settings(
+        RATE_LIMIT_BACKEND='local',
+        RATE_LIMITS={'default': (100, 60), 'save_state': (5, 60), 'submit_score': (1, 60)}
+    )
+    def test_endpoints_have_separate_budgets(self):
+        self.start_game()
+        score = {'player_name': 'P', 'score': 10, 'level_reached': 1}
+
+        self.assertEqual(self.post_json(SUBMIT_URL, score).status_code, 200)
+        throttled = self.post_json(SUBMIT_URL, score)
+        self.assertEqual(throttled.status_code, 429)
+        self.assertIn('Retry-After', throttled.headers)
+
+        self.assertEqual(self.post_json(SAVE_URL, {'score': 5}).status_code, 200)
@@ -0,0 +1,248 @@
+"""
+Rate limiting for the Retro Platform Fighter API.
+
+Each endpoint scope has its own budget in ``settings.RATE_LIMITS`` as
+``(requests, period_seconds)``. Two backends are available through
+``settings.RATE_LIMIT_BACKEND``:
+
+- ``cache``: a sliding-window counter in the shared cache. A request costs
+  one atomic ``incr`` on a counter keyed by period; the previous period's
+  count, weighted by how much of it the sliding window still covers, is
+  added to it. Unlike a fixed window, this does not let a client spend a
+  whole budget at the end of one period and another at the start of the
+  next. It is safe across workers and, in steady state, needs a single
+  cache round-trip.
+- ``local``: an in-process token bucket that refills continuously. It is
+  exact but per process, which suits tests and single-worker development.
+
+``rate_limit`` wraps both sync and async views; async views hit the cache
+through its async API.
+"""
+
+import math
+import threading
+import time
+from functools import wraps
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+
+from .fast_json import JsonResponse
+
+DEFAULT_RATE_LIMITS = {
+    'default': (100, 60),
+}
+KEY_PREFIX = 'ratelimit'
+
+
+class RateLimitResult(NamedTuple):
+    """Outcome of counting one request against a budget."""
+    allowed: bool
+    remaining: int
+    retry_after: int
+
+
+class CacheRateLimiter:
+    """
+    Sliding-window counter kept with atomic cache increments.
+
+    A finished period's count no longer changes, so each process reads it
+    once per client and remembers it; only the current period's ``incr``
+    goes to the cache on every request. Rejected requests are taken back
+    out of the count, so they do not extend the wait.
+    """
+
+    # Remembered previous-period counts kept before the memo is cleared
+    MAX_REMEMBERED = 10000
+
+    def __init__(self):
+        self._previous: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, limit: int, period: int) -> RateLimitResult:
+        now = time.time()
+        current_key, previous_key = self._keys(key, period, now)
+        try:
+            used = cache.incr(current_key)
+        except ValueError:
+            # First request of the period; another worker may win the race.
+            # The counter outlives its period to serve as the next one's previous.
+            if cache.add(current_key, 1, timeout=2 * period + 1):
+                used = 1
+            else:
+                used = cache.incr(current_key)
+        previous = self._remembered(previous_key)
+        if previous is None:
+            previous = self._remember(previous_key, cache.get(previous_key, 0))
+        result = self._result(used, previous, limit, period, now)
+        if not result.allowed:
+            try:
+                cache.decr(current_key)
+            except ValueError:
+                pass
+        return result
+
+    async def ahit(self, key: str, limit: int, period: int) -> RateLimitResult:
+        now = time.time()
+        current_key, previous_key = self._keys(key, period, now)
+        try:
+            used = await cache.aincr(current_key)
+        except ValueError:
+            if await cache.aadd(current_key, 1, timeout=2 * period + 1):
+                used = 1
+            else:
+                used = await cache.aincr(current_key)
+        previous = self._remembered(previous_key)
+        if previous is None:
+            previous = self._remember(previous_key, await cache.aget(previous_key, 0))
+        result = self._result(used, previous, limit, period, now)
+        if not result.allowed:
+            try:
+                await cache.adecr(current_key)
+            except ValueError:
+                pass
+        return result
+
+    def _keys(self, key: str, period: int, now: float) -> Tuple[str, str]:
+        window = int(now // period)
+        return f'{KEY_PREFIX}:{key}:{window}', f'{KEY_PREFIX}:{key}:{window - 1}'
+
+    def _remembered(self, previous_key: str) -> Optional[int]:
+        with self._lock:
+            return self._previous.get(previous_key)
+
+    def _remember(self, previous_key: str, count: int) -> int:
+        with self._lock:
+            if len(self._previous) >= self.MAX_REMEMBERED:
+                self._previous.clear()
+            self._previous[previous_key] = count
+        return count
+
+    def _result(self, used: int, previous: int, limit: int, period: int, now: float) -> RateLimitResult:
+        left_in_period = period - now % period
+        weighted = previous * left_in_period / period + used
+        if weighted <= limit:
+            return RateLimitResult(True, max(0, int(limit - weighted)), 0)
+
+        # Rejected, so not counted: wait until this request fits the window
+        used -= 1
+        if used < limit:
+            # The previous period's share must shrink to the budget left
+            wait = left_in_period - (limit - used - 1) * period / previous
+        else:
+            # This period's count must itself slide out far enough
+            wait = left_in_period + period * (1 - (limit - 1) / used)
+        return RateLimitResult(False, 0, max(1, math.ceil(wait)))
+
+    def reset(self) -> None:
+        """Forget the remembered previous-period counts."""
+        with self._lock:
+            self._previous.clear()
+
+
+class LocalRateLimiter:
+    """Continuously refilled in-process token bucket."""
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, limit: int, period: int) -> RateLimitResult:
+        now = time.monotonic()
+        rate = limit / period
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (float(limit), now))
+            tokens = min(float(limit), tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+        retry_after = 0 if allowed else max(1, int((1 - tokens) / rate + 0.999))
+        return RateLimitResult(allowed, int(tokens), retry_after)
+
+    async def ahit(self, key: str, limit: int, period: int) -> RateLimitResult:
+        # No I/O, so the bucket is taken inline
+        return self.hit(key, limit, period)
+
+    def reset(self) -> None:
+        """Forget every bucket."""
+        with self._lock:
+            self._buckets.clear()
+
+
+_limiters = {
+    'cache': CacheRateLimiter(),
+    'local': LocalRateLimiter(),
+}
+
+
+def get_rate_limiter():
+    """Return the limiter selected by settings.RATE_LIMIT_BACKEND."""
+    return _limiters[getattr(settings, 'RATE_LIMIT_BACKEND', 'cache')]
+
+
+def get_rate_limit(scope: str) -> Tuple[int, int]:
+    """Return the (requests, period) budget for an endpoint scope."""
+    limits = getattr(settings, 'RATE_LIMITS', DEFAULT_RATE_LIMITS)
+    return limits.get(scope) or limits.get('default') or DEFAULT_RATE_LIMITS['default']
+
+
+def get_client_ip(request) -> str:
+    """Return the address requests are rate limited by."""
+    return request.META.get('REMOTE_ADDR', '127.0.0.1')
+
+
+def rate_limits_enabled() -> bool:
+    """Whether settings.RATE_LIMIT_ENABLED leaves throttling on."""
+    return getattr(settings, 'RATE_LIMIT_ENABLED', True)
+
+
+def check_rate_limit(request, scope: str = 'default') -> RateLimitResult:
+    """Count one request by this client against the budget of the given scope."""
+    limit, period = get_rate_limit(scope)
+    key = f'{scope}:{get_client_ip(request)}'
+    return get_rate_limiter().hit(key, limit, period)
+
+
+async def acheck_rate_limit(request, scope: str = 'default') -> RateLimitResult:
+    """Async version of ``check_rate_limit``."""
+    limit, period = get_rate_limit(scope)
+    key = f'{scope}:{get_client_ip(request)}'
+    return await get_rate_limiter().ahit(key, limit, period)
+
+
+def throttled_response(result: RateLimitResult) -> JsonResponse:
+    """Build the 429 response for a rejected request."""
+    return JsonResponse(
+        {'error': 'Request was throttled. Please try again later.'},
+        status=429,
+        headers={'Retry-After': str(result.retry_after)}
+    )
+
+
+def rate_limit(scope: str = 'default'):
+    """Decorator that applies the budget of an endpoint scope to a view."""
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def _wrapped_async_view(request, *args, **kwargs):
+                if not rate_limits_enabled():
+                    return await view_func(request, *args, **kwargs)
+                result = await acheck_rate_limit(request, scope)
+                if not result.allowed:
+                    return throttled_response(result)
+                return await view_func(request, *args, **kwargs)
+            return _wrapped_async_view
+
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if not rate_limits_enabled():
+                return view_func(request, *args, **kwargs)
+            result = check_rate_limit(request, scope)
+            if not result.allowed:
+                return throttled_response(result)
+            return view_func(request, *args, **kwargs)
+        return _wrapped_view
+    return decorator
@@ -1,10 +1,13 @@
+from django.conf import settings
 from django.urls import path
-from django.views.decorators.cache import cache_page
 from django.views.decorators.http import require_http_methods
-from . import views
+from . import async_views, views
 
 app_name = 'retro_platform_fighter'
 
+# Serve the hot API endpoints from the native async views under ASGI
+api = async_views if getattr(settings, 'API_ASYNC_VIEWS', False) else views
+
 urlpatterns = [
     # Game pages
     path('', views.IndexView.as_view(), name='index'),
@@ -13,21 +16,33 @@ urlpatterns = [
     
     # API endpoints - using class-based views with appropriate HTTP methods
     path('api/save-state/', 
-         views.SaveGameStateView.as_view(), 
+         api.SaveGameStateView.as_view(), 
          name='save_state'
     ),
+    path('api/save-state/batch/', 
+         api.SaveGameStateBatchView.as_view(), 
+         name='save_state_batch'
+    ),
     path('api/load-state/', 
-         require_http_methods(['GET'])(views.load_game_state), 
+         require_http_methods(['GET'])(api.load_game_state), 
          name='load_state'
     ),
     path('api/submit-score/', 
-         views.SubmitHighScoreView.as_view(), 
+         api.SubmitHighScoreView.as_view(), 
          name='submit_score'
     ),
     path('api/high-scores/', 
-         cache_page(60 * 5)(require_http_methods(['GET'])(views.high_scores)), 
+         require_http_methods(['GET'])(api.high_scores), 
          name='high_scores'
     ),
+    path('api/leaderboard/', 
+         views.leaderboard_entries, 
+         name='leaderboard_entries'
+    ),
+    path('api/levels/', 
+         views.level_leaderboards, 
+         name='level_leaderboards'
+    ),
     path('api/reset-game/', 
          require_http_methods(['POST'])(views.reset_game), 
          name='reset_game'
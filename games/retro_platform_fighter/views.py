@@ -1,5 +1,5 @@
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse, HttpResponseBadRequest, HttpResponseServerError
+from django.http import HttpResponseBadRequest, HttpResponseServerError
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.cache import cache_page, never_cache
 from django.views.decorators.vary import vary_on_cookie
@@ -12,16 +12,26 @@ from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.conf import settings
 from django.views.decorators.clickjacking import xframe_options_exempt
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
 from django.core.validators import validate_email
 from django.core.exceptions import ValidationError
 from django.db.models import F, Q, Count, Max, Min, Sum
 from ratelimit import limits, sleep_and_retry
-from .models import RetroGameSession, RetroHighScore, RetroGameState
-import json
+from . import fast_json
+from .fast_json import JsonResponse
+from .models import RetroGameMilestone, RetroGameSession, RetroHighScore, RetroGameState
+from .leaderboard import (
+    LEADERBOARDS, LEVELS, InvalidCursor, entry_from_score, keyset_page, level_boards, page_around,
+    score_histogram, submit_to_leaderboards
+)
+from .ranking import rank_index
+from .state_buffer import merge_snapshot, state_buffer
+from .state_cache import build_payload, state_cache
+from .throttling import rate_limit
 import logging
 import re
 from datetime import timedelta, datetime
-from typing import Dict, Any, List, Optional, Union
+from typing import Callable, Dict, Any, List, Optional, Tuple, Union
 from functools import wraps
 import hashlib
 import hmac
@@ -29,48 +39,6 @@ import time
 
 logger = logging.getLogger(__name__)
 
-# Rate limiting settings
-RATE_LIMIT = 100  # 100 requests
-RATE_LIMIT_PERIOD = 60  # per minute
-
-# Create a rate limiter function
-def get_ratelimit_key(group, request):
-    return request.META.get('REMOTE_ADDR', '127.0.0.1')
-
-# Rate limit decorator
-def rate_limited_view(view_func):
-    """Decorator to add rate limiting to a view."""
-    @wraps(view_func)
-    def _wrapped_view(request, *args, **kwargs):
-        # Get the client's IP address
-        ip = get_ratelimit_key('api', request)
-        
-        # Create a cache key
-        cache_key = f'ratelimit:{ip}'
-        
-        # Get current count and last reset time
-        now = time.time()
-        current = cache.get(cache_key, {'count': 0, 'reset_at': now + RATE_LIMIT_PERIOD})
-        
-        # Check if we need to reset the counter
-        if now > current['reset_at']:
-            current = {'count': 0, 'reset_at': now + RATE_LIMIT_PERIOD}
-        
-        # Check rate limit
-        if current['count'] >= RATE_LIMIT:
-            return JsonResponse(
-                {'error': 'Request was throttled. Please try again later.'},
-                status=429,
-                headers={'Retry-After': str(int(current['reset_at'] - now))}
-            )
-            
-        # Increment the counter
-        current['count'] += 1
-        cache.set(cache_key, current, timeout=int(current['reset_at'] - now))
-        
-        return view_func(request, *args, **kwargs)
-    return _wrapped_view
-
 # Moved to the top with other imports
 
 @method_decorator(never_cache, name='dispatch')
@@ -98,7 +66,8 @@ class GameView(View):
         """
         try:
             # Prevent session fixation
-            if not request.session.session_key:
+            previous_key = request.session.session_key
+            if not previous_key:
                 request.session.create()
             else:
                 request.session.cycle_key()
@@ -106,6 +75,11 @@ class GameView(View):
             session_key = request.session.session_key
             
             with transaction.atomic():
+                # Carry the game over to the rotated key instead of starting a new one
+                if previous_key and RetroGameSession.adopt(previous_key, session_key):
+                    state_buffer.rekey(previous_key, session_key)
+                    state_cache.invalidate(previous_key)
+                    
                 # Use select_for_update to prevent race conditions
                 game_session, created = RetroGameSession.objects.select_for_update().get_or_create(
                     session_key=session_key,
@@ -124,8 +98,6 @@ class GameView(View):
                 game_state, _ = RetroGameState.objects.select_related('session').get_or_create(
                     session=game_session,
                     defaults={
-                        'robots_defeated': [],
-                        'diamonds_collected': [],
                         'boss_defeated': False,
                         'level_completed': False
                     }
@@ -158,11 +130,19 @@ class GameView(View):
                 status=500
             )
 
+class VersionConflict(Exception):
+    """Raised when a save was built on a state version that is no longer current."""
+    
+    def __init__(self, version: int):
+        super().__init__(f'Stored state is at version {version}')
+        self.version = version
+
+
 class SaveGameStateView(View):
     """API endpoint to save game state with transaction support."""
     
     @method_decorator(csrf_protect)
-    @method_decorator(rate_limited_view)
+    @method_decorator(rate_limit('save_state'))
     @method_decorator(require_http_methods(["POST"]))
     def post(self, request):
         """
@@ -179,6 +159,18 @@ class SaveGameStateView(View):
             - diamondsCollected: List of collected diamond IDs
             - bossDefeated: Boolean indicating if boss is defeated
             - levelCompleted: Boolean indicating if level is completed
+            - robotsDefeatedAdded: Robot IDs defeated since baseVersion (delta save)
+            - diamondsCollectedAdded: Diamond IDs collected since baseVersion (delta save)
+            - baseVersion: State version a delta save was computed against
+            - manual: True for an explicit save, which is never buffered
+            
+        A delta save sends only the ``*Added`` lists instead of the full
+        ``robotsDefeated``/``diamondsCollected`` lists; the server merges them
+        into the stored lists. If baseVersion no longer matches, the response
+        is 409 with the current version, and if no state is stored yet it is
+        404; in both cases the client should send full lists.
+        Progress lists must hold integer IDs between 0 and 62; anything else
+        is rejected with 400.
             
         Returns:
             JSON response with success status or error message
@@ -193,46 +185,31 @@ class SaveGameStateView(View):
                 
             # Parse and validate request data
             try:
-                data = json.loads(request.body.decode('utf-8'))
-            except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                data = fast_json.loads(request.body)
+            except fast_json.DECODE_ERRORS as e:
                 logger.warning(f"Invalid JSON in save_game_state: {str(e)}")
                 return JsonResponse(
                     {'error': 'Invalid JSON data'}, 
                     status=400
                 )
+            invalid = self._invalid_progress(data)
+            if invalid:
+                return invalid
                 
-            # Start transaction
-            with transaction.atomic():
-                # Get or create game session with row-level locking
-                game_session = RetroGameSession.objects.select_for_update().get(
-                    session_key=request.session.session_key
-                )
-                
-                # Update game session with validation
-                self._update_game_session(game_session, data)
-                
-                # Update game state
-                game_state, _ = RetroGameState.objects.select_for_update().get_or_create(
-                    session=game_session,
-                    defaults={'robots_defeated': [], 'diamonds_collected': []}
-                )
-                self._update_game_state(game_state, data)
+            # Buffer autosaves in write-behind mode
+            buffered = None
+            if state_buffer.enabled:
+                if not self._requires_sync_write(data):
+                    state_buffer.put(request.session.session_key, data)
+                    state_cache.update(request.session.session_key, data)
+                    state_buffer.flush_due()
+                    return JsonResponse({'success': True, 'buffered': True})
                 
-                # Save changes
-                game_session.save()
-                game_state.save()
+                # Fold any pending autosave into this synchronous write
+                buffered = state_buffer.take(request.session.session_key)
+                data = merge_snapshot(buffered, data)
                 
-                # Update cache
-                cache_key = f'game_state_{game_session.id}'
-                cache.set(cache_key, {
-                    'level': game_session.current_level,
-                    'score': game_session.score,
-                    'diamonds': game_session.diamonds,
-                    'lives': game_session.lives,
-                    'updated_at': timezone.now().isoformat()
-                }, timeout=60 * 60 * 24)  # Cache for 24 hours
-                
-                return JsonResponse({'success': True})
+            return self._write_save(request.session.session_key, data, buffered)
                 
         except RetroGameSession.DoesNotExist:
             return JsonResponse(
@@ -246,58 +223,286 @@ class SaveGameStateView(View):
                 status=500
             )
     
-    def _update_game_session(self, game_session: RetroGameSession, data: Dict[str, Any]) -> None:
-        """Update game session with validated data."""
-        if 'level' in data and 1 <= data['level'] <= 10:
-            game_session.current_level = data['level']
-        if 'diamonds' in data and 0 <= data['diamonds'] <= 1000:
-            game_session.diamonds = data['diamonds']
-        if 'lives' in data and 0 <= data['lives'] <= 10:
-            game_session.lives = data['lives']
-        if 'score' in data and 0 <= data['score'] <= 1000000:
-            game_session.score = data['score']
-        if 'playerX' in data:
-            game_session.player_x = float(data['playerX'])
-        if 'playerY' in data:
-            game_session.player_y = float(data['playerY'])
+    def _write_save(self, session_key: str, data: Dict[str, Any],
+                    buffered: Optional[Dict[str, Any]] = None) -> JsonResponse:
+        """
+        Write a synchronous save as a delta or in full.
+        
+        buffered is the pending autosave folded into data; it is put back
+        into the buffer if the write is refused or fails.
+        """
+        try:
+            # Merge progress additions in the database without reading the row
+            if RetroGameState.is_delta(data):
+                response = self._save_delta(session_key, data)
+            else:
+                response = self._save_full(session_key, data)
+        except Exception:
+            if buffered:
+                state_buffer.restore(session_key, buffered)
+            raise
+        if buffered and response.status_code >= 400:
+            state_buffer.restore(session_key, buffered)
+        return response
+    
+    def _save_full(self, session_key: str, data: Dict[str, Any]) -> JsonResponse:
+        """Write a full save and respond with the new state version."""
+        version, _ = self._write_full(session_key, data, [data])
+        return JsonResponse({'success': True, 'version': version})
+    
+    def _write_full(self, session_key: str, data: Dict[str, Any],
+                    snapshots: List[Dict[str, Any]],
+                    base_version: Optional[int] = None) -> Tuple[int, List[RetroGameMilestone]]:
+        """
+        Write a save under row locks and refresh the payload cache.
+        
+        Args:
+            session_key: Session being saved
+            data: Payload to apply
+            snapshots: The ordered payloads data was merged from, scanned for milestones
+            base_version: Version the save was built on; any version if omitted
+            
+        Returns:
+            The new state version and the milestones newly recorded
+            
+        Raises:
+            VersionConflict: If the stored state is not at base_version
+        """
+        with transaction.atomic():
+            # Get or create game session with row-level locking
+            game_session = RetroGameSession.objects.select_for_update().get(
+                session_key=session_key
+            )
+            game_state, _ = RetroGameState.objects.select_for_update().get_or_create(
+                session=game_session
+            )
+            if base_version is not None and game_state.version != base_version:
+                raise VersionConflict(game_state.version)
+            milestones = RetroGameMilestone.detect(game_session, game_state, snapshots)
+            
+            # Update game session and state with validation
+            game_session.apply_save_data(data)
+            game_state.apply_save_data(data)
+            game_state.version += 1
+            
+            # Save changes
+            game_session.save()
+            game_state.save()
+            milestones = RetroGameMilestone.record(milestones)
+            
+            # Refresh the load-state cache once the write is committed
+            payload = build_payload(game_session, game_state)
+            transaction.on_commit(lambda: state_cache.set(session_key, payload))
+            
+            return game_state.version, milestones
+    
+    def _save_delta(self, session_key: str, data: Dict[str, Any]) -> JsonResponse:
+        """
+        Apply a delta save with conditional UPDATEs.
+        
+        The rows are only read, under a lock, when the save turns on a
+        milestone flag and the stored flags are needed to detect it.
+        """
+        base_version = data.get('baseVersion')
+        if base_version is not None and (isinstance(base_version, bool) or not isinstance(base_version, int)):
+            return JsonResponse({'error': 'Invalid baseVersion'}, status=400)
+        
+        with transaction.atomic():
+            milestones = []
+            if RetroGameMilestone.signalled(data):
+                game_session = RetroGameSession.objects.select_for_update().get(session_key=session_key)
+                game_state = RetroGameState.objects.filter(session=game_session).first()
+                if game_state is not None:
+                    milestones = RetroGameMilestone.detect(game_session, game_state, [data])
+            if not RetroGameState.apply_delta(session_key, data, base_version):
+                current = (RetroGameState.objects
+                    .filter(session__session_key=session_key)
+                    .values_list('version', flat=True)
+                    .first())
+                if current is None:
+                    # Nothing to merge into; the client must send full lists
+                    return JsonResponse({'error': 'Game state not found'}, status=404)
+                return JsonResponse(
+                    {'error': 'Version conflict', 'version': current},
+                    status=409
+                )
+            RetroGameSession.objects.filter(session_key=session_key).update(
+                updated_at=timezone.now(),
+                **RetroGameSession.save_data_updates(data)
+            )
+            RetroGameMilestone.record(milestones)
+        
+        if base_version is None:
+            state_cache.invalidate(session_key)
+            return JsonResponse({'success': True})
+        
+        version = base_version + 1
+        state_cache.update(session_key, data, version=version)
+        return JsonResponse({'success': True, 'version': version})
+    
+    def _invalid_progress(self, data: Dict[str, Any]) -> Optional[JsonResponse]:
+        """Return a 400 response if the payload's progress lists hold invalid IDs."""
+        errors = RetroGameState.progress_errors(data)
+        if errors:
+            return JsonResponse({'error': 'Validation failed', 'details': errors}, status=400)
+        return None
     
-    def _update_game_state(self, game_state: 'RetroGameState', data: Dict[str, Any]) -> None:
-        """Update game state with validated data."""
-        if 'robotsDefeated' in data and isinstance(data['robotsDefeated'], list):
-            game_state.set_robots_defeated(data['robotsDefeated'])
-        if 'diamondsCollected' in data and isinstance(data['diamondsCollected'], list):
-            game_state.set_diamonds_collected(data['diamondsCollected'])
-        if 'bossDefeated' in data and isinstance(data['bossDefeated'], bool):
-            game_state.boss_defeated = data['bossDefeated']
-        if 'levelCompleted' in data and isinstance(data['levelCompleted'], bool):
-            game_state.level_completed = data['levelCompleted']
+    def _requires_sync_write(self, data: Dict[str, Any]) -> bool:
+        """Manual saves and level completions bypass the write-behind buffer."""
+        return data.get('manual') is True or data.get('levelCompleted') is True
+
+class SaveGameStateBatchView(SaveGameStateView):
+    """API endpoint to apply a queue of save-state snapshots in one request."""
+    
+    @method_decorator(csrf_protect)
+    @method_decorator(rate_limit('save_batch'))
+    @method_decorator(require_http_methods(["POST"]))
+    def post(self, request):
+        """
+        Handle POST request with an ordered list of snapshots.
+        
+        Request body should contain:
+            - snapshots: Save-state payloads, oldest first, as accepted by
+              the save-state endpoint, without their own baseVersion
+            - baseVersion: Optional state version the batch was built on
+              
+        The snapshots are folded into one payload, so only the newest value
+        of each field is written, while progress additions from every
+        snapshot are kept. Milestones reached along the way are recorded in
+        the same transaction. If baseVersion no longer matches, nothing is
+        written and the response is 409 with the current version.
+        
+        Returns:
+            JSON response with the new version, the number of snapshots
+            applied and the milestones newly recorded
+        """
+        try:
+            if not request.session.session_key:
+                return JsonResponse({'error': 'Invalid session'}, status=401)
+            
+            snapshots, base_version, error = self._parse_snapshots(request)
+            if error:
+                return error
+            
+            # A pending autosave is older than anything in the batch
+            buffered = None
+            if state_buffer.enabled:
+                buffered = state_buffer.take(request.session.session_key)
+                if buffered:
+                    snapshots = [buffered] + snapshots
+            
+            try:
+                version, milestones = self._write_full(
+                    request.session.session_key, self._fold(snapshots), snapshots, base_version
+                )
+            except VersionConflict as e:
+                if buffered:
+                    state_buffer.restore(request.session.session_key, buffered)
+                return JsonResponse({'error': 'Version conflict', 'version': e.version}, status=409)
+            return self._batch_response(version, len(snapshots), milestones)
+        
+        except RetroGameSession.DoesNotExist:
+            return JsonResponse({'error': 'Game session not found'}, status=404)
+        except Exception as e:
+            logger.error(f"Error in save_game_state_batch: {str(e)}", exc_info=True)
+            return JsonResponse({'error': 'Internal server error'}, status=500)
+    
+    def _parse_snapshots(self, request) -> Tuple[List[Dict[str, Any]], Optional[int], Optional[JsonResponse]]:
+        """Parse and validate the batch; returns (snapshots, base version, error response)."""
+        try:
+            data = fast_json.loads(request.body)
+        except fast_json.DECODE_ERRORS as e:
+            logger.warning(f"Invalid JSON in save_game_state_batch: {str(e)}")
+            return [], None, JsonResponse({'error': 'Invalid JSON data'}, status=400)
+        
+        snapshots = data.get('snapshots') if isinstance(data, dict) else None
+        max_snapshots = getattr(settings, 'SAVE_BATCH_MAX_SNAPSHOTS', 100)
+        if (not isinstance(snapshots, list) or not snapshots
+                or not all(isinstance(snapshot, dict) for snapshot in snapshots)):
+            return [], None, JsonResponse({'error': 'snapshots must be a non-empty list of objects'}, status=400)
+        if len(snapshots) > max_snapshots:
+            return [], None, JsonResponse(
+                {'error': f'A batch can hold at most {max_snapshots} snapshots'}, status=400
+            )
+        if any('baseVersion' in snapshot for snapshot in snapshots):
+            return [], None, JsonResponse(
+                {'error': 'Send baseVersion once for the whole batch, not per snapshot'}, status=400
+            )
+        base_version = data.get('baseVersion')
+        if base_version is not None and (isinstance(base_version, bool) or not isinstance(base_version, int)):
+            return [], None, JsonResponse({'error': 'Invalid baseVersion'}, status=400)
+        for snapshot in snapshots:
+            invalid = self._invalid_progress(snapshot)
+            if invalid:
+                return [], None, invalid
+        return snapshots, base_version, None
+    
+    def _fold(self, snapshots: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Merge snapshots oldest first into the payload to write."""
+        data: Dict[str, Any] = {}
+        for snapshot in snapshots:
+            data = merge_snapshot(data, snapshot)
+        return data
+    
+    def _batch_response(self, version: int, applied: int,
+                        milestones: List[RetroGameMilestone]) -> JsonResponse:
+        return JsonResponse({
+            'success': True,
+            'version': version,
+            'applied': applied,
+            'milestones': [{'kind': m.kind, 'level': m.level, 'score': m.score} for m in milestones],
+        })
+
+def _etag(value: Union[str, bytes]) -> str:
+    """Quoted strong ETag from a digest of value."""
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+    return quote_etag(hashlib.blake2b(value, digest_size=12).hexdigest())
+
+def _board_etag(board, version: int, limit: int) -> str:
+    """ETag of a page of a leaderboard, from the board's version number."""
+    return _etag(f'{board.key}:{version}:{limit}')
+
+def _conditional_json(request, etag: str, render: Callable[[], Any], private: bool = False):
+    """
+    Answer a GET with 304 if the client holds etag, else render the JSON body.
+    
+    Responses must be revalidated before reuse, so clients polling with
+    If-None-Match get 304s until the data changes.
+    """
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(render())
+    response.headers['ETag'] = etag
+    if private:
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
 
 @require_http_methods(["GET"])
 def load_game_state(request):
-    """API endpoint to load game state"""
+    """API endpoint to load game state, served from the payload cache when warm (supports If-None-Match)"""
     try:
         session_key = request.session.session_key
         
         if not session_key:
             return JsonResponse({'error': 'No session found'}, status=400)
         
-        game_session = get_object_or_404(RetroGameSession, session_key=session_key)
-        game_state, _ = RetroGameState.objects.get_or_create(session=game_session)
-        
-        data = {
-            'level': game_session.current_level,
-            'diamonds': game_session.diamonds,
-            'lives': game_session.lives,
-            'score': game_session.score,
-            'playerX': game_session.player_x,
-            'playerY': game_session.player_y,
-            'robotsDefeated': game_state.get_robots_defeated(),
-            'diamondsCollected': game_state.get_diamonds_collected(),
-            'bossDefeated': game_state.boss_defeated,
-            'levelCompleted': game_state.level_completed
-        }
+        entry = state_cache.get(session_key)
+        if entry is None:
+            game_session = get_object_or_404(RetroGameSession, session_key=session_key)
+            game_state, _ = RetroGameState.objects.get_or_create(session=game_session)
+            
+            # Overlay an autosave that has not been flushed yet
+            buffered = state_buffer.get(session_key) if state_buffer.enabled else None
+            if buffered:
+                game_session.apply_save_data(buffered)
+                game_state.apply_save_data(buffered)
+            
+            entry = state_cache.set(session_key, build_payload(game_session, game_state))
         
-        return JsonResponse(data)
+        return _conditional_json(request, entry['etag'], lambda: entry['payload'], private=True)
     
     except Exception as e:
         logger.error(f"Error loading game state: {str(e)}")
@@ -310,7 +515,7 @@ class SubmitHighScoreView(View):
     MAX_PLAYER_NAME_LENGTH = 50
     
     @method_decorator(csrf_protect)
-    @method_decorator(rate_limited_view)
+    @method_decorator(rate_limit('submit_score'))
     @method_decorator(require_http_methods(["POST"]))
     def post(self, request):
         """
@@ -322,13 +527,13 @@ class SubmitHighScoreView(View):
             - level_reached: Level reached (1-10)
             
         Returns:
-            JSON response with rank and success status or error message
+            JSON response with rank, percentile and success status or error message
         """
         try:
             # Parse and validate request data
             try:
-                data = json.loads(request.body.decode('utf-8'))
-            except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                data = fast_json.loads(request.body)
+            except fast_json.DECODE_ERRORS as e:
                 logger.warning(f"Invalid JSON in submit_high_score: {str(e)}")
                 return JsonResponse(
                     {'error': 'Invalid JSON data'}, 
@@ -343,34 +548,8 @@ class SubmitHighScoreView(View):
                     status=400
                 )
                 
-            # Process high score in transaction
-            with transaction.atomic():
-                # Clean and prepare data
-                player_name = self._clean_player_name(data.get('player_name', 'Anonymous'))
-                score = int(data['score'])
-                level_reached = int(data.get('level_reached', 1))
-                
-                # Create high score
-                high_score = RetroHighScore.objects.create(
-                    user=request.user if request.user.is_authenticated else None,
-                    player_name=player_name,
-                    score=score,
-                    level_reached=level_reached
-                )
-                
-                # Calculate rank efficiently
-                rank = RetroHighScore.objects.filter(score__gt=score).count() + 1
-                
-                # Update leaderboard cache
-                self._update_leaderboard_cache()
-                
-                return JsonResponse({
-                    'success': True,
-                    'rank': rank,
-                    'player_name': player_name,
-                    'score': score,
-                    'level_reached': level_reached
-                })
+            user = request.user if request.user.is_authenticated else None
+            return self._record_score(user, data)
                 
         except Exception as e:
             logger.error(f"Error in submit_high_score: {str(e)}", exc_info=True)
@@ -379,6 +558,43 @@ class SubmitHighScoreView(View):
                 status=500
             )
     
+    def _record_score(self, user, data: Dict[str, Any]) -> JsonResponse:
+        """Store a validated score, update the rank index and report its rank."""
+        # Verify the rank index before the new row can skew the check, and
+        # outside the transaction so a rebuild does not hold its locks
+        rank_index.ensure_built()
+        
+        with transaction.atomic():
+            # Clean and prepare data
+            player_name = self._clean_player_name(data.get('player_name', 'Anonymous'))
+            score = int(data['score'])
+            level_reached = int(data.get('level_reached', 1))
+            
+            # Create high score
+            high_score = RetroHighScore.objects.create(
+                user=user,
+                player_name=player_name,
+                score=score,
+                level_reached=level_reached
+            )
+            
+            # Record the score and read its rank from the index
+            rank_index.add(score)
+            rank, percentile = rank_index.lookup(score)
+            
+            # Insert into the materialized leaderboard once committed
+            entry = entry_from_score(high_score)
+            transaction.on_commit(lambda: submit_to_leaderboards(entry))
+            
+            return JsonResponse({
+                'success': True,
+                'rank': rank,
+                'percentile': percentile,
+                'player_name': player_name,
+                'score': score,
+                'level_reached': level_reached
+            })
+    
     def _validate_high_score_data(self, data: Dict[str, Any]) -> List[str]:
         """Validate high score submission data."""
         errors = []
@@ -416,44 +632,140 @@ class SubmitHighScoreView(View):
         # Remove potentially dangerous characters
         name = re.sub(r'[^\w\s\-\'\"]', '', name).strip()
         return name[:self.MAX_PLAYER_NAME_LENGTH] or 'Anonymous'
-    
-    def _update_leaderboard_cache(self) -> None:
-        """Update the leaderboard cache with fresh data."""
-        cache_key = 'leaderboard_top_10'
-        top_scores = list(RetroHighScore.objects
-            .order_by('-score', 'created_at')
-            .values('player_name', 'score', 'level_reached', 'created_at')
-            [:10])
-        
-        # Cache for 5 minutes
-        cache.set(cache_key, top_scores, timeout=300)
 
-@cache_page(60 * 5)  # Cache for 5 minutes
 @require_http_methods(["GET"])
 def high_scores(request):
-    """API endpoint to get high scores"""
+    """API endpoint to get high scores from a materialized leaderboard (?window=all|weekly|daily, supports If-None-Match)"""
     try:
-        scores = RetroHighScore.objects.all()[:10]  # Top 10 scores
-        scores_data = [
-            {
-                'player_name': score.player_name,
-                'score': score.score,
-                'level_reached': score.level_reached,
-                'created_at': score.created_at.isoformat()
+        try:
+            limit = int(request.GET.get('limit', 10))  # Top 10 scores by default
+        except ValueError:
+            return JsonResponse({'error': 'Invalid limit'}, status=400)
+        board = LEADERBOARDS.get(request.GET.get('window', 'all'))
+        if board is None:
+            return JsonResponse({'error': 'Unknown leaderboard window'}, status=400)
+        limit = max(1, min(limit, board.size))
+        
+        data = board.board()
+        return _conditional_json(
+            request,
+            _board_etag(board, data['version'], limit),
+            lambda: {
+                'window': board.name,
+                'high_scores': [_serialize_entry(entry) for entry in data['entries'][:limit]]
             }
-            for score in scores
-        ]
-        return JsonResponse({'high_scores': scores_data})
+        )
     
     except Exception as e:
         logger.error(f"Error fetching high scores: {str(e)}")
         return JsonResponse({'error': 'Failed to fetch high scores'}, status=500)
 
+def _serialize_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Serialize a leaderboard entry for the JSON API."""
+    return {
+        'rank': entry['rank'],
+        'player_name': entry['player_name'],
+        'score': entry['score'],
+        'level_reached': entry['level_reached'],
+        'created_at': entry['created_at'].isoformat()
+    }
+
+@require_http_methods(["GET"])
+def level_leaderboards(request):
+    """
+    API endpoint for the per-level boards and score histograms.
+    
+    A level's board and histogram cover every run that reached the level,
+    that is, whose level_reached is that level or a later one.
+    
+    Query parameters:
+        - limit: Entries per level (default 10)
+        - levels: Comma-separated levels to include (default all)
+        
+    Returns:
+        JSON response with each level's top scores and histogram
+    """
+    try:
+        try:
+            limit = int(request.GET.get('limit', 10))
+            levels = request.GET.get('levels')
+            levels = sorted({int(level) for level in levels.split(',')}) if levels else list(LEVELS)
+        except ValueError:
+            return JsonResponse({'error': 'Invalid query parameters'}, status=400)
+        if any(level not in LEVELS for level in levels):
+            return JsonResponse({'error': 'Unknown level'}, status=400)
+        limit = max(1, min(limit, getattr(settings, 'LEVEL_LEADERBOARD_SIZE', 10)))
+        
+        boards = level_boards(levels)
+        histograms = score_histogram.reached_counts()
+        return JsonResponse({
+            'bucket_size': score_histogram.bucket_size,
+            'levels': [
+                {
+                    'level': level,
+                    'high_scores': [_serialize_entry(e) for e in boards[level]['entries'][:limit]],
+                    'histogram': histograms[level],
+                }
+                for level in levels
+            ]
+        })
+    
+    except Exception as e:
+        logger.error(f"Error fetching level leaderboards: {str(e)}")
+        return JsonResponse({'error': 'Failed to fetch level leaderboards'}, status=500)
+
+LEADERBOARD_PAGE_SIZE = 25
+LEADERBOARD_MAX_PAGE_SIZE = 100
+
+@require_http_methods(["GET"])
+def leaderboard_entries(request):
+    """
+    API endpoint for cursor-paginated pages of the full leaderboard.
+    
+    Query parameters:
+        - limit: Entries per page (1-100, default 25)
+        - cursor: Opaque ``next``/``prev`` cursor from an earlier page
+        - around_id: Centre the page on this high score entry
+        - around_score: Centre the page on where this score would rank
+        
+    Returns:
+        JSON response with ranked entries and next/prev cursors
+    """
+    try:
+        try:
+            limit = int(request.GET.get('limit', LEADERBOARD_PAGE_SIZE))
+            around_id = request.GET.get('around_id')
+            around_id = int(around_id) if around_id is not None else None
+            around_score = request.GET.get('around_score')
+            around_score = int(around_score) if around_score is not None else None
+        except ValueError:
+            return JsonResponse({'error': 'Invalid query parameters'}, status=400)
+        limit = max(1, min(limit, LEADERBOARD_MAX_PAGE_SIZE))
+        
+        if around_id is not None or around_score is not None:
+            page = page_around(limit, entry_id=around_id, score=around_score)
+            if page is None:
+                return JsonResponse({'error': 'Entry not found'}, status=404)
+        else:
+            page = keyset_page(request.GET.get('cursor'), limit)
+        
+        return JsonResponse(page)
+    
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    except Exception as e:
+        logger.error(f"Error fetching leaderboard page: {str(e)}")
+        return JsonResponse({'error': 'Failed to fetch leaderboard'}, status=500)
+
 def leaderboard(request):
     """Leaderboard page"""
     try:
-        high_scores = RetroHighScore.objects.all()[:20]  # Top 20 scores
-        return render(request, 'retro_platform_fighter/leaderboard.html', {'high_scores': high_scores})
+        board = LEADERBOARDS.get(request.GET.get('window', 'all'), LEADERBOARDS['all'])
+        high_scores = board.entries(20)  # Top 20 scores
+        return render(request, 'retro_platform_fighter/leaderboard.html', {
+            'high_scores': high_scores,
+            'window': board.name,
+        })
     except Exception as e:
         logger.error(f"Error in leaderboard view: {str(e)}")
         return render(request, 'retro_platform_fighter/index.html', {'error': 'Failed to load leaderboard'})
@@ -466,6 +778,8 @@ def reset_game(request):
         session_key = request.session.session_key
         
         if session_key:
+            state_buffer.discard(session_key)
+            state_cache.invalidate(session_key)
             RetroGameSession.objects.filter(session_key=session_key).delete()
         
         return JsonResponse({'success': True})
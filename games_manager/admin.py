@@ -1,4 +1,6 @@
 from django.contrib import admin
+from django.db import transaction
+from .catalogue import catalogue
 from .models import Game
 
 @admin.register(Game)
@@ -7,3 +9,18 @@ class GameAdmin(admin.ModelAdmin):
     list_filter = ('is_active',)
     search_fields = ('name', 'description')
     prepopulated_fields = {'slug': ('name',)}
+    actions = ['activate', 'deactivate']
+
+    # Edits and deletes invalidate the catalogue through the model signals;
+    # update() sends none, so the bulk actions below do it themselves.
+    @admin.action(description='Activate selected games')
+    def activate(self, request, queryset):
+        updated = queryset.update(is_active=True)
+        transaction.on_commit(catalogue.invalidate)
+        self.message_user(request, f'{updated} game(s) activated.')
+
+    @admin.action(description='Deactivate selected games')
+    def deactivate(self, request, queryset):
+        updated = queryset.update(is_active=False)
+        transaction.on_commit(catalogue.invalidate)
+        self.message_user(request, f'{updated} game(s) deactivated.')
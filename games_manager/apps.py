@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class GamesManagerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'games_manager'
+
+    def ready(self):
+        # Connect the signal handlers for the cached catalogue and thumbnail variants
+        from . import catalogue, thumbnails  # noqa: F401
@@ -0,0 +1,151 @@
+"""
+Two-level cache of the game catalogue shown on the front page.
+
+The active games and the rendered catalogue fragment are cached together in
+the shared cache and, for ``settings.CATALOGUE_LOCAL_TTL`` seconds, in each
+process. In steady state the front page therefore makes no query and, most
+of the time, no cache round trip either.
+
+Any change to a ``Game`` (``post_save``/``post_delete``, or the admin's bulk
+actions, which use ``update()``) bumps a generation number in the shared
+cache once the transaction commits. The entry is keyed by generation, so a
+rebuild that raced the change can only write an entry nobody reads. A
+missing generation is seeded from the clock, so an evicted key never brings
+back an old entry. The
+process that made the change drops its local copy at once; other processes
+see the change when their local copy expires.
+"""
+
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.template.loader import render_to_string
+
+from .models import Game
+
+KEY_PREFIX = 'games_manager:catalogue'
+GENERATION_KEY = f'{KEY_PREFIX}:generation'
+ENTRY_TIMEOUT = 60 * 60 * 24
+TEMPLATE = 'games_manager/catalogue.html'
+# Rendered width of a .games-grid card: one column on phones, 300px+ columns otherwise
+THUMBNAIL_SIZES = '(max-width: 720px) 90vw, 400px'
+
+
+def thumbnail_srcsets(game: Game) -> Dict[str, str]:
+    """``srcset`` values per format for the game's current thumbnail variants."""
+    variants = game.thumbnail_variants or {}
+    if not game.thumbnail or variants.get('source') != game.thumbnail.name:
+        return {}
+    storage = game.thumbnail.storage
+    return {
+        fmt: ', '.join(f'{storage.url(name)} {width}w' for width, name in variants[fmt])
+        for fmt in ('webp', 'jpeg') if variants.get(fmt)
+    }
+
+
+def game_entry(game: Game) -> Dict[str, Any]:
+    """Build a catalogue entry from a game."""
+    srcsets = thumbnail_srcsets(game)
+    if 'jpeg' in srcsets:
+        # The smallest JPEG is the src for browsers that ignore srcset
+        thumbnail_url = game.thumbnail.storage.url(game.thumbnail_variants['jpeg'][0][1])
+    else:
+        thumbnail_url = game.thumbnail.url if game.thumbnail else ''
+    return {
+        'name': game.name,
+        'slug': game.slug,
+        'description': game.description,
+        'thumbnail_url': thumbnail_url,
+        'thumbnail_srcset': srcsets,
+        'url_path': game.url_path,
+    }
+
+
+class Catalogue:
+    """The active games and their rendered fragment, cached per process and shared."""
+
+    def __init__(self):
+        self._local: Optional[Dict[str, Any]] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def local_ttl(self) -> float:
+        """Seconds a process reuses its copy before checking the shared cache."""
+        return getattr(settings, 'CATALOGUE_LOCAL_TTL', 5)
+
+    def _generation(self) -> int:
+        generation = cache.get(GENERATION_KEY)
+        if generation is None:
+            generation = self._seed_generation()
+        return generation
+
+    def _seed_generation(self) -> int:
+        # Seed from the clock rather than a constant: if the key is evicted,
+        # a reset to an old value would serve that generation's entry again
+        generation = time.time_ns()
+        if not cache.add(GENERATION_KEY, generation, timeout=None):
+            generation = cache.get(GENERATION_KEY, generation)
+        return generation
+
+    def rebuild(self, generation: int) -> Dict[str, Any]:
+        """Reload the catalogue from the database and store it for generation."""
+        games = [game_entry(game) for game in Game.objects.filter(is_active=True).order_by('name')]
+        entry = {
+            'generation': generation,
+            'games': games,
+            'html': render_to_string(TEMPLATE, {'games': games, 'thumbnail_sizes': THUMBNAIL_SIZES}),
+        }
+        cache.set(f'{KEY_PREFIX}:{generation}', entry, timeout=ENTRY_TIMEOUT)
+        return entry
+
+    def entry(self) -> Dict[str, Any]:
+        """Return ``{'generation': ..., 'games': [...], 'html': ...}``."""
+        with self._lock:
+            if self._local is not None and time.monotonic() - self._loaded_at < self.local_ttl:
+                return self._local
+
+        generation = self._generation()
+        entry = cache.get(f'{KEY_PREFIX}:{generation}')
+        if entry is None:
+            entry = self.rebuild(generation)
+        with self._lock:
+            self._local = entry
+            self._loaded_at = time.monotonic()
+        return entry
+
+    def games(self) -> List[Dict[str, Any]]:
+        """Return the active games, ordered by name."""
+        return self.entry()['games']
+
+    def html(self) -> str:
+        """Return the rendered catalogue fragment."""
+        return self.entry()['html']
+
+    def invalidate(self) -> None:
+        """Make every process rebuild the catalogue on its next read."""
+        try:
+            cache.incr(GENERATION_KEY)
+        except ValueError:
+            self._seed_generation()
+        self.clear_local()
+
+    def clear_local(self) -> None:
+        """Forget this process's copy."""
+        with self._lock:
+            self._local = None
+
+
+catalogue = Catalogue()
+
+
+@receiver(post_save, sender=Game, dispatch_uid='games_manager.catalogue.saved')
+@receiver(post_delete, sender=Game, dispatch_uid='games_manager.catalogue.deleted')
+def invalidate_catalogue(sender, **kwargs):
+    transaction.on_commit(catalogue.invalidate)
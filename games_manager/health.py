@@ -0,0 +1,131 @@
+"""
+Dependency checks behind the readiness probe.
+
+Load balancers probe every worker several times a second, so the database,
+cache and migration checks run at most once per ``settings.HEALTH_CHECK_TTL``
+seconds per process and the last report is served in between. Each check is
+timed; a dependency that answers slower than
+``settings.HEALTH_CHECK_DEGRADED_MS`` is reported as degraded rather than
+down.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Dict, NamedTuple, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+OK = 'ok'
+DEGRADED = 'degraded'
+FAIL = 'fail'
+
+
+class CheckResult(NamedTuple):
+    """Outcome of one dependency check."""
+    status: str
+    latency_ms: float
+    detail: str = ''
+
+
+def _timed(check) -> CheckResult:
+    """Run check, which returns an optional detail, and classify its latency."""
+    started = time.perf_counter()
+    try:
+        detail = check() or ''
+    except Exception as e:
+        logger.warning(f"Health check {check.__name__} failed: {str(e)}")
+        return CheckResult(FAIL, round((time.perf_counter() - started) * 1000, 2), str(e))
+    latency_ms = round((time.perf_counter() - started) * 1000, 2)
+    slow = latency_ms > getattr(settings, 'HEALTH_CHECK_DEGRADED_MS', 200)
+    return CheckResult(DEGRADED if slow else OK, latency_ms, detail)
+
+
+def check_database() -> Optional[str]:
+    with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+        cursor.execute('SELECT 1')
+    return None
+
+
+def check_cache() -> Optional[str]:
+    key = f'health:{uuid.uuid4().hex}'
+    cache.set(key, 1, timeout=10)
+    found = cache.get(key)
+    cache.delete(key)
+    if found != 1:
+        raise RuntimeError('Cache did not return the value just written')
+    return None
+
+
+def check_migrations() -> Optional[str]:
+    executor = MigrationExecutor(connections[DEFAULT_DB_ALIAS])
+    plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+    if plan:
+        raise RuntimeError(f'{len(plan)} unapplied migrations')
+    return None
+
+
+# Checks whose failure makes the worker unable to serve requests
+CRITICAL_CHECKS = {'database', 'migrations'}
+
+
+class HealthChecker:
+    """Runs the readiness checks and caches the report per process."""
+
+    checks = {
+        'database': check_database,
+        'cache': check_cache,
+        'migrations': check_migrations,
+    }
+
+    def __init__(self):
+        self._report: Optional[Dict[str, Any]] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self) -> float:
+        """Seconds a report is served before the checks run again."""
+        return getattr(settings, 'HEALTH_CHECK_TTL', 5)
+
+    def report(self) -> Dict[str, Any]:
+        """Return the latest readiness report, re-running stale checks."""
+        with self._lock:
+            if self._report is not None and time.monotonic() - self._checked_at < self.ttl:
+                return self._report
+        # The checks run outside the lock, so a hung dependency holds up only
+        # the probes that are checking it, never the lock
+        report = self._run()
+        with self._lock:
+            self._report = report
+            self._checked_at = time.monotonic()
+        return report
+
+    def reset(self) -> None:
+        """Forget the cached report."""
+        with self._lock:
+            self._report = None
+
+    def _run(self) -> Dict[str, Any]:
+        results = {name: _timed(check) for name, check in self.checks.items()}
+        if any(r.status == FAIL for name, r in results.items() if name in CRITICAL_CHECKS):
+            status = FAIL
+        elif any(r.status != OK for r in results.values()):
+            status = DEGRADED
+        else:
+            status = OK
+        return {
+            'status': status,
+            'checked_at': timezone.now().isoformat(),
+            'checks': {name: result._asdict() for name, result in results.items()},
+        }
+
+
+health_checker = HealthChecker()
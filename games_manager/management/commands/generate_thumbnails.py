@@ -0,0 +1,39 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from games_manager.models import Game
+from games_manager.thumbnails import process, run
+
+
+class Command(BaseCommand):
+    """Backfill the resized thumbnail variants of existing games."""
+    
+    help = 'Generate WebP and JPEG thumbnail variants for games that are missing them'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate the variants of every game')
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Images processed in parallel threads; 0 processes them one by one (default: 4)'
+        )
+    
+    def handle(self, *args, **options):
+        games = Game.objects.exclude(thumbnail='').exclude(thumbnail__isnull=True).order_by('pk')
+        pks = [
+            game.pk for game in games.only('pk', 'thumbnail', 'thumbnail_variants')
+            if options['force'] or game.thumbnail_variants.get('source') != game.thumbnail.name
+        ]
+        if options['workers'] > 0:
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                results = list(pool.map(run, pks))
+        else:
+            results = [process(pk) for pk in pks]
+        
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated thumbnail variants for {results.count(True)} of {len(pks)} games"
+        ))
+        if None in results:
+            self.stderr.write(f"{results.count(None)} games failed; see the log for details")
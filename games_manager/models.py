@@ -6,6 +6,8 @@ class Game(models.Model):
     slug = models.SlugField(unique=True)
     description = models.TextField()
     thumbnail = models.ImageField(upload_to='game_thumbnails/', null=True, blank=True)
+    # Resized copies of the thumbnail, written by games_manager.thumbnails
+    thumbnail_variants = models.JSONField(default=dict, blank=True, editable=False)
     url_path = models.CharField(max_length=100)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -1,3 +1,412 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction
+from django.contrib.admin.sites import site as admin_site
+from django.contrib.auth.models import User
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.handlers.asgi import ASGIHandler
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from PIL import Image
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from retro_game_web import metrics
+from retro_game_web.middleware import AsyncWhiteNoiseMiddleware, MetricsMiddleware
+from retro_game_web.storage import strip_console_calls
+from retro_game_web.testing import QueryBudgetMixin
+
+from .catalogue import GENERATION_KEY, Catalogue, catalogue
+from . import thumbnails
+from .health import health_checker
+from .models import Game
+
+LIVE_URL = '/health/live/'
+READY_URL = '/health/ready/'
+METRICS_URL = '/metrics/'
+
+
+class HealthProbeTests(TestCase):
+    """Tests for the liveness and readiness probes."""
+
+    def setUp(self):
+        health_checker.reset()
+
+    def test_liveness_makes_no_queries(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(LIVE_URL)
+        self.assertEqual(response.json(), {'status': 'ok'})
+
+    def test_readiness_reports_checks_with_latency(self):
+        data = self.client.get(READY_URL).json()
+
+        self.assertEqual(data['status'], 'ok')
+        self.assertEqual(set(data['checks']), {'database', 'cache', 'migrations'})
+        self.assertIn('latency_ms', data['checks']['database'])
+
+    def test_readiness_is_cached(self):
+        self.client.get(READY_URL)
+
+        with self.assertNumQueries(0):
+            self.client.get(READY_URL)
+
+    @override_settings(HEALTH_CHECK_DEGRADED_MS=-1)
+    def test_slow_dependencies_are_degraded(self):
+        response = self.client.get(READY_URL)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'degraded')
+
+    def test_checks_run_without_holding_the_lock(self):
+        def check_database():
+            self.assertFalse(health_checker._lock.locked())
+            return None
+        with mock.patch.dict(health_checker.checks, {'database': check_database}):
+            self.assertEqual(self.client.get(READY_URL).status_code, 200)
+
+    def test_database_failure_is_not_ready(self):
+        failing = mock.Mock(side_effect=RuntimeError('down'), __name__='check_database')
+        with mock.patch.dict(health_checker.checks, {'database': failing}):
+            response = self.client.get(READY_URL)
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['checks']['database']['detail'], 'down')
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Exact SQL and cache plans per page; change a budget only on purpose."""
+
+    def setUp(self):
+        health_checker.reset()
+        cache.clear()
+        catalogue.clear_local()
+
+    def test_index_cold(self):
+        self.assertBudget(lambda: self.client.get('/'), queries=['SELECT games_manager_game'],
+                          cache=['get', 'add', 'get', 'set'])
+
+    def test_index_other_worker(self):
+        self.client.get('/')
+        catalogue.clear_local()
+        self.assertBudget(lambda: self.client.get('/'), queries=[], cache=['get', 'get'])
+
+    def test_index_warm(self):
+        self.client.get('/')
+        self.assertBudget(lambda: self.client.get('/'), queries=[], cache=[])
+
+    def test_about(self):
+        self.assertBudget(lambda: self.client.get('/about/'), queries=[], cache=[])
+
+    def test_liveness(self):
+        self.assertBudget(lambda: self.client.get(LIVE_URL), queries=[], cache=[])
+
+    def test_readiness_warm(self):
+        self.client.get(READY_URL)
+        self.assertBudget(lambda: self.client.get(READY_URL), queries=[], cache=[])
+
+    def test_health(self):
+        self.client.get(READY_URL)
+        self.assertBudget(lambda: self.client.get('/health/'), queries=[], cache=[])
+
+
+class CatalogueTests(TestCase):
+    """Tests for the cached front page catalogue."""
+
+    def setUp(self):
+        cache.clear()
+        catalogue.clear_local()
+        self.game = Game.objects.create(name='Snake', slug='snake', description='Eat and grow.',
+                                        url_path='/snake/')
+
+    def test_index_lists_active_games(self):
+        Game.objects.create(name='Tetris', slug='tetris', url_path='/tetris/', is_active=False)
+        response = self.client.get('/')
+
+        self.assertContains(response, 'Snake')
+        self.assertNotContains(response, 'Tetris')
+        self.assertNotContains(response, 'Coming Soon')
+
+    def test_save_invalidates_after_commit(self):
+        self.client.get('/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.game.name = 'Python'
+            self.game.save()
+
+        self.assertContains(self.client.get('/'), 'Python')
+
+    def test_delete_invalidates_after_commit(self):
+        self.client.get('/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.game.delete()
+
+        self.assertEqual(catalogue.games(), [])
+
+    def test_evicted_generation_does_not_revive_old_entries(self):
+        catalogue.games()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.game.name = 'Python'
+            self.game.save()
+        catalogue.games()
+        cache.delete(GENERATION_KEY)
+        catalogue.clear_local()
+
+        self.assertEqual([game['name'] for game in catalogue.games()], ['Python'])
+
+    def test_other_workers_see_changes_after_local_ttl(self):
+        other_worker = Catalogue()
+        other_worker.games()
+        with self.captureOnCommitCallbacks(execute=True):
+            Game.objects.create(name='Pong', slug='pong', url_path='/pong/')
+
+        with self.assertNumQueries(0):
+            self.assertEqual([game['slug'] for game in other_worker.games()], ['snake'])
+        with override_settings(CATALOGUE_LOCAL_TTL=0):
+            self.assertEqual([game['slug'] for game in other_worker.games()], ['pong', 'snake'])
+
+    def test_admin_bulk_actions_invalidate(self):
+        catalogue.games()
+        request = RequestFactory().post('/admin/games_manager/game/')
+        request.user = User(is_superuser=True, is_staff=True)
+        model_admin = admin_site._registry[Game]
+        with mock.patch.object(model_admin, 'message_user'), \
+                self.captureOnCommitCallbacks(execute=True):
+            model_admin.deactivate(request, Game.objects.all())
+
+        self.assertEqual(catalogue.games(), [])
+
+
+@override_settings(THUMBNAIL_WIDTHS=(320, 640, 960), THUMBNAIL_WORKERS=0)
+class ThumbnailVariantTests(TestCase):
+    """Tests for the resized thumbnail variants."""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+        catalogue.clear_local()
+
+    def upload(self, width=1200, height=600, mode='RGBA', name='snake.png'):
+        buffer = io.BytesIO()
+        Image.new(mode, (width, height), (200, 40, 40, 128)[:len(mode)]).save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def create_game(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            game = Game.objects.create(name='Snake', slug='snake', url_path='/snake/', **kwargs)
+        game.refresh_from_db()
+        return game
+
+    def test_upload_generates_webp_and_jpeg_variants(self):
+        game = self.create_game(thumbnail=self.upload())
+
+        variants = game.thumbnail_variants
+        self.assertEqual(variants['source'], game.thumbnail.name)
+        for fmt, pillow_format in (('webp', 'WEBP'), ('jpeg', 'JPEG')):
+            self.assertEqual([width for width, _ in variants[fmt]], [320, 640, 960])
+            width, name = variants[fmt][0]
+            with default_storage.open(name) as variant, Image.open(variant) as image:
+                self.assertEqual((image.format, image.size), (pillow_format, (320, 160)))
+
+    def test_small_uploads_are_not_upscaled(self):
+        game = self.create_game(thumbnail=self.upload(width=400, height=200, mode='RGB'))
+
+        self.assertEqual([width for width, _ in game.thumbnail_variants['jpeg']], [320, 400])
+
+    def test_catalogue_renders_srcset(self):
+        game = self.create_game(thumbnail=self.upload())
+        response = self.client.get('/')
+
+        webp = game.thumbnail_variants['webp']
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, f'{default_storage.url(webp[-1][1])} 960w')
+        self.assertContains(response, f'src="{default_storage.url(game.thumbnail_variants["jpeg"][0][1])}"')
+        self.assertNotContains(response, game.thumbnail.url)
+
+    def test_new_upload_replaces_variants(self):
+        game = self.create_game(thumbnail=self.upload())
+        old_names = thumbnails.variant_names(game.thumbnail_variants)
+        with self.captureOnCommitCallbacks(execute=True):
+            game.thumbnail = self.upload(name='snake-v2.png')
+            game.save()
+        game.refresh_from_db()
+
+        self.assertEqual(game.thumbnail_variants['source'], game.thumbnail.name)
+        self.assertFalse(any(default_storage.exists(name) for name in old_names))
+
+    def test_variants_are_generated_on_the_worker_pool(self):
+        with override_settings(THUMBNAIL_WORKERS=1), \
+                mock.patch('games_manager.thumbnails.run') as run:
+            game = self.create_game(thumbnail=self.upload())
+            thumbnails.workers.shutdown()
+
+        run.assert_called_once_with(game.pk)
+        self.assertEqual(game.thumbnail_variants, {})
+
+    def test_backfill_command(self):
+        Game.objects.create(name='Pong', slug='pong', url_path='/pong/')
+        game = Game.objects.create(name='Snake', slug='snake', url_path='/snake/', thumbnail=self.upload())
+        stdout = io.StringIO()
+        call_command('generate_thumbnails', '--workers', '0', stdout=stdout)
+
+        game.refresh_from_db()
+        self.assertEqual(len(game.thumbnail_variants['webp']), 3)
+        self.assertIn('for 1 of 1 games', stdout.getvalue())
+
+
+class RequestMetricsTests(TestCase):
+    """Tests for the per-view request metrics."""
+
+    def setUp(self):
+        self.metrics_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.metrics_dir.cleanup)
+        settings_override = override_settings(METRICS_DIR=self.metrics_dir.name, METRICS_FLUSH_INTERVAL=3600)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        metrics.registry.reset()
+        self.addCleanup(metrics.registry.reset)
+        health_checker.reset()
+
+    def test_requests_are_labelled_by_view(self):
+        self.client.get(LIVE_URL)
+        self.client.get(LIVE_URL)
+        self.client.get('/no-such-page/')
+
+        views = metrics.registry.snapshot()
+        self.assertEqual(views['games_manager:liveness']['requests'], {'200': 2})
+        self.assertEqual(sum(views['games_manager:liveness']['latency_buckets']), 2)
+        self.assertEqual(views[metrics.UNMATCHED_VIEW]['requests'], {'404': 1})
+
+    def test_queries_and_cache_lookups_are_counted(self):
+        self.client.get(READY_URL)
+
+        data = metrics.registry.snapshot()['games_manager:readiness']
+        self.assertGreaterEqual(data['db_queries'], 1)
+        self.assertEqual(data['cache_hits'], 1)
+        self.assertEqual(data['cache_misses'], 0)
+
+    def test_endpoint_merges_worker_files(self):
+        other = {'games_manager:liveness': {
+            'requests': {'200': 5},
+            'latency_buckets': [5] + [0] * len(metrics.LATENCY_BUCKETS),
+            'latency_sum': 0.01,
+            'db_queries': 0,
+            'db_time': 0.0,
+            'cache_hits': 0,
+            'cache_misses': 0,
+        }}
+        with open(os.path.join(self.metrics_dir.name, 'metrics-0.json'), 'w') as f:
+            json.dump(other, f)
+        self.client.get(LIVE_URL)
+
+        with self.settings(METRICS_TOKEN='secret'):
+            body = self.client.get(METRICS_URL, headers={'Authorization': 'Bearer secret'}).content.decode()
+
+        self.assertIn('http_requests_total{view="games_manager:liveness",status="200"} 6', body)
+        self.assertIn('http_request_duration_seconds_count{view="games_manager:liveness"} 6', body)
+
+    def test_flush_writes_process_file(self):
+        self.client.get(LIVE_URL)
+
+        metrics.registry.flush()
+
+        path = os.path.join(self.metrics_dir.name, f'metrics-{os.getpid()}.json')
+        with open(path) as f:
+            self.assertIn('games_manager:liveness', json.load(f))
+
+    async def test_async_chain_is_recorded_without_a_thread(self):
+        async def view(request):
+            await Game.objects.acount()
+            return HttpResponse()
+
+        middleware = MetricsMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        await middleware(RequestFactory().get('/'))
+
+        data = metrics.registry.snapshot()[metrics.UNMATCHED_VIEW]
+        self.assertEqual(data['requests'], {'200': 1})
+        self.assertEqual(data['db_queries'], 1)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_endpoint_requires_token_when_set(self):
+        self.assertEqual(self.client.get(METRICS_URL).status_code, 403)
+        response = self.client.get(METRICS_URL, headers={'Authorization': 'Bearer secret'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_endpoint_is_hidden_without_token(self):
+        self.assertEqual(self.client.get(METRICS_URL).status_code, 404)
+        with self.settings(DEBUG=True):
+            self.assertEqual(self.client.get(METRICS_URL).status_code, 200)
+
+
+class AsgiMiddlewareTests(TestCase):
+    """The ASGI middleware chain must stay async end to end."""
+
+    @override_settings(DEBUG=True)
+    def test_no_middleware_is_adapted_to_a_thread(self):
+        # Django logs every sync/async adaptation at debug level when DEBUG is on
+        with self.assertNoLogs('django.request', 'DEBUG'):
+            handler = ASGIHandler()
+        self.assertTrue(iscoroutinefunction(handler._middleware_chain))
+
+    async def test_static_files_are_served_in_async_chain(self):
+        async def view(request):
+            return HttpResponse('view')
+
+        whitenoise = AsyncWhiteNoiseMiddleware(view)
+        game_js = finders.find(StaticBuildTests.GAME_JS)
+        whitenoise.add_files(os.path.dirname(game_js), prefix='/static/js/')
+        response = await whitenoise(RequestFactory().get('/static/js/game.js'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((await whitenoise(RequestFactory().get('/'))).content, b'view')
+
+
+class StaticBuildTests(TestCase):
+    """Tests for the minified, hashed and compressed static build."""
+
+    GAME_JS = 'retro_platform_fighter/js/game.js'
+
+    def setUp(self):
+        static_root = tempfile.TemporaryDirectory()
+        self.addCleanup(static_root.cleanup)
+        self.static_root = Path(static_root.name)
+        settings_override = override_settings(STATIC_ROOT=self.static_root, STATIC_STRIP_DEBUG_LOGGING=True)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_debug_logging_is_stripped(self):
+        source = "if (x) console.log('a', f(1)); s = 'console.log(2)'; console.error(`e ${g(')')}`);"
+        self.assertEqual(
+            strip_console_calls(source),
+            "if (x) void 0; s = 'console.log(2)'; console.error(`e ${g(')')}`);"
+        )
+
+    def test_game_script_is_minified_hashed_and_compressed(self):
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+        url = staticfiles_storage.url(self.GAME_JS)
+        hashed = self.static_root / staticfiles_storage.stored_name(self.GAME_JS)
+        source = Path(finders.find(self.GAME_JS))
+        self.assertRegex(url, r'/game\.[0-9a-f]{12}\.js$')
+        self.assertTrue(Path(f'{hashed}.gz').exists())
+        self.assertNotIn('Initializing game', hashed.read_text())
+        self.assertLess(hashed.stat().st_size, source.stat().st_size)
+
+        whitenoise = WhiteNoiseMiddleware(lambda request: None)
+        response = whitenoise(RequestFactory().get(url, HTTP_ACCEPT_ENCODING='gzip'))
+        self.assertIn('immutable', response.headers['Cache-Control'])
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+
+    def test_urls_are_unhashed_before_collectstatic(self):
+        self.assertEqual(staticfiles_storage.url(self.GAME_JS), f'/static/{self.GAME_JS}')
@@ -0,0 +1,191 @@
+"""
+Resized thumbnail variants for the game catalogue.
+
+When a game's thumbnail changes, WebP and JPEG copies are generated at each
+width in ``settings.THUMBNAIL_WIDTHS`` (never wider than the upload) and
+their storage names are recorded in ``Game.thumbnail_variants``::
+
+    {'source': 'game_thumbnails/snake.png',
+     'webp': [[320, 'game_thumbnails/variants/snake-320w.webp'], ...],
+     'jpeg': [[320, 'game_thumbnails/variants/snake-320w.jpg'], ...]}
+
+The catalogue renders them as ``srcset`` candidates, so browsers download
+the copy that fits the card instead of the original upload.
+
+Variants are generated after the saving transaction commits, on a pool of
+``settings.THUMBNAIL_WORKERS`` threads, so the admin request does not wait
+for Pillow; with 0 workers they are generated inline. Existing rows are
+backfilled with the ``generate_thumbnails`` management command.
+"""
+
+import atexit
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import PurePosixPath
+from typing import Any, Dict, List, Optional, Sequence
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from PIL import Image, ImageOps
+
+from .catalogue import catalogue
+from .models import Game
+
+logger = logging.getLogger(__name__)
+
+VARIANT_DIR = 'game_thumbnails/variants'
+# Pillow format, file extension and save options per variant format
+FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+# JPEG has no alpha channel; transparent thumbnails are flattened onto the card colour
+JPEG_BACKGROUND = (51, 51, 51)
+
+
+def variant_widths(image_width: int, widths: Sequence[int]) -> List[int]:
+    """The widths to generate for an image, without upscaling."""
+    return sorted({min(width, image_width) for width in widths})
+
+
+def _encode(image: Image.Image, fmt: str) -> bytes:
+    pillow_format, _, options = FORMATS[fmt]
+    if fmt == 'jpeg' and image.mode != 'RGB':
+        rgba = image.convert('RGBA')
+        image = Image.new('RGB', rgba.size, JPEG_BACKGROUND)
+        image.paste(rgba, mask=rgba.getchannel('A'))
+    elif fmt == 'webp' and image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or 'A' in image.mode else 'RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, pillow_format, **options)
+    return buffer.getvalue()
+
+
+def generate_variants(field_file, widths: Optional[Sequence[int]] = None) -> Dict[str, Any]:
+    """
+    Write the resized variants of an image field's file to its storage.
+
+    Returns:
+        The ``thumbnail_variants`` value describing them
+    """
+    widths = widths or settings.THUMBNAIL_WIDTHS
+    storage = field_file.storage
+    with storage.open(field_file.name, 'rb') as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    stem = PurePosixPath(field_file.name).stem
+    variants = {'source': field_file.name, **{fmt: [] for fmt in FORMATS}}
+    for width in variant_widths(image.width, widths):
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.Resampling.LANCZOS)
+        for fmt, (_, extension, _) in FORMATS.items():
+            name = storage.save(f'{VARIANT_DIR}/{stem}-{width}w.{extension}',
+                                ContentFile(_encode(resized, fmt)))
+            variants[fmt].append([width, name])
+    return variants
+
+
+def variant_names(variants: Dict[str, Any]) -> List[str]:
+    """Storage names of every file listed in a ``thumbnail_variants`` value."""
+    return [name for fmt in FORMATS for _, name in variants.get(fmt, [])]
+
+
+def delete_variants(storage, names) -> None:
+    for name in names:
+        try:
+            storage.delete(name)
+        except OSError:
+            logger.warning(f"Could not delete thumbnail variant {name}")
+
+
+def process(pk: int) -> bool:
+    """
+    Generate (or clear) the variants of one game's current thumbnail.
+
+    Returns:
+        Whether the game's variants were updated
+    """
+    game = Game.objects.filter(pk=pk).first()
+    if game is None:
+        return False
+
+    storage = game.thumbnail.storage
+    previous = variant_names(game.thumbnail_variants or {})
+    variants = generate_variants(game.thumbnail) if game.thumbnail else {}
+
+    # update() so the variants do not trigger another round; it also loses
+    # cleanly to a newer upload that arrived while these were generated.
+    if game.thumbnail:
+        unchanged = Q(thumbnail=game.thumbnail.name)
+    else:
+        unchanged = Q(thumbnail='') | Q(thumbnail__isnull=True)
+    updated = Game.objects.filter(unchanged, pk=pk).update(thumbnail_variants=variants)
+    current = set(variant_names(variants))
+    if not updated:
+        delete_variants(storage, current)
+        return False
+    delete_variants(storage, [name for name in previous if name not in current])
+    catalogue.invalidate()
+    return True
+
+
+def run(pk: int) -> Optional[bool]:
+    """``process`` for pool threads: failures are logged and the thread's connection closed."""
+    try:
+        return process(pk)
+    except Exception:
+        logger.exception(f"Generating thumbnail variants for game {pk} failed")
+        return None
+    finally:
+        connection.close()
+
+
+class ThumbnailWorkers:
+    """Background pool generating thumbnail variants off the request path."""
+
+    def __init__(self):
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return getattr(settings, 'THUMBNAIL_WORKERS', 2)
+
+    def submit(self, pk: int) -> None:
+        """Generate the variants of a game now or on the pool, per ``THUMBNAIL_WORKERS``."""
+        if self.size <= 0:
+            process(pk)
+            return
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.size,
+                                                    thread_name_prefix='thumbnails')
+            self._executor.submit(run, pk)
+
+    def shutdown(self) -> None:
+        """Finish queued work and stop the pool."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+workers = ThumbnailWorkers()
+atexit.register(workers.shutdown)
+
+
+@receiver(post_save, sender=Game, dispatch_uid='games_manager.thumbnails.saved')
+def schedule_thumbnail_variants(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    source = (instance.thumbnail_variants or {}).get('source', '')
+    if source != (instance.thumbnail.name or ''):
+        transaction.on_commit(lambda: workers.submit(instance.pk))
@@ -7,4 +7,6 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('about/', views.about, name='about'),
     path('health/', views.health_check, name='health_check'),
+    path('health/live/', views.liveness, name='liveness'),
+    path('health/ready/', views.readiness, name='readiness'),
 ]
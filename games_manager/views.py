@@ -1,45 +1,44 @@
 from django.shortcuts import render
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
-from django.db import connection
-from .models import Game
+from django.views.decorators.cache import never_cache
+from django.template.loader import render_to_string
+from .catalogue import TEMPLATE as CATALOGUE_TEMPLATE, catalogue
+from .health import FAIL, health_checker
 import logging
 
 logger = logging.getLogger(__name__)
 
 def index(request):
-    """Main page with list of available games"""
+    """Main page with list of available games, served from the cached catalogue"""
     try:
-        games = Game.objects.filter(is_active=True).order_by('name')
-        return render(request, 'games_manager/index.html', {'games': games})
+        return render(request, 'games_manager/index.html', {'catalogue_html': catalogue.html()})
     except Exception as e:
         logger.error(f"Error in index view: {str(e)}")
-        return render(request, 'games_manager/index.html', {'games': [], 'error': 'Failed to load games'})
+        fallback = render_to_string(CATALOGUE_TEMPLATE, {'games': []})
+        return render(request, 'games_manager/index.html', {'catalogue_html': fallback, 'error': 'Failed to load games'})
 
 def about(request):
     """About page"""
     return render(request, 'games_manager/about.html')
 
-@require_http_methods(["GET"])
-def health_check(request):
-    """Simple health check endpoint"""
-    try:
-        # Check database connection
-        with connection.cursor() as cursor:
-            cursor.execute("SELECT 1")
-        
-        # Check if games are available
-        game_count = Game.objects.filter(is_active=True).count()
-        
-        return JsonResponse({
-            'status': 'healthy',
-            'database': 'connected',
-            'active_games': game_count
-        })
+@never_cache
+@require_http_methods(["GET", "HEAD"])
+def liveness(request):
+    """Liveness probe: the process is up and serving requests. Touches no dependency."""
+    return JsonResponse({'status': 'ok'})
+
+@never_cache
+@require_http_methods(["GET", "HEAD"])
+def readiness(request):
+    """
+    Readiness probe with database, cache and migration checks.
     
-    except Exception as e:
-        logger.error(f"Health check failed: {str(e)}")
-        return JsonResponse({
-            'status': 'unhealthy',
-            'error': str(e)
-        }, status=500)
+    The checks are cached for settings.HEALTH_CHECK_TTL seconds. Responds 200
+    when ready (status 'ok' or 'degraded') and 503 when a critical check fails.
+    """
+    report = health_checker.report()
+    return JsonResponse(report, status=503 if report['status'] == FAIL else 200)
+
+# The original health endpoint now serves the cached readiness report
+health_check = readiness
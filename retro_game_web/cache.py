@@ -0,0 +1,76 @@
+"""
+Cache backend wrapper that reports hits and misses to the request metrics.
+
+Configure it as the ``BACKEND`` of a cache and name the real backend in
+``OPTIONS['BACKEND']``; every other setting is passed through unchanged::
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'retro_game_web.cache.InstrumentedCache',
+            'LOCATION': '...',
+            'OPTIONS': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'},
+        }
+    }
+"""
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.module_loading import import_string
+
+from . import metrics
+
+
+class InstrumentedCache(BaseCache):
+    """Delegates to another cache backend and counts lookups."""
+
+    def __init__(self, location, params):
+        params = dict(params)
+        options = dict(params.get('OPTIONS', {}))
+        backend = options.pop('BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+        params['OPTIONS'] = options
+        super().__init__(params)
+        self._backend = import_string(backend)(location, params)
+
+    def get(self, key, default=None, version=None):
+        missing = object()
+        value = self._backend.get(key, missing, version=version)
+        metrics.record_cache_lookup(hits=int(value is not missing), misses=int(value is missing))
+        return default if value is missing else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = self._backend.get_many(keys, version=version)
+        metrics.record_cache_lookup(hits=len(found), misses=len(keys) - len(found))
+        return found
+
+    def has_key(self, key, version=None):
+        return self._backend.has_key(key, version=version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._backend.add(key, value, timeout=timeout, version=version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._backend.set(key, value, timeout=timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._backend.set_many(data, timeout=timeout, version=version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._backend.touch(key, timeout=timeout, version=version)
+
+    def delete(self, key, version=None):
+        return self._backend.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        return self._backend.delete_many(keys, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        return self._backend.incr(key, delta=delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        return self._backend.decr(key, delta=delta, version=version)
+
+    def clear(self):
+        return self._backend.clear()
+
+    def close(self, **kwargs):
+        return self._backend.close(**kwargs)
@@ -0,0 +1,270 @@
+"""
+Per-view request metrics for retro_game_web.
+
+``retro_game_web.middleware.MetricsMiddleware`` records, for every request, the URL name of the view
+that served it (for example ``retro_platform_fighter:save_state``), its
+status, its latency, the database queries it ran and the cache hits and
+misses it caused. Database work is counted with a connection execute
+wrapper installed on every connection; cache lookups are counted by ``retro_game_web.cache.InstrumentedCache``.
+
+Each process keeps its counters in memory and writes them to
+``settings.METRICS_DIR/metrics-<pid>.json`` at most every
+``settings.METRICS_FLUSH_INTERVAL`` seconds and at exit. The ``/metrics``
+endpoint merges the files of every worker with the live counters of the
+process that serves it, and renders them in the Prometheus text format.
+Files of finished workers are kept so totals never go backwards; clear the
+directory when the whole server restarts.
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_http_methods
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNMATCHED_VIEW = '<unmatched>'
+
+# Counters of the request being served in this context
+_current: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    'request_metrics', default=None
+)
+
+
+def record_cache_lookup(hits: int = 0, misses: int = 0) -> None:
+    """Count cache hits and misses against the current request, if any."""
+    counters = _current.get()
+    if counters is not None:
+        counters['cache_hits'] += hits
+        counters['cache_misses'] += misses
+
+
+def _count_query(execute, sql, params, many, context):
+    """Execute wrapper counting queries against the request of the current context."""
+    counters = _current.get()
+    if counters is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        counters['db_queries'] += 1
+        counters['db_time'] += time.perf_counter() - started
+
+
+def install_query_counter(connection, **kwargs):
+    """Add the query counter to a connection once; connected to ``connection_created``."""
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+# The counter stays on every connection and finds the request through the
+# context, so queries that async views run via sync_to_async, on another
+# thread's connection, are counted as well.
+connection_created.connect(install_query_counter, dispatch_uid='retro_game_web.metrics.query_counter')
+
+
+@contextmanager
+def track_request():
+    """
+    Count the database queries and cache lookups made inside the block.
+
+    Yields the counters dict, filled in as the block runs. Works in sync and
+    async code alike.
+    """
+    counters = {'db_queries': 0, 'db_time': 0.0, 'cache_hits': 0, 'cache_misses': 0}
+    # Connections opened before this module was imported missed the signal
+    for connection in connections.all(initialized_only=True):
+        install_query_counter(connection)
+    token = _current.set(counters)
+    try:
+        yield counters
+    finally:
+        _current.reset(token)
+
+
+def _empty_view_metrics() -> Dict[str, Any]:
+    return {
+        'requests': {},
+        'latency_buckets': [0] * (len(LATENCY_BUCKETS) + 1),
+        'latency_sum': 0.0,
+        'db_queries': 0,
+        'db_time': 0.0,
+        'cache_hits': 0,
+        'cache_misses': 0,
+    }
+
+
+def merge_metrics(snapshots: Iterable[Dict[str, Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+    """Sum per-view metrics from several processes."""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for snapshot in snapshots:
+        for view, data in snapshot.items():
+            total = merged.setdefault(view, _empty_view_metrics())
+            for status, count in data['requests'].items():
+                total['requests'][status] = total['requests'].get(status, 0) + count
+            total['latency_buckets'] = [
+                a + b for a, b in zip(total['latency_buckets'], data['latency_buckets'])
+            ]
+            for key in ('latency_sum', 'db_queries', 'db_time', 'cache_hits', 'cache_misses'):
+                total[key] += data[key]
+    return merged
+
+
+class MetricsRegistry:
+    """In-process per-view counters, periodically written to a per-PID file."""
+
+    def __init__(self):
+        self._views: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._atexit_registered = False
+
+    @property
+    def directory(self) -> Path:
+        return Path(getattr(
+            settings, 'METRICS_DIR', os.path.join(tempfile.gettempdir(), 'retro_game_web_metrics')
+        ))
+
+    @property
+    def flush_interval(self) -> float:
+        return getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+
+    def record(self, view: str, status: int, latency: float, counters: Dict[str, float]) -> None:
+        """Add one finished request to the counters of its view."""
+        bucket = next(
+            (i for i, bound in enumerate(LATENCY_BUCKETS) if latency <= bound), len(LATENCY_BUCKETS)
+        )
+        with self._lock:
+            data = self._views.setdefault(view, _empty_view_metrics())
+            status_key = str(status)
+            data['requests'][status_key] = data['requests'].get(status_key, 0) + 1
+            data['latency_buckets'][bucket] += 1
+            data['latency_sum'] += latency
+            for key, value in counters.items():
+                data[key] += value
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+            if not self._atexit_registered:
+                atexit.register(self.flush)
+                self._atexit_registered = True
+        if due:
+            self.flush()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Return a copy of this process's counters."""
+        with self._lock:
+            return json.loads(json.dumps(self._views))
+
+    def flush(self) -> None:
+        """Write this process's counters to its file, atomically."""
+        self._last_flush = time.monotonic()
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self.directory / f'metrics-{os.getpid()}.json'
+            temp = path.with_suffix('.tmp')
+            temp.write_text(json.dumps(self.snapshot()))
+            os.replace(temp, path)
+        except OSError as e:
+            logger.warning(f"Could not write metrics file: {str(e)}")
+
+    def collect(self) -> Dict[str, Dict[str, Any]]:
+        """Merge the files of every worker with this process's live counters."""
+        own_file = f'metrics-{os.getpid()}.json'
+        snapshots = [self.snapshot()]
+        if self.directory.is_dir():
+            for path in self.directory.glob('metrics-*.json'):
+                if path.name == own_file:
+                    continue
+                try:
+                    snapshots.append(json.loads(path.read_text()))
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Skipping unreadable metrics file {path.name}: {str(e)}")
+        return merge_metrics(snapshots)
+
+    def reset(self) -> None:
+        """Forget this process's counters."""
+        with self._lock:
+            self._views.clear()
+
+
+registry = MetricsRegistry()
+
+
+def _label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def render_metrics(views: Dict[str, Dict[str, Any]]) -> str:
+    """Render merged metrics in the Prometheus text exposition format."""
+    lines = []
+
+    def family(name, kind, help_text):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    family('http_requests_total', 'counter', 'Requests served, by view and status.')
+    for view, data in sorted(views.items()):
+        for status, count in sorted(data['requests'].items()):
+            lines.append(f'http_requests_total{{view="{_label(view)}",status="{status}"}} {count}')
+
+    family('http_request_duration_seconds', 'histogram', 'Request latency, by view.')
+    for view, data in sorted(views.items()):
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), data['latency_buckets']):
+            cumulative += count
+            lines.append(
+                f'http_request_duration_seconds_bucket{{view="{_label(view)}",le="{bound}"}} {cumulative}'
+            )
+        lines.append(f'http_request_duration_seconds_sum{{view="{_label(view)}"}} {data["latency_sum"]:.6f}')
+        lines.append(f'http_request_duration_seconds_count{{view="{_label(view)}"}} {cumulative}')
+
+    for name, key, kind, help_text in (
+        ('db_queries_total', 'db_queries', 'counter', 'Database queries run, by view.'),
+        ('db_query_duration_seconds_total', 'db_time', 'counter', 'Time spent in database queries, by view.'),
+        ('cache_hits_total', 'cache_hits', 'counter', 'Cache lookups that found a value, by view.'),
+        ('cache_misses_total', 'cache_misses', 'counter', 'Cache lookups that found nothing, by view.'),
+    ):
+        family(name, kind, help_text)
+        for view, data in sorted(views.items()):
+            value = data[key]
+            value = f'{value:.6f}' if isinstance(value, float) else value
+            lines.append(f'{name}{{view="{_label(view)}"}} {value}')
+
+    return '\n'.join(lines) + '\n'
+
+
+@never_cache
+@require_http_methods(["GET"])
+def metrics_view(request):
+    """
+    Metrics endpoint; requires ``Authorization: Bearer <METRICS_TOKEN>``.
+
+    Without a token the endpoint is only served when DEBUG is on; in
+    production it does not exist until ``METRICS_TOKEN`` is set.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token:
+        if not settings.DEBUG:
+            raise Http404()
+    elif request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponseForbidden('Forbidden')
+    return HttpResponse(
+        render_metrics(registry.collect()),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
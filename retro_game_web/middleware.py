@@ -0,0 +1,193 @@
+"""
+Project-wide middleware for retro_game_web.
+"""
+
+import re
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_string
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from . import metrics
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class SessionRefreshMiddleware(MiddlewareMixin):
+    """
+    Keep session expiry rolling without saving the session on every request.
+
+    Replaces ``SESSION_SAVE_EVERY_REQUEST``. A session that was not otherwise
+    modified is marked for saving, which re-sends the cookie and extends the
+    stored expiry, only on a state-changing request made at least
+    ``settings.SESSION_REFRESH_INTERVAL`` seconds after its last save. Reads
+    such as load-state and leaderboard polls never write the session.
+
+    Must come after ``SessionMiddleware`` so it runs first on the response.
+    """
+
+    REFRESHED_AT_KEY = '_session_refreshed_at'
+
+    def process_response(self, request, response):
+        session = getattr(request, 'session', None)
+        if session is None or response.status_code >= 500:
+            return response
+
+        now = int(time.time())
+        if session.modified:
+            # Already being saved; note when
+            if not session.is_empty():
+                session[self.REFRESHED_AT_KEY] = now
+            return response
+
+        if request.method in SAFE_METHODS or settings.SESSION_COOKIE_NAME not in request.COOKIES:
+            return response
+
+        interval = getattr(settings, 'SESSION_REFRESH_INTERVAL', 300)
+        if now - session.get(self.REFRESHED_AT_KEY, 0) >= interval:
+            session[self.REFRESHED_AT_KEY] = now
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Record latency, status, database queries and cache lookups per view.
+
+    Requests are labelled with the URL name of the view that served them;
+    requests that matched no URL are grouped under one label. Must come
+    first so the latency covers every other middleware. Supports both sync
+    and async chains, so under ASGI it does not push requests onto a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with metrics.track_request() as counters:
+            response = self.get_response(request)
+        self._record(request, response, started, counters)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with metrics.track_request() as counters:
+            response = await self.get_response(request)
+        self._record(request, response, started, counters)
+        return response
+
+    def _record(self, request, response, started, counters):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match and match.view_name else metrics.UNMATCHED_VIEW
+        metrics.registry.record(view, response.status_code, time.perf_counter() - started, counters)
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise that also runs in an async middleware chain.
+
+    ``WhiteNoiseMiddleware`` is sync-only, which makes Django run every
+    request under ASGI, static or not, through a thread. Here non-static
+    requests are passed straight on to the async chain; only serving a static
+    file, which opens it, runs in a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings=settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compress JSON responses with Brotli or gzip.
+
+    Only bodies of at least ``settings.COMPRESSION_MIN_SIZE`` bytes are
+    compressed, with Brotli when the client accepts it and the brotli package
+    is installed, otherwise with gzip. ETags stay strong: a compressed
+    response's ETag gets the coding appended (``"abc"`` becomes
+    ``"abc-gzip"``), and the suffix is stripped from ``If-None-Match`` before
+    the view compares it, so conditional GETs keep working.
+
+    Must come before any middleware that reads or changes the response body.
+    """
+
+    CONTENT_TYPES = ('application/json',)
+    BROTLI_QUALITY = 5
+    ETAG_SUFFIX = re.compile(r'-(br|gzip)"')
+
+    def process_request(self, request):
+        header = request.META.get('HTTP_IF_NONE_MATCH')
+        if header:
+            match = self.ETAG_SUFFIX.search(header)
+            if match:
+                request.etag_coding = match.group(1)
+                request.META['HTTP_IF_NONE_MATCH'] = self.ETAG_SUFFIX.sub('"', header)
+
+    def process_response(self, request, response):
+        if response.status_code == 304:
+            # The client's copy is the one it got, compressed or not
+            coding = getattr(request, 'etag_coding', None)
+            if coding and response.has_header('ETag'):
+                response.headers['ETag'] = self._suffixed(response.headers['ETag'], coding)
+            return response
+
+        content_type = response.get('Content-Type', '').split(';')[0].strip()
+        if (response.streaming or content_type not in self.CONTENT_TYPES
+                or response.has_header('Content-Encoding')
+                or len(response.content) < getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accept = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if brotli is not None and re.search(r'\bbr\b', accept):
+            coding, compressed = 'br', brotli.compress(response.content, quality=self.BROTLI_QUALITY)
+        elif re.search(r'\bgzip\b', accept):
+            coding, compressed = 'gzip', compress_string(response.content)
+        else:
+            return response
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        response.headers['Content-Encoding'] = coding
+        if response.has_header('ETag'):
+            response.headers['ETag'] = self._suffixed(response.headers['ETag'], coding)
+        return response
+
+    def _suffixed(self, etag: str, coding: str) -> str:
+        return f'{etag[:-1]}-{coding}"' if etag.endswith('"') else etag
@@ -5,6 +5,7 @@ Simplified production-ready configuration.
 
 from pathlib import Path
 import os
+import tempfile
 import dj_database_url
 from decouple import config
 
@@ -34,9 +35,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'retro_game_web.middleware.MetricsMiddleware',
+    'retro_game_web.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'retro_game_web.middleware.AsyncWhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'retro_game_web.middleware.SessionRefreshMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -75,6 +79,18 @@ DATABASES = {
     )
 }
 
+# Cache
+# Lookups are counted per view by the metrics; CACHE_BACKEND names the real backend.
+CACHES = {
+    'default': {
+        'BACKEND': 'retro_game_web.cache.InstrumentedCache',
+        'LOCATION': config('CACHE_LOCATION', default=''),
+        'OPTIONS': {
+            'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        },
+    }
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -100,7 +116,14 @@ USE_TZ = True
 # Static files
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    # Hashed, gzip/Brotli-compressed files with the game scripts minified first
+    'staticfiles': {'BACKEND': 'retro_game_web.storage.MinifiedStaticFilesStorage'},
+}
+STATIC_MINIFY_PATTERNS = ['retro_platform_fighter/*']
+# Remove console.log/debug/info calls from minified scripts (production builds)
+STATIC_STRIP_DEBUG_LOGGING = config('STATIC_STRIP_DEBUG_LOGGING', default=not DEBUG, cast=bool)
 
 # Media files
 MEDIA_URL = '/media/'
@@ -110,9 +133,13 @@ MEDIA_ROOT = BASE_DIR / 'media'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Session configuration
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+# Sessions are read through the cache and only written when they change.
+# Signed-cookie sessions do not fit: game sessions are keyed on session_key.
+SESSION_ENGINE = config('SESSION_ENGINE', default='django.contrib.sessions.backends.cached_db')
 SESSION_COOKIE_AGE = 86400  # 24 hours
-SESSION_SAVE_EVERY_REQUEST = True
+SESSION_SAVE_EVERY_REQUEST = False
+# Rolling expiry is refreshed by SessionRefreshMiddleware at most this often (seconds)
+SESSION_REFRESH_INTERVAL = config('SESSION_REFRESH_INTERVAL', default=300, cast=int)
 
 # Security settings for production
 if not DEBUG:
@@ -130,7 +157,55 @@ CSRF_TRUSTED_ORIGINS = config(
     cast=lambda v: [s.strip() for s in v.split(',')]
 )
 
+# Readiness probe: seconds a dependency report is reused, and latency reported as degraded
+HEALTH_CHECK_TTL = config('HEALTH_CHECK_TTL', default=5, cast=int)
+HEALTH_CHECK_DEGRADED_MS = config('HEALTH_CHECK_DEGRADED_MS', default=200, cast=int)
+
+# Front page catalogue: seconds each worker reuses its copy before checking the shared cache
+CATALOGUE_LOCAL_TTL = config('CATALOGUE_LOCAL_TTL', default=5, cast=int)
+
+# Game thumbnail variants: widths generated as WebP and JPEG, and background worker
+# threads generating them (0 generates them inline during the save)
+THUMBNAIL_WIDTHS = (320, 640, 960)
+THUMBNAIL_WORKERS = config('THUMBNAIL_WORKERS', default=2, cast=int)
+
+# Per-view request metrics: each worker writes its counters to METRICS_DIR every
+# METRICS_FLUSH_INTERVAL seconds; /metrics/ requires METRICS_TOKEN as a bearer token and
+# is a 404 without one unless DEBUG is on
+METRICS_DIR = config('METRICS_DIR', default=os.path.join(tempfile.gettempdir(), 'retro_game_web_metrics'))
+METRICS_FLUSH_INTERVAL = config('METRICS_FLUSH_INTERVAL', default=5, cast=int)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
 # Game settings
 GAME_SESSION_TIMEOUT = 3600  # 1 hour
-MAX_HIGH_SCORES = 100
+MAX_HIGH_SCORES = 100  # Size of the all-time board; older scores beyond it are archived
+HIGH_SCORE_KEEP_USER_BESTS = config('HIGH_SCORE_KEEP_USER_BESTS', default=False, cast=bool)
+LEVEL_LEADERBOARD_SIZE = 10
+SCORE_HISTOGRAM_BUCKET_SIZE = 10000
 PLAYER_NAME_MAX_LENGTH = 50
+
+# Save-state write-behind buffering (needs a cache shared by all workers; schedule
+# `manage.py flush_game_states` so snapshots are written when autosaves stop)
+GAME_STATE_WRITE_BEHIND = config('GAME_STATE_WRITE_BEHIND', default=False, cast=bool)
+GAME_STATE_MAX_STALENESS = config('GAME_STATE_MAX_STALENESS', default=30, cast=int)  # seconds
+GAME_STATE_FLUSH_BATCH_SIZE = 100
+SAVE_BATCH_MAX_SNAPSHOTS = 100  # Snapshots accepted per batch save request
+
+# API rate limits per endpoint scope: (requests, period in seconds)
+RATE_LIMITS = {
+    'default': (100, 60),
+    'save_state': (300, 60),
+    'save_batch': (60, 60),
+    'submit_score': (20, 60),
+}
+RATE_LIMIT_BACKEND = config('RATE_LIMIT_BACKEND', default='cache')  # 'cache' or 'local'
+RATE_LIMIT_ENABLED = config('RATE_LIMIT_ENABLED', default=True, cast=bool)
+
+# JSON responses at least this large (bytes) are Brotli/gzip compressed
+COMPRESSION_MIN_SIZE = config('COMPRESSION_MIN_SIZE', default=1024, cast=int)
+
+# JSON codec of the game API: 'auto' (orjson when installed), 'orjson' or 'stdlib'
+API_JSON_BACKEND = config('API_JSON_BACKEND', default='auto')
+
+# Route the save/load/submit/high-score API to the native async views (ASGI deployments)
+API_ASYNC_VIEWS = config('API_ASYNC_VIEWS', default=False, cast=bool)
@@ -0,0 +1,202 @@
+"""
+Static files storage for retro_game_web.
+
+``MinifiedStaticFilesStorage`` is WhiteNoise's
+``CompressedManifestStaticFilesStorage`` with one extra collectstatic step:
+before the files are hashed, the game scripts matching
+``settings.STATIC_MINIFY_PATTERNS`` are minified (with rjsmin when it is
+installed) and, when ``settings.STATIC_STRIP_DEBUG_LOGGING`` is on, their
+``console.log``/``debug``/``info`` calls are removed. The hashed names are
+therefore those of the minified files, and WhiteNoise writes their gzip and
+Brotli variants and serves them with far-future immutable cache headers.
+
+Until collectstatic has written a manifest (development and tests), URLs
+point at the unhashed source files.
+"""
+
+import logging
+import re
+from fnmatch import fnmatch
+from typing import Sequence
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+logger = logging.getLogger(__name__)
+
+DEBUG_CONSOLE_METHODS = ('log', 'debug', 'info')
+
+# A '/' after these starts a regular expression literal rather than a division
+_REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^')
+_REGEX_KEYWORDS = {
+    'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'void',
+    'throw', 'delete', 'new', 'yield', 'await', 'instanceof',
+}
+_CLOSERS = {'(': ')', '[': ']', '{': '}'}
+
+
+def _is_ident(char: str) -> bool:
+    return char.isalnum() or char in '_$'
+
+
+def _regex_allowed(source: str, i: int) -> bool:
+    """Whether a '/' at i starts a regular expression literal."""
+    j = i - 1
+    while j >= 0 and source[j].isspace():
+        j -= 1
+    if j < 0 or source[j] in _REGEX_PRECEDERS:
+        return True
+    if not _is_ident(source[j]):
+        return False
+    start = j
+    while start > 0 and _is_ident(source[start - 1]):
+        start -= 1
+    return source[start:j + 1] in _REGEX_KEYWORDS
+
+
+def _skip_literal(source: str, i: int) -> int:
+    """
+    If a string, template, comment or regex literal starts at i, return the
+    index just after it; otherwise return i.
+    """
+    n = len(source)
+    char = source[i]
+    if char in '\'"':
+        i += 1
+        while i < n and source[i] != char:
+            i += 2 if source[i] == '\\' else 1
+        return i + 1
+    if char == '`':
+        i += 1
+        while i < n and source[i] != '`':
+            if source[i] == '\\':
+                i += 2
+            elif source.startswith('${', i):
+                i = _skip_code(source, i + 2, '}')
+            else:
+                i += 1
+        return i + 1
+    if source.startswith('//', i):
+        end = source.find('\n', i)
+        return n if end < 0 else end
+    if source.startswith('/*', i):
+        end = source.find('*/', i + 2)
+        return n if end < 0 else end + 2
+    if char == '/' and _regex_allowed(source, i):
+        i += 1
+        in_class = False
+        while i < n and (in_class or source[i] != '/') and source[i] != '\n':
+            if source[i] == '\\':
+                i += 1
+            elif source[i] == '[':
+                in_class = True
+            elif source[i] == ']':
+                in_class = False
+            i += 1
+        return i + 1
+    return i
+
+
+def _skip_code(source: str, i: int, closer: str) -> int:
+    """Return the index just after the closer that balances code starting at i."""
+    stack = [closer]
+    n = len(source)
+    while i < n and stack:
+        end = _skip_literal(source, i)
+        if end != i:
+            i = end
+            continue
+        char = source[i]
+        if char in _CLOSERS:
+            stack.append(_CLOSERS[char])
+        elif char == stack[-1]:
+            stack.pop()
+        i += 1
+    return i
+
+
+def strip_console_calls(source: str, methods: Sequence[str] = DEBUG_CONSOLE_METHODS) -> str:
+    """
+    Replace ``console.<method>(...)`` calls with ``void 0``.
+
+    The replacement is an expression, so calls in any position (statements,
+    arrow bodies, ternaries) stay valid. Strings, templates, comments and
+    regular expressions are skipped, so text that merely mentions console
+    calls is left alone.
+    """
+    call = re.compile(r'console\s*\.\s*(?:%s)\s*\(' % '|'.join(map(re.escape, methods)))
+    parts = []
+    last = i = 0
+    n = len(source)
+    while i < n:
+        end = _skip_literal(source, i)
+        if end != i:
+            i = end
+            continue
+        match = call.match(source, i) if source[i] == 'c' else None
+        if match and (i == 0 or not (_is_ident(source[i - 1]) or source[i - 1] == '.')):
+            parts.append(source[last:i])
+            parts.append('void 0')
+            last = i = _skip_code(source, match.end(), ')')
+            continue
+        i += 1
+    parts.append(source[last:])
+    return ''.join(parts)
+
+
+def minify_js(source: str, strip_logging: bool = False) -> str:
+    """Optionally strip debug logging, then minify if rjsmin is available."""
+    if strip_logging:
+        source = strip_console_calls(source)
+    if rjsmin is None:
+        return source
+    return rjsmin.jsmin(source)
+
+
+class MinifiedStaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """Compressed manifest storage that minifies the game scripts before hashing."""
+
+    @property
+    def minify_patterns(self) -> Sequence[str]:
+        return getattr(settings, 'STATIC_MINIFY_PATTERNS', ())
+
+    @property
+    def strip_debug_logging(self) -> bool:
+        return getattr(settings, 'STATIC_STRIP_DEBUG_LOGGING', not settings.DEBUG)
+
+    def should_minify(self, name: str) -> bool:
+        return (name.endswith('.js') and not name.endswith('.min.js')
+                and any(fnmatch(name, pattern) for pattern in self.minify_patterns))
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            if rjsmin is None and any(self.should_minify(name) for name in paths):
+                logger.warning("rjsmin is not installed; game scripts are collected unminified")
+            paths = dict(paths)
+            for name, (storage, path) in paths.items():
+                if self.should_minify(name):
+                    self._minify(name, storage, path)
+                    # Hash the minified copy instead of the source
+                    paths[name] = (self, name)
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+
+    def _minify(self, name: str, storage, path: str) -> None:
+        with storage.open(path) as source_file:
+            source = source_file.read().decode('utf-8')
+        minified = minify_js(source, strip_logging=self.strip_debug_logging)
+        if self.exists(name):
+            self.delete(name)
+        self._save(name, ContentFile(minified.encode('utf-8')))
+        logger.info(f"Minified {name}: {len(source)} -> {len(minified)} bytes")
+
+    def stored_name(self, name):
+        # Before the first collectstatic there is nothing hashed to point at
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
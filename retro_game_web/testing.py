@@ -0,0 +1,100 @@
+"""
+Test helpers for asserting per-request query and cache budgets.
+
+``QueryBudgetMixin.assertBudget`` runs a request and compares the SQL
+statements and cache operations it made against an exact budget. Queries
+are compared as short ``VERB table`` summaries and cache operations by
+method name, so a budget reads as the plan of the request; on a mismatch
+the failure shows a diff of the plan followed by the captured SQL and
+cache keys.
+
+Savepoints are left out of the query plan: they come from ``TestCase``
+wrapping every test in a transaction and are not issued in production.
+"""
+
+import difflib
+import re
+from contextlib import contextmanager
+from typing import Callable, List, Sequence, Tuple
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+CACHE_OPERATIONS = (
+    'get', 'get_many', 'has_key', 'add', 'set', 'set_many', 'touch',
+    'delete', 'delete_many', 'incr', 'decr', 'clear',
+)
+
+_SAVEPOINT = re.compile(r'^\s*(SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK TO SAVEPOINT)\b', re.IGNORECASE)
+_TABLE = re.compile(r'\b(?:FROM|INTO|UPDATE|JOIN)\s+"?(\w+)"?', re.IGNORECASE)
+
+
+def summarize_query(sql: str) -> str:
+    """Reduce a SQL statement to its verb and first table, e.g. 'SELECT auth_user'."""
+    verb = sql.split(None, 1)[0].upper() if sql.strip() else ''
+    table = _TABLE.search(sql)
+    return f'{verb} {table.group(1)}' if table else verb
+
+
+@contextmanager
+def capture_cache_operations(alias: str = DEFAULT_CACHE_ALIAS):
+    """Record (operation, key) for every call on the cache in the block."""
+    backend = caches[alias]
+    calls: List[Tuple[str, str]] = []
+
+    def recorder(name, method):
+        def wrapper(*args, **kwargs):
+            calls.append((name, repr(args[0]) if args else ''))
+            return method(*args, **kwargs)
+        return wrapper
+
+    originals = {name: getattr(backend, name) for name in CACHE_OPERATIONS}
+    for name, method in originals.items():
+        setattr(backend, name, recorder(name, method))
+    try:
+        yield calls
+    finally:
+        for name in originals:
+            delattr(backend, name)
+
+
+class QueryBudgetMixin:
+    """TestCase mixin with ``assertBudget``."""
+
+    def assertBudget(self, request: Callable, queries: Sequence[str], cache: Sequence[str] = (),
+                     using: str = DEFAULT_DB_ALIAS):
+        """
+        Run request and assert its exact query and cache plan.
+
+        Args:
+            request: Callable making the request, e.g. ``lambda: self.client.get(url)``
+            queries: Expected query summaries in order, see ``summarize_query``
+            cache: Expected cache operation names in order
+            using: Database alias to capture
+
+        Returns:
+            Whatever request returned
+        """
+        with CaptureQueriesContext(connections[using]) as captured, \
+                capture_cache_operations() as cache_calls:
+            response = request()
+
+        sql = [q['sql'] for q in captured if not _SAVEPOINT.match(q['sql'])]
+        actual_queries = [summarize_query(statement) for statement in sql]
+        actual_cache = [name for name, _ in cache_calls]
+        if actual_queries == list(queries) and actual_cache == list(cache):
+            return response
+
+        diff = difflib.unified_diff(
+            [f'query: {q}' for q in queries] + [f'cache: {c}' for c in cache],
+            [f'query: {q}' for q in actual_queries] + [f'cache: {c}' for c in actual_cache],
+            'budget', 'actual', lineterm=''
+        )
+        details = [f'{i}. {statement}' for i, statement in enumerate(sql, 1)]
+        details += [f'{name}({key})' for name, key in cache_calls]
+        self.fail(
+            f'Request made {len(actual_queries)} queries and {len(actual_cache)} cache operations; '
+            f'budget is {len(queries)} and {len(cache)}.\n'
+            + '\n'.join(diff) + '\n\nCaptured:\n' + '\n'.join(details)
+        )
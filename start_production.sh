@@ -30,9 +30,16 @@ fi
 # Set defaults
 PORT=${PORT:-8000}
 DEBUG=${DEBUG:-False}
+SERVER_MODE=${SERVER_MODE:-wsgi}
+
+# ASGI mode serves the API from the async views
+if [ "$SERVER_MODE" = "asgi" ]; then
+    export API_ASYNC_VIEWS=True
+fi
 
 echo "🔧 Configuration:"
 echo "   Workers: 1 (single worker)"
+echo "   Server mode: $SERVER_MODE"
 echo "   Port: $PORT"
 echo "   Debug: $DEBUG"
 echo "   SSL Redirect: ${SECURE_SSL_REDIRECT:-False}"
@@ -41,16 +48,31 @@ echo "   SSL Redirect: ${SECURE_SSL_REDIRECT:-False}"
 echo ""
 echo "🔍 Pre-flight checks:"
 python manage.py check --deploy --verbosity=0 && echo "   ✅ Django checks passed" || echo "   ⚠️  Django checks failed"
+python manage.py rebuild_rank_index --verbosity=0 && echo "   ✅ Rank index rebuilt" || echo "   ⚠️  Rank index rebuild failed"
+# Worker metrics files from the previous run would be merged into the new totals
+rm -rf "${METRICS_DIR:-${TMPDIR:-/tmp}/retro_game_web_metrics}" && echo "   ✅ Request metrics reset"
 
 echo ""
 echo "🚀 Starting server..."
 echo "📱 Application: http://localhost:$PORT/"
 echo "🔧 Admin panel: http://localhost:$PORT/admin/"
+echo "📈 Metrics: http://localhost:$PORT/metrics/"
 echo ""
 echo "Press Ctrl+C to stop the server"
 echo "===================================="
 
 # Start Gunicorn with single worker
+if [ "$SERVER_MODE" = "asgi" ]; then
+    # One event loop serves all concurrent requests
+    exec gunicorn retro_game_web.asgi:application \
+        --worker-class uvicorn.workers.UvicornWorker \
+        --bind 0.0.0.0:$PORT \
+        --workers 1 \
+        --timeout 60 \
+        --access-logfile - \
+        --error-logfile -
+fi
+
 # Using application.py as WSGI entry point
 exec gunicorn application:application \
     --bind 0.0.0.0:$PORT \